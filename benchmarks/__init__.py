@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for pnutpy, run with ``python -m benchmarks``. See :mod:`benchmarks.suite`.
+"""
@@ -0,0 +1,233 @@
+"""
+The recorded payloads the benchmarks run on, as gzipped pnut.io responses in ``payloads/``.
+
+They are shaped after real responses of the global stream, a chat channel and the interactions
+stream, with the ids, names and texts made up. ``python -m benchmarks.payloads`` writes them
+again; the output is deterministic, so they only change when this generator does.
+"""
+import datetime
+import gzip
+import json
+import os
+import random
+
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+
+PAYLOADS = ('global_stream', 'channel_messages', 'interactions')
+
+WORDS = ('pnut', 'morning', 'coffee', 'release', 'python', 'weekend', 'music', 'photo', 'train', 'rain', 'server',
+         'update', 'thanks', 'today', 'reading', 'garden', 'bike', 'podcast', 'bug', 'fixed', 'finally', 'new')
+CLIENTS = (('Goober', 'https://goober.social', 'c4a3b8'), ('Dotpnut', 'https://dotpnut.de', 'a9e2f0'),
+           ('Beta', 'https://beta.pnut.io', '0b4cf1'), ('Patter', 'https://patter.chat', 'f00baa'))
+
+
+def timestamp(rng, start=datetime.datetime(2022, 9, 1)):
+    return (start + datetime.timedelta(seconds=rng.randrange(30 * 86400))).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def image(link, width, height, is_default=False):
+    return {'link': link, 'is_default': is_default, 'width': width, 'height': height}
+
+
+def user(rng, user_id):
+    username = '%s%s' % (rng.choice(WORDS), user_id)
+    text = 'Writing about %s and %s. https://%s.example' % (rng.choice(WORDS), rng.choice(WORDS), username)
+    return {
+        'id': str(user_id),
+        'username': username,
+        'name': '%s %s' % (rng.choice(WORDS).title(), rng.choice(WORDS).title()),
+        'created_at': timestamp(rng, datetime.datetime(2017, 1, 1)),
+        'locale': rng.choice(('en_US', 'de_DE', 'en_GB')),
+        'timezone': rng.choice(('America/Chicago', 'Europe/Berlin', 'Europe/London')),
+        'type': rng.choice(('human', 'human', 'human', 'feed', 'bot')),
+        'badge': {'id': '1', 'name': 'Patron'} if rng.random() < 0.2 else None,
+        'content': {
+            'text': text,
+            'html': '<span itemscope="https://pnut.io/schemas/Post">%s</span>' % text,
+            'markdown_text': text,
+            'entities': {
+                'links': [{'link': 'https://%s.example' % username, 'text': '%s.example' % username,
+                           'len': len(username) + 16, 'pos': len(text) - len(username) - 16}],
+                'mentions': [],
+                'tags': [],
+            },
+            'avatar_image': image('https://cdn.pnut.io/avatars/%s.png' % user_id, 200, 200),
+            'cover_image': image('https://cdn.pnut.io/covers/%s.jpg' % user_id, 960, 320, rng.random() < 0.3),
+        },
+        'counts': {'bookmarks': rng.randrange(500), 'clients': rng.randrange(3), 'followers': rng.randrange(2000),
+                   'following': rng.randrange(500), 'posts': rng.randrange(20000), 'users': 0},
+        'follows_you': rng.random() < 0.3,
+        'you_blocked': False,
+        'you_can_follow': True,
+        'you_follow': rng.random() < 0.4,
+        'you_muted': False,
+        'verified': {'domain': '%s.example' % username, 'link': 'https://%s.example' % username}
+        if rng.random() < 0.3 else None,
+    }
+
+
+def post_text(rng, users):
+    text, entities = [], {'links': [], 'mentions': [], 'tags': []}
+    pos = 0
+    for n in range(rng.randrange(6, 40)):
+        kind = rng.random()
+        if kind < 0.05:
+            mentioned = rng.choice(users)
+            word = '@' + mentioned['username']
+            entities['mentions'].append({'id': mentioned['id'], 'len': len(word) - 1, 'pos': pos,
+                                         'text': mentioned['username']})
+        elif kind < 0.1:
+            word = '#' + rng.choice(WORDS)
+            entities['tags'].append({'len': len(word) - 1, 'pos': pos, 'text': word[1:]})
+        elif kind < 0.13:
+            word = 'https://%s.example/%s' % (rng.choice(WORDS), rng.randrange(10000))
+            entities['links'].append({'link': word, 'text': word, 'len': len(word), 'pos': pos})
+        else:
+            word = rng.choice(WORDS)
+
+        text.append(word)
+        pos += len(word) + 1
+
+    text = ' '.join(text)
+    return {'text': text, 'html': '<span itemscope="https://pnut.io/schemas/Post">%s</span>' % text,
+            'markdown_text': text, 'entities': entities, 'links_not_parsed': False}
+
+
+def oembed(rng, n):
+    return {'type': 'io.pnut.core.oembed', 'value': {
+        'type': 'photo', 'version': '1.0', 'width': 1024, 'height': 768,
+        'title': 'photo %s' % n, 'url': 'https://files.pnut.io/%s.jpg' % n,
+        'thumbnail_url': 'https://files.pnut.io/%s_thumb.jpg' % n, 'thumbnail_width': 200, 'thumbnail_height': 150,
+        'provider_name': 'pnut.io', 'provider_url': 'https://pnut.io'}}
+
+
+def post(rng, post_id, users, repost=True):
+    client = rng.choice(CLIENTS)
+    data = {
+        'id': str(post_id),
+        'created_at': timestamp(rng),
+        'is_deleted': False,
+        'is_nsfw': rng.random() < 0.02,
+        'is_revised': rng.random() < 0.05,
+        'source': {'name': client[0], 'link': client[1], 'id': client[2]},
+        'thread_id': str(post_id),
+        'user': rng.choice(users),
+        'counts': {'bookmarks': rng.randrange(10), 'replies': rng.randrange(5), 'reposts': rng.randrange(3),
+                   'threads': rng.randrange(8)},
+        'content': post_text(rng, users),
+        'you_bookmarked': rng.random() < 0.1,
+        'you_reposted': False,
+    }
+    if rng.random() < 0.25:
+        data['reply_to'] = data['thread_id'] = str(post_id - rng.randrange(1, 500))
+
+    if rng.random() < 0.15:
+        data['raw'] = [oembed(rng, post_id)]
+
+    if repost and rng.random() < 0.08:
+        data['repost_of'] = post(rng, post_id - rng.randrange(100, 10000), users, repost=False)
+        del data['content']
+
+    return data
+
+
+def message(rng, message_id, channel_id, users):
+    client = rng.choice(CLIENTS)
+    data = {
+        'id': str(message_id),
+        'channel_id': str(channel_id),
+        'created_at': timestamp(rng),
+        'is_deleted': False,
+        'is_sticky': False,
+        'source': {'name': client[0], 'link': client[1], 'id': client[2]},
+        'thread_id': str(message_id),
+        'user': rng.choice(users),
+        'counts': {'replies': rng.randrange(3)},
+        'content': post_text(rng, users),
+        'raw': [{'type': 'io.pnut.core.chat-settings', 'value': {'name': 'lounge'}}] if rng.random() < 0.02 else [],
+    }
+    if rng.random() < 0.3:
+        data['raw'].append(oembed(rng, message_id))
+
+    if rng.random() < 0.1:
+        data['raw'].append({'type': 'io.pnut.core.crosspost',
+                            'value': {'canonical_url': 'https://posts.pnut.io/%s' % (message_id // 3)}})
+
+    if rng.random() < 0.2:
+        data['reply_to'] = data['thread_id'] = str(message_id - rng.randrange(1, 50))
+
+    return data
+
+
+def interaction(rng, users, post_id):
+    action = rng.choice(('bookmark', 'bookmark', 'repost', 'reply', 'follow', 'poll_response'))
+    if action == 'follow':
+        objects = [rng.choice(users)]
+    else:
+        objects = [post(rng, post_id, users, repost=False)]
+
+    return {
+        'action': action,
+        'event_date': timestamp(rng),
+        'users': rng.sample(users, rng.randrange(1, 6)),
+        'objects': objects,
+        'pagination_id': str(post_id * 10),
+    }
+
+
+def envelope(data, more=True, **meta):
+    meta.update({'code': 200, 'more': more})
+    if data and 'id' in data[0]:
+        meta.update({'max_id': data[0]['id'], 'min_id': data[-1]['id']})
+
+    return {'meta': meta, 'data': data}
+
+
+def descending_ids(rng, start, count):
+    ids = [start]
+    while len(ids) < count:
+        ids.append(ids[-1] - rng.randrange(1, 4))
+
+    return ids
+
+
+def generate(name, seed=2016):
+    rng = random.Random('%s-%s' % (name, seed))
+    if name == 'global_stream':
+        users = [user(rng, 1000 + n) for n in range(60)]
+        return envelope([post(rng, post_id, users) for post_id in descending_ids(rng, 980000, 200)])
+
+    if name == 'channel_messages':
+        users = [user(rng, 2000 + n) for n in range(12)]
+        return envelope([message(rng, message_id, 1234, users) for message_id in descending_ids(rng, 1200000, 200)])
+
+    if name == 'interactions':
+        users = [user(rng, 3000 + n) for n in range(40)]
+        return envelope([interaction(rng, users, 970000 - n) for n in range(100)], min_id='9690000')
+
+    raise ValueError('No payload named %s' % (name))
+
+
+def path(name):
+    return os.path.join(DIRECTORY, '%s.json.gz' % (name))
+
+
+def load(name):
+    """The response body of payload ``name`` as bytes."""
+    with gzip.open(path(name), 'rb') as f:
+        return f.read()
+
+
+def write():
+    if not os.path.isdir(DIRECTORY):
+        os.makedirs(DIRECTORY)
+
+    for name in PAYLOADS:
+        body = json.dumps(generate(name), separators=(',', ':'), sort_keys=True).encode('utf-8')
+        # A fixed mtime keeps the files byte for byte the same when they are written again
+        with open(path(name), 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(body)
+
+
+if __name__ == '__main__':
+    write()
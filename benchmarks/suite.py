@@ -0,0 +1,325 @@
+"""
+Offline benchmarks of decoding, hydration, serialization and pagination.
+
+Run them with ``python -m benchmarks``; see ``--help`` for the options. Every benchmark runs on
+the recorded payloads of :mod:`benchmarks.payloads` and, where it makes requests, against a
+transport adapter that answers from memory, so the numbers only measure pnutpy itself.
+"""
+import argparse
+import collections
+import datetime
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+import pnutpy
+from pnutpy.api import API
+from pnutpy.compact import model_class
+from pnutpy.cursor import cursor
+from pnutpy.dates import parse_datetime
+from pnutpy.models import APIModel, IdentityMap, Interaction, Message, Post
+from pnutpy.utils import json_encoder
+
+from benchmarks import payloads
+
+API_ROOT = 'https://api.pnut.bench/v0'
+
+# The version of the result format written by --output
+SCHEMA = 1
+
+Benchmark = collections.namedtuple('Benchmark', ['name', 'prepare', 'items', 'description'])
+
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name, items, description):
+    """
+    Register ``prepare(options)``, which returns the function to time, as benchmark ``name``.
+    ``items`` is the number of objects one run handles, or a function of the options giving it.
+    """
+    def register(prepare):
+        BENCHMARKS[name] = Benchmark(name, prepare, items, description)
+        return prepare
+
+    return register
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Answers every request with one of ``bodies``, chosen by ``pick(request)``, without touching
+    the network.
+    """
+    def __init__(self, bodies, pick=lambda request: 0):
+        super(ReplayAdapter, self).__init__()
+        self.bodies = bodies
+        self.pick = pick
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(self.bodies[self.pick(request)])
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def build_api(options, bodies, pick=lambda request: 0, **kwargs):
+    api = API.build_api(api_root=API_ROOT, rate_limiter=False, json_backend=options.json_backend, **kwargs)
+    api.mount('https://', ReplayAdapter(bodies, pick))
+    return api
+
+
+def decoded(name):
+    return json.loads(payloads.load(name))
+
+
+def paged_bodies(name, pages):
+    """``pages`` copies of a payload chained by their ``min_id``, the last one without ``more``."""
+    body = decoded(name)
+    bodies = []
+    for page in range(pages):
+        body['meta'] = dict(body['meta'], min_id=str(pages - page), more=page < pages - 1)
+        bodies.append(json.dumps(body).encode('utf-8'))
+
+    return bodies
+
+
+def page_of(pages):
+    def pick(request):
+        before_id = parse_qs(urlsplit(request.url).query).get('before_id')
+        # Page n ends with min_id pages - n, so it is followed by page n + 1
+        return pages - int(before_id[0]) + 1 if before_id else 0
+
+    return pick
+
+
+@benchmark('decode.json', 200, 'Parse the global stream page with the JSON backend')
+def bench_decode_json(options):
+    body = payloads.load('global_stream')
+    backend = build_api(options, [body]).json_backend
+    return lambda: backend.loads(body)
+
+
+@benchmark('decode.from_string', 200, 'APIModel.from_string of the global stream page')
+def bench_from_string(options):
+    body = payloads.load('global_stream')
+    api = build_api(options, [body])
+    return lambda: APIModel.from_string(body, api)
+
+
+def hydrate(options, name, model, **kwargs):
+    data = decoded(name)['data']
+    api = build_api(options, [b''], **kwargs)
+    model = model_class(api, model)
+    return lambda: [model.from_response_data(x, api=api, identity_map=IdentityMap()) for x in data]
+
+
+@benchmark('hydrate.post', 200, 'Post.from_response_data for the global stream page')
+def bench_hydrate_post(options):
+    return hydrate(options, 'global_stream', Post)
+
+
+@benchmark('hydrate.post.compact', 200, 'Hydrate the global stream page into compact posts')
+def bench_hydrate_post_compact(options):
+    return hydrate(options, 'global_stream', Post, model_style='compact')
+
+
+@benchmark('hydrate.message', 200, 'Message.from_response_data for a page of chat messages')
+def bench_hydrate_message(options):
+    return hydrate(options, 'channel_messages', Message)
+
+
+@benchmark('hydrate.interaction', 100, 'Interaction.from_response_data for a page of interactions')
+def bench_hydrate_interaction(options):
+    return hydrate(options, 'interactions', Interaction)
+
+
+@benchmark('serialize.post', 200, 'serialize() the posts of the global stream page')
+def bench_serialize(options):
+    posts = hydrate(options, 'global_stream', Post)()
+    return lambda: [post.serialize() for post in posts]
+
+
+@benchmark('encode.json_encoder', 200, 'json_encoder of the serialized global stream page')
+def bench_json_encoder(options):
+    api = build_api(options, [b''])
+    data = [post.serialize() for post in hydrate(options, 'global_stream', Post)()]
+    return lambda: json_encoder(data, api.json_backend)
+
+
+@benchmark('endpoint.posts_streams_global', 200, 'One posts_streams_global call: request, decode and hydrate')
+def bench_endpoint(options):
+    api = build_api(options, [payloads.load('global_stream')])
+    return lambda: api.posts_streams_global(count=200)
+
+
+def iterate_cursor(options, name, func_name, args, **kwargs):
+    pages = options.pages
+    api = build_api(options, paged_bodies(name, pages), page_of(pages), **kwargs)
+    func = getattr(api, func_name)
+
+    def run():
+        for item in cursor(func, *args, count=200):
+            pass
+
+    return run
+
+
+def cursor_items(options):
+    return 200 * options.pages
+
+
+@benchmark('cursor.posts_streams_global', cursor_items, 'Iterate --pages pages of the global stream with cursor()')
+def bench_cursor(options):
+    return iterate_cursor(options, 'global_stream', 'posts_streams_global', ())
+
+
+@benchmark('cursor.posts_streams_global.plain', cursor_items, 'The same with hydrate=False')
+def bench_cursor_plain(options):
+    return iterate_cursor(options, 'global_stream', 'posts_streams_global', (), hydrate=False)
+
+
+@benchmark('cursor.get_channel_messages', cursor_items, 'Iterate --pages pages of chat messages with cursor()')
+def bench_cursor_messages(options):
+    return iterate_cursor(options, 'channel_messages', 'get_channel_messages', (1234,))
+
+
+def measure(func, min_samples, min_time):
+    """
+    Time ``func`` at least ``min_samples`` times and for at least ``min_time`` seconds. The
+    timestamp cache is cleared before every sample, so each one decodes its dates afresh.
+    """
+    func()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_samples or time.perf_counter() < deadline:
+        parse_datetime.cache_clear()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+
+    return samples
+
+
+def summarize(bench, samples, items):
+    median = statistics.median(samples)
+    return {
+        'description': bench.description,
+        'items': items,
+        'samples': len(samples),
+        'min': min(samples),
+        'median': median,
+        'mean': statistics.mean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'items_per_second': items / median if median else None,
+    }
+
+
+def run(options):
+    """Run the selected benchmarks; returns the result document written by ``--output``."""
+    results = collections.OrderedDict()
+    for name, bench in BENCHMARKS.items():
+        if options.filter and not any(f in name for f in options.filter):
+            continue
+
+        items = bench.items(options) if callable(bench.items) else bench.items
+        results[name] = summarize(bench, measure(bench.prepare(options), options.samples, options.min_time), items)
+        if options.verbose:
+            print_result(name, results[name])
+
+    return {
+        'schema': SCHEMA,
+        'pnutpy': pnutpy.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'json_backend': build_api(options, [b'']).json_backend.name,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'results': results,
+    }
+
+
+def print_result(name, result, out=sys.stderr):
+    out.write('%-36s %10.3f ms %12.0f items/s  (%d samples, +-%.1f%%)\n' % (
+        name, result['median'] * 1000, result['items_per_second'] or 0, result['samples'],
+        100 * result['stdev'] / result['mean'] if result['mean'] else 0))
+
+
+def compare(current, baseline, threshold):
+    """
+    Compare the medians of two result documents.
+
+    :returns: the lines of the report and the names of the benchmarks more than ``threshold``
+        (a fraction) slower than in ``baseline``
+    """
+    lines, regressions = [], []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            lines.append('%-36s %10.3f ms  (new)' % (name, result['median'] * 1000))
+            continue
+
+        change = result['median'] / before['median'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+
+        lines.append('%-36s %10.3f ms  was %10.3f ms  %+6.1f%%%s' % (
+            name, result['median'] * 1000, before['median'] * 1000, change * 100, flag))
+
+    return lines, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('filter', nargs='*', help='only run benchmarks whose names contain one of these')
+    parser.add_argument('--samples', type=int, default=20, help='the least number of timed runs per benchmark')
+    parser.add_argument('--min-time', type=float, default=1.0, help='the least seconds to spend per benchmark')
+    parser.add_argument('--pages', type=int, default=5, help='the pages the cursor benchmarks iterate')
+    parser.add_argument('--json-backend', default='auto', help='the JSON backend of the client, see pnutpy.json_backends')
+    parser.add_argument('--output', '-o', help='write the results as JSON to this file, - for stdout')
+    parser.add_argument('--compare', help='compare with the results of an earlier --output')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='with --compare, exit with status 1 if a benchmark got slower by more than this fraction')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    parser.add_argument('--quiet', '-q', dest='verbose', action='store_false', help='only write the results file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.list:
+        for name, bench in BENCHMARKS.items():
+            print('%-36s %s' % (name, bench.description))
+
+        return 0
+
+    document = run(options)
+    if options.output == '-':
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    elif options.output:
+        with open(options.output, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if options.compare:
+        with open(options.compare) as f:
+            lines, regressions = compare(document, json.load(f), options.threshold)
+
+        sys.stderr.write('\n'.join(lines) + '\n')
+        if regressions:
+            return 1
+
+    return 0
@@ -11,9 +11,11 @@ __license__ = 'MIT'
 
 from .models import User, Post, Interaction, Token
 from .api import API
-from .cursor import cursor
+from .async_api import AsyncAPI
+from . import ratelimit
+from .cursor import cursor, async_cursor
 
 # Global, unauthenticated instance of API
 api = API.build_api()
 
-__all__ = ['User', 'Post', 'Interaction', 'Token', 'API', 'api', 'cursor']
+__all__ = ['User', 'Post', 'Interaction', 'Token', 'API', 'AsyncAPI', 'api', 'cursor', 'async_cursor']
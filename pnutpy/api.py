@@ -1,14 +1,81 @@
+import collections
+import contextvars
+import functools
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 
-from pnutpy.consts import (PAGINATION_PARAMS, CHANNEL_PARAMS, MESSAGE_PARAMS, FILE_PARAMS, POLL_PARAMS, POST_PARAMS, POST_SEARCH_PARAMS,
+from pnutpy.cache import cache_key, invalidated_paths, validators
+from pnutpy.consts import (MAX_BULK_IDS, PAGINATION_PARAMS, CHANNEL_PARAMS, MESSAGE_PARAMS, FILE_PARAMS, POLL_PARAMS, POST_PARAMS, POST_SEARCH_PARAMS,
     USER_PARAMS, USER_SEARCH_PARAMS, CHANNEL_SEARCH_PARAMS, MESSAGE_SEARCH_PARAMS)
 from pnutpy.errors import (PnutAuthAPIException, PnutPermissionDenied, PnutMissing, PnutRateLimitAPIException,
                           PnutInsufficientStorageException, PnutAPIException, PnutError, PnutBadRequestAPIException)
-from pnutpy.models import (SimpleValueModel, SimpleValueDictListMode, APIModel, Post, User, Channel, Message, ExploreStream, File, Poll, Interaction, Token, APIMeta)
+from pnutpy.loader import BatchLoader
+from pnutpy.metrics import build_instrumentation
+from pnutpy.profiling import build_profiler, current_profile, profile_phase
+from pnutpy.ratelimit import RateLimiter
+from pnutpy.stream import StreamedPage, stream_identity_map
+from pnutpy.compact import model_class
+from pnutpy.dates import TIMESTAMP_FORMATS
+from pnutpy.json_backends import default_backend, get_backend
+from pnutpy.models import (IdentityMap, LazyModel, lazy_model, SimpleValueModel, SimpleValueDictListMode, APIModel, Post, User, Channel, Message, ExploreStream, File, Poll, Interaction, Token, APIMeta)
 from pnutpy.utils import json_encoder
 
 
+def check_response(response):
+    """
+    Raise the matching :class:`pnutpy.errors.PnutAPIException` for an error response
+
+    :param response: a :class:`pnutpy.models.APIModel` built from the response body
+    """
+    if response.meta.code == 400:
+        raise PnutBadRequestAPIException(response)
+
+    if response.meta.code == 401:
+        raise PnutAuthAPIException(response)
+
+    if response.meta.code == 403:
+        raise PnutPermissionDenied(response)
+
+    if response.meta.code == 404:
+        raise PnutMissing(response)
+
+    if response.meta.code == 429:
+        raise PnutRateLimitAPIException(response)
+
+    if response.meta.code != 200 and response.meta.code != 201:
+        raise PnutAPIException(response)
+
+    return response
+
+
+def parse_response(content, api, hydrate=True):
+    """
+    Parse and check a response body. With ``hydrate=False`` the decoded JSON is returned as it is,
+    only errors are wrapped in a model for their exception.
+    """
+    with profile_phase(api, 'decode'):
+        body = api.json_backend.loads(content)
+
+    if hydrate:
+        with profile_phase(api, 'hydrate'):
+            return check_response(APIModel.from_decoded(body, api))
+
+    code = (body.get('meta') or {}).get('code', 200)
+    if code != 200 and code != 201:
+        check_response(APIModel(body, api))
+
+    return body
+
+
+def build_rate_limiter(rate_limiter):
+    if rate_limiter is True:
+        return RateLimiter()
+
+    return rate_limiter or None
+
+
 class API(requests.Session):
     """
     The root API method
@@ -27,9 +94,78 @@ class API(requests.Session):
         # Otherwise, you can construct an an authenticated api object
         my_api = pnutpy.API.build_api(access_token='<access_token>')
 
+    Requests are paced with the rate limit headers of earlier responses, see
+    :class:`pnutpy.ratelimit.RateLimiter`. Pass ``rate_limiter=False`` to turn that off, or a
+    limiter instance to share one budget between several clients.
+
+    Endpoints that take ``ids`` (``get_posts``, ``get_users``, ...) accept any iterable of ids or
+    models. It is split into chunks the server accepts, up to ``bulk_concurrency`` chunks are
+    fetched at once and the results come back in the order of the ids, with ``None`` in place of
+    every id the server did not return.
+
+    With ``batch_window`` set, ``get_user``, ``get_post`` and ``get_channel`` calls for numeric ids
+    made within that many seconds of each other are sent as one bulk request, see
+    :class:`pnutpy.loader.BatchLoader`.
+
+    Pass a ``cache`` (:class:`pnutpy.cache.MemoryCache` or :class:`pnutpy.cache.FileCache`) to keep
+    responses of GET endpoints for the time to live each endpoint declares, which ``cache_ttls``
+    (a dict of method name to seconds) overrides. Stale entries are revalidated with conditional
+    requests when the server sent an ETag or Last-Modified header, and other methods invalidate
+    the cached responses of the resource they change.
+
+    Users and posts repeated within a response are hydrated once and shared, see
+    :class:`pnutpy.models.IdentityMap`. With ``identity_map=True`` the client keeps doing that
+    across responses.
+
+    With ``lazy_models=True`` models are hydrated field by field on first access instead of all at
+    once, see :class:`pnutpy.models.LazyModel`. ``model_style='compact'`` hydrates users, posts,
+    messages, channels and interactions into the slotted classes of :mod:`pnutpy.compact`.
+
+    Timestamps become aware datetimes; ``timestamps='epoch'`` turns them into seconds since the
+    epoch and ``timestamps='string'`` keeps them as sent, see :mod:`pnutpy.dates`.
+
+    Responses are parsed and request bodies encoded with ``json_backend``, by default the fastest
+    one installed, see :mod:`pnutpy.json_backends`.
+
+    With ``hydrate=False``, for the client or a single call, endpoint methods return the decoded
+    JSON of ``data`` and ``meta`` as plain dicts and lists, skipping the models altogether.
+
+    List endpoints called with ``stream=True`` return a :class:`pnutpy.stream.StreamedPage` that
+    hydrates the objects one at a time while the response is read.
+
+    A :class:`pnutpy.transport.Transport` as ``transport_config`` sets the connection pool size,
+    timeouts and retries of failed GET requests, or switches to HTTP/2.
+
+    ``instrumentation=True`` (or a :class:`pnutpy.metrics.Instrumentation` with hooks) records
+    latency, sizes, status codes, retries and rate limit waits per endpoint method. With
+    ``profile=True`` every call's meta gets a ``profile`` of the time spent waiting, on the
+    network, decoding and hydrating, see :class:`pnutpy.profiling.Profiler`.
+
     """
+    rate_limiter = None
+    batch_loader = None
+    bulk_concurrency = 4
+    cache = None
+    cache_ttls = {}
+    identity_map = None
+    lazy_models = False
+    model_style = 'dict'
+    timestamps = 'datetime'
+    json_backend = default_backend
+    hydrate = True
+    transport_config = None
+    instrumentation = None
+    profiler = None
+
     @classmethod
-    def build_api(cls, api_root='https://api.pnut.io/v0', access_token=None, verify_ssl=True, extra_headers=None):
+    def build_api(cls, api_root='https://api.pnut.io/v0', access_token=None, verify_ssl=True, extra_headers=None,
+                  rate_limiter=True, batch_window=None, cache=None, cache_ttls=None,
+                  identity_map=False, lazy_models=False, model_style='dict', timestamps='datetime',
+                  json_backend='auto', hydrate=True, transport_config=None, instrumentation=None,
+                  profile=False):
+        if timestamps not in TIMESTAMP_FORMATS:
+            raise ValueError('timestamps must be one of %s' % (', '.join(TIMESTAMP_FORMATS)))
+
         api = cls()
         api.api_root = api_root
         if access_token:
@@ -37,10 +173,36 @@ class API(requests.Session):
 
         api.verify_ssl = verify_ssl
         api.headers.update(extra_headers if extra_headers else {})
+        api.rate_limiter = build_rate_limiter(rate_limiter)
+        if batch_window is not None:
+            api.batch_loader = BatchLoader(api, window=batch_window)
+
+        api.cache = cache
+        api.cache_ttls = cache_ttls or {}
+        if identity_map:
+            api.identity_map = IdentityMap(shared=True)
+
+        api.lazy_models = lazy_models
+        api.model_style = model_style
+        api.timestamps = timestamps
+        api.json_backend = get_backend(json_backend)
+        api.hydrate = hydrate
+        if transport_config is not None:
+            api.transport_config = transport_config
+            adapter = transport_config.adapter()
+            api.mount('https://', adapter)
+            api.mount('http://', adapter)
+
+        api.instrumentation = build_instrumentation(instrumentation)
+        api.profiler = build_profiler(profile)
 
         return api
 
     def request(self, method, url, raw_response=False, *args, **kwargs):
+        cache_ttl = kwargs.pop('cache_ttl', None)
+        hydrate = kwargs.pop('hydrate', True)
+        endpoint = kwargs.pop('endpoint', None)
+        path = url
         if url:
             url = self.api_root + url
 
@@ -51,38 +213,110 @@ class API(requests.Session):
 
         kwargs['headers'] = headers
 
-        response = super(API, self).request(method, url, *args, **kwargs)
-        try:
-            response.raise_for_status()
-        except requests.HTTPError:
-            pass
-        except Exception:
-            raise PnutError()
+        key, entry = None, None
+        if self.cache is not None and cache_ttl and method == 'GET' and not raw_response:
+            key = cache_key(method, path, kwargs.get('params'), headers)
+            entry = self.cache.get(key)
+            if entry is not None:
+                if self.cache.is_fresh(entry):
+                    return parse_response(entry.content, self, hydrate)
+
+                headers.update(validators(entry))
+
+        if self.transport_config is not None:
+            kwargs.setdefault('timeout', self.transport_config.timeout)
+
+        if self.instrumentation is None:
+            response = self.send_with_retries(method, url, *args, **kwargs)
+        else:
+            response = self.send_instrumented(endpoint, method, path, url, raw_response, *args, **kwargs)
+
+        if self.cache is not None and method not in ('GET', 'HEAD') and response.status_code < 400:
+            for prefix in invalidated_paths(path):
+                self.cache.invalidate(prefix)
 
         if response.status_code == 204 or raw_response:
             return response
 
-        response = APIModel.from_string(response.content, self)
+        if entry is not None and response.status_code == 304:
+            self.cache.set(key, self.cache.build_entry(path, entry.content, response.headers, cache_ttl, previous=entry))
+            return parse_response(entry.content, self, hydrate)
 
-        if response.meta.code == 400:
-            raise PnutBadRequestAPIException(response)
+        api_response = parse_response(response.content, self, hydrate)
+        if key is not None:
+            self.cache.set(key, self.cache.build_entry(path, response.content, response.headers, cache_ttl))
 
-        if response.meta.code == 401:
-            raise PnutAuthAPIException(response)
+        return api_response
 
-        if response.meta.code == 403:
-            raise PnutPermissionDenied(response)
+    def send_instrumented(self, endpoint, method, path, url, raw_response, *args, **kwargs):
+        """Send a request under the client's :class:`pnutpy.metrics.Instrumentation`."""
+        instrumentation = self.instrumentation
+        event = instrumentation.start(endpoint, method, path)
+        with instrumentation.open_span(event):
+            try:
+                response = self.send_with_retries(method, url, *args, event=event, **kwargs)
+                event.response_received(response, None if raw_response else response.content)
+            except Exception as e:
+                instrumentation.finish(event, e)
+                raise
 
-        if response.meta.code == 404:
-            raise PnutMissing(response)
+            instrumentation.finish(event)
 
-        if response.meta.code == 429:
-            raise PnutRateLimitAPIException(response)
+        return response
 
-        if response.meta.code != 200 and response.meta.code != 201:
-            raise PnutAPIException(response)
+    def send_with_retries(self, method, url, *args, event=None, **kwargs):
+        """
+        Send a request, retrying idempotent ones that failed on the way as the client's
+        :class:`pnutpy.transport.Transport` allows. The retries and rate limit waits are
+        recorded on ``event``, a :class:`pnutpy.metrics.RequestEvent`.
+        """
+        transport = self.transport_config
+        profile = current_profile() if self.profiler is not None else None
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                if event is None and profile is None:
+                    self.rate_limiter.wait()
+                else:
+                    started = time.perf_counter()
+                    self.rate_limiter.wait()
+                    waited = time.perf_counter() - started
+                    if event is not None:
+                        event.rate_limit_wait += waited
+                    if profile is not None:
+                        profile.add('wait', waited)
 
-        return response
+            try:
+                started = time.perf_counter()
+                response = super(API, self).request(method, url, *args, **kwargs)
+                if profile is not None:
+                    # requests measures the time to the response headers as elapsed
+                    ttfb = response.elapsed.total_seconds()
+                    profile.add('ttfb', ttfb)
+                    profile.add('download', max(0.0, time.perf_counter() - started - ttfb))
+            except (requests.ConnectionError, requests.Timeout):
+                if transport is None or not transport.can_retry(method, attempt):
+                    raise
+            else:
+                try:
+                    response.raise_for_status()
+                except requests.HTTPError:
+                    pass
+                except Exception:
+                    raise PnutError()
+
+                if self.rate_limiter:
+                    self.rate_limiter.update(response.headers, response.status_code)
+
+                if transport is None or not transport.should_retry(method, response.status_code, attempt):
+                    return response
+
+                response.close()
+
+            transport.wait(attempt)
+            attempt += 1
+            if event is not None:
+                event.retries = attempt
 
     def add_authorization_token(self, token):
         self.headers.update({
@@ -93,71 +327,197 @@ class API(requests.Session):
         kwargs.setdefault('headers', dict())
         kwargs['headers'].update({'Content-Type': 'application/json'})
         if kwargs.get('data'):
-            kwargs['data'] = json_encoder(kwargs['data'])
+            kwargs['data'] = json_encoder(kwargs['data'], self.json_backend).encode('utf-8')
 
         return self.request(method, *args, **kwargs)
 
 
-re_path_template = re.compile('{\w+}')
+re_path_template = re.compile(r'{\w+}')
 
+Endpoint = collections.namedtuple('Endpoint', [
+    'func_name', 'path', 'payload_type', 'payload_list', 'allowed_params', 'method', 'require_auth',
+    'raw_response', 'content_type', 'extra_doc', 'link', 'bulk_ids', 'batch_with', 'cache_ttl',
+])
 
-def bind_api_method(func_name, path, payload_type=None, payload_list=False, allowed_params=None,
-                    method='GET', require_auth=True, raw_response=False, content_type='JSON', extra_doc='', link='#'):
-    allowed_params = allowed_params or []
+# Every endpoint registered through bind_api_method, in registration order.
+# Alternate clients (see :class:`pnutpy.async_api.AsyncAPI`) generate their methods from this table.
+ENDPOINTS = collections.OrderedDict()
 
-    def run(self, *args, **kwargs):
-        parameters = {}
-        for key, val in list(kwargs.items()):
-            if key in allowed_params:
-                value = kwargs.pop(key)
-                if value is True:
-                    value = 1
-
-                if value is False:
-                    value = 0
-
-                parameters[key] = value
-
-        proccessed_path = path
-        path_args = re_path_template.findall(path)
-        for variable in path_args:
-            args = list(args)
-            try:
-                value = args.pop(0)
-            except IndexError:
-                raise Exception('Not enough positional arguments expects: %s' % (path_args))
 
-            value = str(getattr(value, 'id', value))
-            proccessed_path = proccessed_path.replace(variable, value)
+def prepare_call(endpoint, args, kwargs):
+    """
+    Split the arguments of an endpoint call into the url path, the query parameters and the
+    keyword arguments that are passed through to the request.
+    """
+    parameters = {}
+    for key, val in list(kwargs.items()):
+        if key in endpoint.allowed_params:
+            value = kwargs.pop(key)
+            if value is True:
+                value = 1
+
+            if value is False:
+                value = 0
+
+            parameters[key] = value
+
+    proccessed_path = endpoint.path
+    path_args = re_path_template.findall(endpoint.path)
+    for variable in path_args:
+        args = list(args)
+        try:
+            value = args.pop(0)
+        except IndexError:
+            raise Exception('Not enough positional arguments expects: %s' % (path_args))
+
+        value = str(getattr(value, 'id', value))
+        proccessed_path = proccessed_path.replace(variable, value)
 
-        resp_method = self.request
-        if method in ('POST', 'PUT', 'PATCH') and content_type == 'JSON' and kwargs.get('data'):
-            resp_method = self.request_json
+    return proccessed_path, parameters, kwargs
+
+
+def request_options(endpoint, api, kwargs):
+    """Keyword arguments for the request method besides the endpoint's own parameters."""
+    options = {'raw_response': endpoint.raw_response, 'hydrate': kwargs.get('hydrate', api.hydrate)}
+    if getattr(api, 'cache', None) is not None and endpoint.method == 'GET':
+        options['cache_ttl'] = api.cache_ttls.get(endpoint.func_name, endpoint.cache_ttl)
+
+    if getattr(api, 'instrumentation', None) is not None:
+        options['endpoint'] = endpoint.func_name
+
+    return options
+
+
+def uses_json_body(endpoint, kwargs):
+    return endpoint.method in ('POST', 'PUT', 'PATCH') and endpoint.content_type == 'JSON' and kwargs.get('data')
+
+
+def bulk_id_list(endpoint, kwargs):
+    """
+    The ids of a bulk lookup as a list of strings, or ``None`` when the call should be passed to
+    the server as it is (no ids, or ids already joined into a string).
+    """
+    ids = kwargs.get('ids')
+    if not endpoint.bulk_ids or ids is None or isinstance(ids, (str, bytes, int)):
+        return None
+
+    return [str(getattr(x, 'id', x)) for x in ids]
 
-        resp = resp_method(method, proccessed_path, params=parameters, raw_response=raw_response, **kwargs)
 
-        if raw_response:
-            return resp
+def batchable_id(endpoint, api, args, kwargs):
+    """
+    The id of a single-object lookup that the client's batch loader can merge into a bulk
+    request, or ``None``.
+    """
+    if not endpoint.batch_with or getattr(api, 'batch_loader', None) is None or len(args) != 1:
+        return None
+
+    if any(key not in endpoint.allowed_params for key in kwargs):
+        return None
+
+    id_ = str(getattr(args[0], 'id', args[0]))
+    return id_ if id_.isdigit() else None
+
 
-        # If the status code is 204 there won't be any JSON to parse
-        if getattr(resp, 'status_code', None) == 204:
-            return None
+def id_chunks(ids, size=MAX_BULK_IDS):
+    unique = list(collections.OrderedDict.fromkeys(ids))
+    return [unique[i:i + size] for i in range(0, len(unique), size)]
+
+
+def order_by_ids(ids, results):
+    """
+    Merge the ``(data, meta)`` results of the chunks of a bulk lookup, ordering the objects like
+    ``ids`` and marking missing ones with ``None``.
+    """
+    by_id = {}
+    meta = None
+    for data, chunk_meta in results:
+        meta = meta if meta is not None else chunk_meta
+        for obj in data:
+            by_id[str(obj['id'])] = obj
+
+    return [by_id.get(i) for i in ids], meta
+
+
+def empty_bulk_result(api, kwargs):
+    """What a bulk lookup of no ids returns without asking the server: no objects and an OK meta."""
+    meta = {'code': 200}
+    if kwargs.get('hydrate', api.hydrate):
+        meta = APIMeta.from_response_data(meta, api=api)
+
+    return [], meta
+
+
+def model_hydrator(endpoint, api, identity_map, hydrate=True):
+    """
+    The function turning one raw payload object of ``endpoint`` into the model ``api`` asks for.
+    """
+    if not hydrate:
+        return plain_payload
 
-        if payload_list:
-            resp.data = [payload_type.from_response_data(x, api=self) for x in resp.data]
+    payload_type = model_class(api, endpoint.payload_type)
+    hydrate = payload_type.from_response_data
+    if getattr(api, 'lazy_models', False) and issubclass(payload_type, APIModel):
+        hydrate = functools.partial(lazy_model, payload_type)
+
+    return functools.partial(hydrate, api=api, identity_map=identity_map)
+
+
+def plain_payload(data):
+    return data
+
+
+def hydrate_response(endpoint, api, resp):
+    """
+    Turn a checked response into the ``(data, meta)`` pair returned by endpoint methods.
+    """
+    if endpoint.raw_response:
+        return resp
+
+    # If the status code is 204 there won't be any JSON to parse
+    if getattr(resp, 'status_code', None) == 204:
+        return None
+
+    if not isinstance(resp, APIModel):
+        # Not hydrated, see parse_response
+        return resp.get('data'), resp.get('meta')
+
+    hydrate = model_hydrator(endpoint, api, IdentityMap(parent=getattr(api, 'identity_map', None)))
+
+    if isinstance(resp, LazyModel):
+        # Hand the raw payload to the model instead of the generic wrapper of the envelope
+        data = dict.get(resp, 'data')
+    else:
+        data = resp.data
+
+    with profile_phase(api, 'hydrate'):
+        if endpoint.payload_list:
+            resp.data = [hydrate(x) for x in data]
         else:
-            resp.data = payload_type.from_response_data(resp.data, api=self)
+            resp.data = hydrate(data)
 
-        resp.meta = APIMeta.from_response_data(resp.meta, api=self)
+        resp.meta = APIMeta.from_response_data(resp.meta, api=api)
 
-        return resp.data, resp.meta
+    return resp.data, resp.meta
+
+
+def check_stream(response, api):
+    """
+    Raise the error of a streamed response that failed, reading its body.
+    """
+    if response.status_code >= 400:
+        check_response(APIModel.from_string(response.content, api))
 
-    return_type = ':class:`%s.%s`' % (payload_type.__module__, payload_type.__name__)
-    if payload_list:
+    return response
+
+
+def endpoint_doc(endpoint):
+    return_type = ':class:`%s.%s`' % (endpoint.payload_type.__module__, endpoint.payload_type.__name__)
+    if endpoint.payload_list:
         return_type = 'list of %s' % (return_type)
 
     params_string = ''
-    params = re_path_template.findall(path)
+    params = re_path_template.findall(endpoint.path)
     params = [x.replace('{', '').replace('}', '') for x in params]
     if params:
         params_string += '\n'
@@ -166,21 +526,87 @@ def bind_api_method(func_name, path, payload_type=None, payload_list=False, allo
 
     arguments = ['*args', '**kwargs']
     if params:
-        arguments = params + ['%s=None' % x for x in allowed_params] + arguments
+        arguments = params + ['%s=None' % x for x in endpoint.allowed_params] + arguments
 
     arguments = ', '.join(arguments)
-    method_sig = '%s(%s)' % (func_name, arguments)
+    method_sig = '%s(%s)' % (endpoint.func_name, arguments)
     doc = """%s
     %s
     **API Endpoint**: `%s %s`
 
     **Returns**: %s
     %s
-    """ % (method_sig, extra_doc, method, path, return_type, params_string)
+    """ % (method_sig, endpoint.extra_doc, endpoint.method, endpoint.path, return_type, params_string)
+
+    return doc
+
+
+def bind_endpoint(cls, endpoint):
+    def run(self, *args, **kwargs):
+        if self.profiler is not None and current_profile() is None:
+            return self.profiler.run(endpoint.func_name, run, self, *args, **kwargs)
+
+        ids = bulk_id_list(endpoint, kwargs)
+        if ids is not None:
+            return run_bulk(self, ids, args, kwargs)
+
+        id_ = batchable_id(endpoint, self, args, kwargs)
+        if id_ is not None:
+            return self.batch_loader.load(endpoint.batch_with, id_, kwargs)
+
+        path, parameters, kwargs = prepare_call(endpoint, args, kwargs)
+
+        resp_method = self.request
+        if uses_json_body(endpoint, kwargs):
+            resp_method = self.request_json
+
+        kwargs.update(request_options(endpoint, self, kwargs))
+        if kwargs.get('stream') and endpoint.payload_list:
+            kwargs['raw_response'] = True
+            resp = resp_method(endpoint.method, path, params=parameters, **kwargs)
+            hydrate = model_hydrator(endpoint, self, stream_identity_map(self), kwargs['hydrate'])
+            return StreamedPage(check_stream(resp, self), hydrate, self.json_backend, self,
+                                plain_meta=not kwargs['hydrate'])
+
+        resp = resp_method(endpoint.method, path, params=parameters, **kwargs)
+
+        return hydrate_response(endpoint, self, resp)
+
+    def run_bulk(self, ids, args, kwargs):
+        if not ids:
+            return empty_bulk_result(self, kwargs)
 
-    run.__doc__ = doc
+        # The chunks have to be merged, so bulk lookups are never streamed
+        kwargs.pop('stream', None)
+        chunks = id_chunks(ids)
 
-    setattr(API, func_name, run)
+        def fetch(chunk):
+            return run(self, *args, **dict(kwargs, ids=','.join(chunk)))
+
+        if len(chunks) <= 1:
+            results = [fetch(chunk) for chunk in chunks]
+        else:
+            # Run every chunk in a copy of this context, so they add to the profile of the call
+            contexts = [contextvars.copy_context() for chunk in chunks]
+            with ThreadPoolExecutor(max_workers=min(len(chunks), self.bulk_concurrency)) as executor:
+                results = list(executor.map(lambda context, chunk: context.run(fetch, chunk), contexts, chunks))
+
+        return order_by_ids(ids, results)
+
+    run.__doc__ = endpoint_doc(endpoint)
+    run.__name__ = endpoint.func_name
+
+    setattr(cls, endpoint.func_name, run)
+
+
+def bind_api_method(func_name, path, payload_type=None, payload_list=False, allowed_params=None,
+                    method='GET', require_auth=True, raw_response=False, content_type='JSON', extra_doc='', link='#',
+                    bulk_ids=False, batch_with=None, cache_ttl=None):
+    endpoint = Endpoint(func_name, path, payload_type, payload_list, allowed_params or [], method, require_auth,
+                        raw_response, content_type, extra_doc, link, bulk_ids, batch_with, cache_ttl)
+    ENDPOINTS[func_name] = endpoint
+
+    bind_endpoint(API, endpoint)
 
 # Post methods
 
@@ -189,7 +615,7 @@ bind_api_method('create_post', '/posts', payload_type=Post, method='POST',
 
 
 bind_api_method('get_post', '/posts/{post_id}', payload_type=Post,
-                allowed_params=POST_PARAMS, require_auth=False)
+                allowed_params=POST_PARAMS, require_auth=False, batch_with='get_posts', cache_ttl=60)
 
 
 bind_api_method('delete_post', '/posts/{post_id}', payload_type=Post, method='DELETE',
@@ -213,7 +639,7 @@ bind_api_method('unbookmark_post', '/posts/{post_id}/bookmark', payload_type=Pos
 
 
 bind_api_method('get_posts', '/posts', payload_type=Post, payload_list=True,
-                allowed_params=PAGINATION_PARAMS + POST_PARAMS + ['ids'], require_auth=True)
+                allowed_params=PAGINATION_PARAMS + POST_PARAMS + ['ids'], require_auth=True, bulk_ids=True)
 
 
 bind_api_method('users_posts', '/users/{user_id}/posts', payload_type=Post, payload_list=True,
@@ -254,11 +680,11 @@ bind_api_method('post_search', '/posts/search', payload_type=Post, payload_list=
 # User methods
 
 bind_api_method('get_user', '/users/{user_id}', payload_type=User,
-                allowed_params=USER_PARAMS, require_auth=False)
+                allowed_params=USER_PARAMS, require_auth=False, batch_with='get_users', cache_ttl=60)
 
 
 bind_api_method('get_users', '/users', payload_type=User, payload_list=True,
-                allowed_params=PAGINATION_PARAMS + USER_PARAMS + ['ids'], require_auth=False)
+                allowed_params=PAGINATION_PARAMS + USER_PARAMS + ['ids'], require_auth=False, bulk_ids=True)
 
 
 bind_api_method('update_user', '/users/{user_id}', payload_type=User, method='PUT',
@@ -330,7 +756,7 @@ bind_api_method('user_presence', '/presence', payload_type=SimpleValueModel, pay
 
 
 bind_api_method('get_users_presence', '/users/{user_id}/presence', payload_type=SimpleValueModel, payload_list=False,
-                allowed_params=USER_PARAMS, require_auth=True)
+                allowed_params=USER_PARAMS, require_auth=True, cache_ttl=30)
 
 
 bind_api_method('update_users_presence', '/users/{user_id}/presence', payload_type=SimpleValueModel, payload_list=False,
@@ -349,11 +775,11 @@ bind_api_method('create_channel', '/channels', payload_type=Channel, method='POS
 
 
 bind_api_method('get_channel', '/channels/{channel_id}', payload_type=Channel,
-                allowed_params=CHANNEL_PARAMS, require_auth=True)
+                allowed_params=CHANNEL_PARAMS, require_auth=True, batch_with='get_channels', cache_ttl=60)
 
 
 bind_api_method('get_channels', '/channels', payload_type=Channel, payload_list=True,
-                allowed_params=PAGINATION_PARAMS + CHANNEL_PARAMS + ['ids'], require_auth=True)
+                allowed_params=PAGINATION_PARAMS + CHANNEL_PARAMS + ['ids'], require_auth=True, bulk_ids=True)
 
 
 bind_api_method('users_channels', '/users/me/channels', payload_type=Channel, payload_list=True,
@@ -406,11 +832,11 @@ bind_api_method('create_message', '/channels/{channel_id}/messages', payload_typ
 
 
 bind_api_method('get_message', '/channels/{channel_id}/messages/{message_id}', payload_type=Message,
-                allowed_params=MESSAGE_PARAMS, require_auth=True)
+                allowed_params=MESSAGE_PARAMS, require_auth=True, cache_ttl=60)
 
 
 bind_api_method('get_messages', '/channels/messages', payload_type=Message, payload_list=True,
-                allowed_params=PAGINATION_PARAMS + MESSAGE_PARAMS + ['ids'], require_auth=True)
+                allowed_params=PAGINATION_PARAMS + MESSAGE_PARAMS + ['ids'], require_auth=True, bulk_ids=True)
 
 
 bind_api_method('users_messages', '/users/me/messages', payload_type=Message, payload_list=True,
@@ -455,11 +881,11 @@ bind_api_method('get_file_content', '/files/{file_id}/content', payload_type=Fil
 
 
 bind_api_method('get_file', '/files/{file_id}', payload_type=File, method='GET',
-                allowed_params=FILE_PARAMS, require_auth=True)
+                allowed_params=FILE_PARAMS, require_auth=True, cache_ttl=60)
 
 
 bind_api_method('get_files', '/files', payload_type=File, method='GET', payload_list=True,
-                allowed_params=FILE_PARAMS + ['ids'], require_auth=True)
+                allowed_params=FILE_PARAMS + ['ids'], require_auth=True, bulk_ids=True)
 
 
 bind_api_method('delete_file', '/files/{file_id}', payload_type=File, method='DELETE',
@@ -480,7 +906,7 @@ bind_api_method('respond_to_poll', '/polls/{poll_id}/response/{position}', paylo
 
 
 bind_api_method('get_poll', '/polls/{poll_id}', payload_type=Poll, method='GET',
-                allowed_params=POLL_PARAMS, require_auth=True)
+                allowed_params=POLL_PARAMS, require_auth=True, cache_ttl=60)
 
 
 bind_api_method('delete_poll', '/polls/{poll_id}', payload_type=Poll, method='DELETE',
@@ -501,19 +927,19 @@ bind_api_method('text_process', '/text/process', payload_type=APIModel, method='
 
 
 # Token
-bind_api_method('get_token', '/token', payload_type=Token, require_auth=True)
+bind_api_method('get_token', '/token', payload_type=Token, require_auth=True, cache_ttl=300)
 
 
 # Config
-bind_api_method('get_config', '/sys/config', payload_type=APIModel, require_auth=True)
+bind_api_method('get_config', '/sys/config', payload_type=APIModel, require_auth=True, cache_ttl=3600)
 
 # Stats
-bind_api_method('get_stats', '/sys/stats', payload_type=APIModel, require_auth=True)
+bind_api_method('get_stats', '/sys/stats', payload_type=APIModel, require_auth=True, cache_ttl=300)
 
 
 # Explore Streams
 bind_api_method('get_explore_streams', '/posts/streams/explore', payload_type=ExploreStream, payload_list=True,
-                require_auth=False)
+                require_auth=False, cache_ttl=300)
 
 bind_api_method('get_explore_stream', '/posts/streams/explore/{slug}', payload_type=Post, payload_list=True,
                 allowed_params=PAGINATION_PARAMS + POST_PARAMS, require_auth=False)
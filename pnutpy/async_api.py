@@ -0,0 +1,326 @@
+"""
+.. module:: async_api
+   :synopsis: An asyncio client generated from the same endpoint table as :class:`pnutpy.api.API`.
+
+"""
+import asyncio
+import time
+
+import requests
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+from pnutpy.api import (ENDPOINTS, batchable_id, build_rate_limiter, bulk_id_list, check_stream, empty_bulk_result,
+                        endpoint_doc, hydrate_response, id_chunks, model_hydrator, order_by_ids, parse_response,
+                        prepare_call, request_options, uses_json_body)
+from pnutpy.cache import cache_key, invalidated_paths, validators
+from pnutpy.dates import TIMESTAMP_FORMATS
+from pnutpy.json_backends import default_backend, get_backend
+from pnutpy.errors import PnutError
+from pnutpy.loader import AsyncBatchLoader
+from pnutpy.metrics import build_instrumentation
+from pnutpy.profiling import build_profiler, current_profile
+from pnutpy.models import IdentityMap
+from pnutpy.stream import AsyncStreamedPage, stream_identity_map
+from pnutpy.utils import json_encoder
+
+
+class AsyncAPI(object):
+    """
+    The asyncio flavour of :class:`pnutpy.api.API`
+
+    Every endpoint method of :class:`pnutpy.api.API` is available as a coroutine with the same
+    arguments, return values and exceptions. It requires `httpx <https://www.python-httpx.org/>`_.
+
+    Example::
+
+        import pnutpy
+
+        async def main():
+            async with pnutpy.AsyncAPI.build_api(access_token='<access_token>') as api:
+                post, meta = await api.get_post(1)
+                posts, meta = await api.users_posts(post.user)
+
+    Like :class:`pnutpy.api.API` it paces requests with a shared
+    :class:`pnutpy.ratelimit.RateLimiter`. With ``batch_window`` set (``0`` batches the lookups of
+    one event loop iteration) single ``get_user``/``get_post``/``get_channel`` lookups are merged
+    into bulk requests, see :class:`pnutpy.loader.AsyncBatchLoader`. ``cache``, ``cache_ttls``,
+    ``identity_map``, ``lazy_models``, ``model_style``, ``timestamps``, ``json_backend`` and ``hydrate``
+    work as on :class:`pnutpy.api.API`. List endpoints called with ``stream=True`` return a
+    :class:`pnutpy.stream.AsyncStreamedPage` to consume with ``async for``. A
+    :class:`pnutpy.transport.Transport` as ``transport_config`` sets the connection limits, timeouts,
+    retries and HTTP/2 of the underlying ``httpx.AsyncClient``. ``instrumentation`` records
+    per endpoint metrics and ``profile`` times the phases of every call as on
+    :class:`pnutpy.api.API`.
+
+    """
+    def __init__(self, client=None):
+        self.client = client
+        self.headers = {}
+        self.api_root = None
+        self.verify_ssl = True
+        self.rate_limiter = None
+        self.bulk_concurrency = 4
+        self.batch_loader = None
+        self.cache = None
+        self.cache_ttls = {}
+        self.identity_map = None
+        self.lazy_models = False
+        self.model_style = 'dict'
+        self.timestamps = 'datetime'
+        self.json_backend = default_backend
+        self.hydrate = True
+        self.transport_config = None
+        self.instrumentation = None
+        self.profiler = None
+
+    @classmethod
+    def build_api(cls, api_root='https://api.pnut.io/v0', access_token=None, verify_ssl=True, extra_headers=None,
+                  rate_limiter=True, batch_window=None, cache=None, cache_ttls=None,
+                  identity_map=False, lazy_models=False, model_style='dict', timestamps='datetime', json_backend='auto',
+                  hydrate=True, transport_config=None, instrumentation=None, profile=False, **client_kwargs):
+        if httpx is None:
+            raise PnutError('AsyncAPI requires httpx, install it with: pip install pnutpy[async]')
+
+        if timestamps not in TIMESTAMP_FORMATS:
+            raise ValueError('timestamps must be one of %s' % (', '.join(TIMESTAMP_FORMATS)))
+
+        if transport_config is not None:
+            client_kwargs = dict(transport_config.httpx_options(), http2=transport_config.http2, **client_kwargs)
+
+        try:
+            client = httpx.AsyncClient(verify=verify_ssl, **client_kwargs)
+        except ImportError:
+            raise PnutError('HTTP/2 requires the h2 package, install it with: pip install pnutpy[http2]')
+
+        api = cls(client)
+        api.transport_config = transport_config
+        api.api_root = api_root
+        if access_token:
+            api.add_authorization_token(access_token)
+
+        api.verify_ssl = verify_ssl
+        api.headers.update(extra_headers if extra_headers else {})
+        api.rate_limiter = build_rate_limiter(rate_limiter)
+        if batch_window is not None:
+            api.batch_loader = AsyncBatchLoader(api, window=batch_window)
+
+        api.cache = cache
+        api.cache_ttls = cache_ttls or {}
+        if identity_map:
+            api.identity_map = IdentityMap(shared=True)
+
+        api.lazy_models = lazy_models
+        api.model_style = model_style
+        api.timestamps = timestamps
+        api.json_backend = get_backend(json_backend)
+        api.hydrate = hydrate
+        api.instrumentation = build_instrumentation(instrumentation)
+        api.profiler = build_profiler(profile)
+
+        return api
+
+    async def request(self, method, url, raw_response=False, params=None, data=None, headers=None, cache_ttl=None,
+                      stream=False, hydrate=True, endpoint=None, **kwargs):
+        path = url
+        if url:
+            url = self.api_root + url
+
+        request_headers = {}
+        request_headers.update(self.headers)
+        request_headers.update(headers or {})
+
+        # requests silently drops parameters that are None, httpx would send them empty
+        params = dict((k, v) for k, v in (params or {}).items() if v is not None)
+
+        # httpx wants pre-encoded bodies passed as content rather than data
+        if isinstance(data, (str, bytes)):
+            kwargs['content'] = data
+        elif data is not None:
+            kwargs['data'] = data
+
+        key, entry = None, None
+        if self.cache is not None and cache_ttl and method == 'GET' and not raw_response:
+            key = cache_key(method, path, params, request_headers)
+            entry = self.cache.get(key)
+            if entry is not None:
+                if self.cache.is_fresh(entry):
+                    return parse_response(entry.content, self, hydrate)
+
+                request_headers.update(validators(entry))
+
+        request = self.client.build_request(method, url, params=params, headers=request_headers, **kwargs)
+        if self.instrumentation is None:
+            response = await self.send_with_retries(request, stream)
+        else:
+            response = await self.send_instrumented(endpoint, path, request, stream)
+
+        if self.cache is not None and method not in ('GET', 'HEAD') and response.status_code < 400:
+            for prefix in invalidated_paths(path):
+                self.cache.invalidate(prefix)
+
+        if response.status_code == 204 or raw_response:
+            return response
+
+        if entry is not None and response.status_code == 304:
+            self.cache.set(key, self.cache.build_entry(path, entry.content, response.headers, cache_ttl, previous=entry))
+            return parse_response(entry.content, self, hydrate)
+
+        api_response = parse_response(response.content, self, hydrate)
+        if key is not None:
+            self.cache.set(key, self.cache.build_entry(path, response.content, response.headers, cache_ttl))
+
+        return api_response
+
+    async def send_instrumented(self, endpoint, path, request, stream=False):
+        """The async counterpart of :meth:`pnutpy.api.API.send_instrumented`."""
+        instrumentation = self.instrumentation
+        event = instrumentation.start(endpoint, request.method, path)
+        with instrumentation.open_span(event):
+            try:
+                response = await self.send_with_retries(request, stream, event)
+                event.response_received(response, None if stream else response.content)
+            except Exception as e:
+                instrumentation.finish(event, e)
+                raise
+
+            instrumentation.finish(event)
+
+        return response
+
+    async def send_with_retries(self, request, stream=False, event=None):
+        """The async counterpart of :meth:`pnutpy.api.API.send_with_retries`."""
+        transport = self.transport_config
+        profile = current_profile() if self.profiler is not None else None
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                if event is None and profile is None:
+                    await self.rate_limiter.wait_async()
+                else:
+                    started = time.perf_counter()
+                    await self.rate_limiter.wait_async()
+                    waited = time.perf_counter() - started
+                    if event is not None:
+                        event.rate_limit_wait += waited
+                    if profile is not None:
+                        profile.add('wait', waited)
+
+            try:
+                if profile is None:
+                    response = await self.client.send(request, stream=stream)
+                else:
+                    # Read the body separately to tell the time to the headers from the download
+                    started = time.perf_counter()
+                    response = await self.client.send(request, stream=True)
+                    ttfb = time.perf_counter() - started
+                    if not stream:
+                        await response.aread()
+
+                    profile.add('ttfb', ttfb)
+                    profile.add('download', time.perf_counter() - started - ttfb)
+            except httpx.TransportError as e:
+                if transport is None or not transport.can_retry(request.method, attempt):
+                    # The exceptions requests raises, so both clients fail the same way
+                    if isinstance(e, httpx.TimeoutException):
+                        raise requests.Timeout(str(e))
+
+                    raise requests.ConnectionError(str(e))
+            except httpx.HTTPError as e:
+                raise PnutError(str(e))
+            else:
+                if self.rate_limiter:
+                    self.rate_limiter.update(response.headers, response.status_code)
+
+                if transport is None or not transport.should_retry(request.method, response.status_code, attempt):
+                    return response
+
+                await response.aclose()
+
+            await asyncio.sleep(transport.delay(attempt))
+            attempt += 1
+            if event is not None:
+                event.retries = attempt
+
+    def add_authorization_token(self, token):
+        self.headers.update({
+            'Authorization': 'Bearer %s' % (token),
+        })
+
+    async def request_json(self, method, *args, **kwargs):
+        kwargs['headers'] = dict(kwargs.get('headers') or {})
+        kwargs['headers'].update({'Content-Type': 'application/json'})
+        if kwargs.get('data'):
+            kwargs['data'] = json_encoder(kwargs['data'], self.json_backend).encode('utf-8')
+
+        return await self.request(method, *args, **kwargs)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def bind_async_endpoint(cls, endpoint):
+    async def run(self, *args, **kwargs):
+        if self.profiler is not None and current_profile() is None:
+            return await self.profiler.run_async(endpoint.func_name, run, self, *args, **kwargs)
+
+        ids = bulk_id_list(endpoint, kwargs)
+        if ids is not None:
+            return await run_bulk(self, ids, args, kwargs)
+
+        id_ = batchable_id(endpoint, self, args, kwargs)
+        if id_ is not None:
+            return await self.batch_loader.load(endpoint.batch_with, id_, kwargs)
+
+        path, parameters, kwargs = prepare_call(endpoint, args, kwargs)
+
+        resp_method = self.request
+        if uses_json_body(endpoint, kwargs):
+            resp_method = self.request_json
+
+        kwargs.update(request_options(endpoint, self, kwargs))
+        if kwargs.get('stream') and endpoint.payload_list:
+            kwargs['raw_response'] = True
+            resp = await resp_method(endpoint.method, path, params=parameters, **kwargs)
+            if resp.status_code >= 400:
+                await resp.aread()
+
+            hydrate = model_hydrator(endpoint, self, stream_identity_map(self), kwargs['hydrate'])
+            return AsyncStreamedPage(check_stream(resp, self), hydrate, self.json_backend, self,
+                                     plain_meta=not kwargs['hydrate'])
+
+        resp = await resp_method(endpoint.method, path, params=parameters, **kwargs)
+
+        return hydrate_response(endpoint, self, resp)
+
+    async def run_bulk(self, ids, args, kwargs):
+        if not ids:
+            return empty_bulk_result(self, kwargs)
+
+        kwargs.pop('stream', None)
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await run(self, *args, **dict(kwargs, ids=','.join(chunk)))
+
+        results = await asyncio.gather(*[fetch(chunk) for chunk in id_chunks(ids)])
+        return order_by_ids(ids, results)
+
+    run.__doc__ = endpoint_doc(endpoint)
+    run.__name__ = endpoint.func_name
+
+    setattr(cls, endpoint.func_name, run)
+
+
+for _endpoint in ENDPOINTS.values():
+    bind_async_endpoint(AsyncAPI, _endpoint)
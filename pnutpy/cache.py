@@ -0,0 +1,214 @@
+"""
+.. module:: cache
+   :synopsis: Response caches for GET endpoints.
+
+"""
+import base64
+import collections
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+CacheEntry = collections.namedtuple('CacheEntry', ['path', 'content', 'etag', 'last_modified', 'expires_at'])
+
+# Path segments that can be used as directory names as they are
+re_safe_segment = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def cache_key(method, path, params, headers):
+    """
+    The cache key of a request: method, path, the sorted query parameters and a digest of the
+    access token, so responses are never shared between users.
+    """
+    query = '&'.join('%s=%s' % (k, v) for k, v in sorted((params or {}).items()) if v is not None)
+    auth = hashlib.sha1(headers.get('Authorization', '').encode('utf-8')).hexdigest()[:16]
+    return '%s %s?%s#%s' % (method, path, query, auth)
+
+
+def resource_path(path):
+    """
+    The resource a mutating request changes, e.g. ``/users/9`` for ``PUT /users/9/follow``.
+    """
+    parts = path.split('?')[0].strip('/').split('/')
+    return '/' + '/'.join(parts[:2])
+
+
+def invalidated_paths(path):
+    """
+    Every resource whose cached responses a mutating request to ``path`` makes stale: the one it
+    changes and ``/users/me``, whose counts (posts, following, bookmarks, ...) most writes change.
+
+    Writes to a collection, like ``POST /posts``, drop everything below it, including the
+    responses of posts the new one doesn't touch: a reply changes the counts of its thread and a
+    repost those of the original, which the path alone doesn't tell.
+    """
+    paths = [resource_path(path)]
+    if not affects('/users/me', paths[0]):
+        paths.append('/users/me')
+
+    return paths
+
+
+def key_path(key):
+    """The path of the request a :func:`cache_key` is for."""
+    return key.split(' ', 1)[-1].split('#')[0].split('?')[0]
+
+
+def validators(entry):
+    """Headers that turn a request for a stale entry into a conditional request."""
+    headers = {}
+    if entry.etag:
+        headers['If-None-Match'] = entry.etag
+    if entry.last_modified:
+        headers['If-Modified-Since'] = entry.last_modified
+
+    return headers
+
+
+def affects(entry_path, prefix):
+    return entry_path == prefix or entry_path.startswith(prefix + '/')
+
+
+class MemoryCache(object):
+    """
+    An in-process LRU cache.
+
+    :param max_entries: the number of responses to keep
+    """
+    def __init__(self, max_entries=1024, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        """The entry for ``key``, stale or not, or ``None``."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, prefix):
+        """Drop every entry for ``prefix`` and the paths below it."""
+        with self.lock:
+            for key in [k for k, entry in self.entries.items() if affects(entry.path, prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def is_fresh(self, entry):
+        return entry.expires_at > self.clock()
+
+    def build_entry(self, path, content, headers, ttl, previous=None):
+        """
+        An entry for a response that stays fresh for ``ttl`` seconds. ``previous`` is the stale
+        entry a ``304 Not Modified`` response confirmed.
+        """
+        etag = headers.get('ETag') or (previous.etag if previous else None)
+        last_modified = headers.get('Last-Modified') or (previous.last_modified if previous else None)
+        return CacheEntry(path, content, etag, last_modified, self.clock() + ttl)
+
+
+class FileCache(MemoryCache):
+    """
+    A cache that keeps one JSON file per response in ``directory``, so it survives restarts and can be
+    shared between processes.
+
+    The files of a resource (the first two segments of the path, e.g. ``/users/9``) are kept in a
+    directory of their own, so invalidating it removes that directory instead of reading every
+    entry.
+    """
+    def __init__(self, directory, clock=time.time):
+        super(FileCache, self).__init__(clock=clock)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def resource_directory(self, path):
+        parts = [part for part in path.split('?')[0].strip('/').split('/') if part]
+        return os.path.join(self.directory, *[segment_name(part) for part in parts[:2]])
+
+    def filename(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache'
+        return os.path.join(self.resource_directory(key_path(key)), name)
+
+    def get(self, key):
+        try:
+            with open(self.filename(key), 'r') as f:
+                return load_entry(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def set(self, key, entry):
+        filename = self.filename(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(dump_entry(entry), f)
+
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            os.replace(tmp, filename)
+        except OSError:
+            # Another process removed the resource directory in between
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def invalidate(self, prefix):
+        directory = self.resource_directory(prefix)
+        if len([part for part in prefix.strip('/').split('/') if part]) <= 2:
+            shutil.rmtree(directory, ignore_errors=True)
+            return
+
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                if not name.endswith('.cache'):
+                    continue
+
+                filename = os.path.join(root, name)
+                try:
+                    with open(filename, 'r') as f:
+                        entry_path = json.load(f)['path']
+                    if affects(entry_path, prefix):
+                        os.remove(filename)
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+
+    def clear(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.cache'):
+                    os.remove(os.path.join(root, name))
+
+
+def segment_name(segment):
+    """A directory name for a path segment; anything but plain names is hashed."""
+    if re_safe_segment.match(segment):
+        return segment
+
+    return '~' + hashlib.sha1(segment.encode('utf-8')).hexdigest()[:16]
+
+
+def dump_entry(entry):
+    data = entry._asdict()
+    data['content'] = base64.b64encode(entry.content).decode('ascii')
+    return data
+
+
+def load_entry(data):
+    return CacheEntry(data['path'], base64.b64decode(data['content'].encode('ascii')), data['etag'],
+                      data['last_modified'], float(data['expires_at']))
@@ -0,0 +1,149 @@
+"""
+.. module:: checkpoint
+   :synopsis: Save the position of a cursor so an interrupted run can continue.
+
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class FileCheckpointStore(object):
+    """
+    Keeps the checkpoints of any number of cursors in one JSON file. Every write replaces the
+    file atomically, so a crash leaves either the old or the new checkpoint behind.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, checkpoints):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(checkpoints, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def load(self, key):
+        with self.lock:
+            return self.read().get(key)
+
+    def save(self, key, state):
+        with self.lock:
+            checkpoints = self.read()
+            checkpoints[key] = state
+            self.write(checkpoints)
+
+    def clear(self, key):
+        with self.lock:
+            checkpoints = self.read()
+            if checkpoints.pop(key, None) is not None:
+                self.write(checkpoints)
+
+
+class SQLiteCheckpointStore(object):
+    """Keeps checkpoints in a table of a SQLite database, e.g. the one of a :class:`pnutpy.sync.SyncStore`."""
+    def __init__(self, path, table='checkpoints'):
+        self.table = table
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, state TEXT NOT NULL, '
+                                'updated_at REAL)' % (table))
+
+    def load(self, key):
+        with self.lock:
+            row = self.connection.execute('SELECT state FROM %s WHERE key = ?' % (self.table), (key,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def save(self, key, state):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO %s (key, state, updated_at) VALUES (?, ?, ?)' % (self.table),
+                                    (key, json.dumps(state), time.time()))
+
+    def clear(self, key):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM %s WHERE key = ?' % (self.table), (key,))
+
+    def close(self):
+        self.connection.close()
+
+
+class CallbackCheckpointStore(object):
+    """
+    Hands checkpoints to your own functions, e.g. to keep them next to the exported data.
+
+    :param save: called with ``(key, state)``
+    :param load: called with ``key``, returns the saved state or ``None``
+    :param clear: called with ``key`` once the cursor has finished
+    """
+    def __init__(self, save, load=None, clear=None):
+        self.save_callback = save
+        self.load_callback = load
+        self.clear_callback = clear
+
+    def load(self, key):
+        return self.load_callback(key) if self.load_callback else None
+
+    def save(self, key, state):
+        self.save_callback(key, state)
+
+    def clear(self, key):
+        if self.clear_callback:
+            self.clear_callback(key)
+
+
+def checkpoint_key(func, args, kwargs, paginate_param='before_id'):
+    """
+    A key for the cursor over ``func(*args, **kwargs)``, e.g. ``users_followers(1)?count=200``.
+    The pagination parameter is left out, as it is the position the checkpoint saves.
+    """
+    name = getattr(func, '__name__', repr(func))
+    params = '&'.join('%s=%s' % (k, v) for k, v in sorted(kwargs.items()) if k != paginate_param)
+    return '%s(%s)?%s' % (name, ','.join(str(getattr(x, 'id', x)) for x in args), params)
+
+
+class Checkpointer(object):
+    """
+    Restores and saves the position of one cursor.
+
+    The position is the value of the pagination parameter for the next page. It is saved after
+    every ``every`` fully consumed pages, so a resumed cursor repeats at most the pages consumed
+    since the last checkpoint, and never skips one. The checkpoint is cleared once the cursor
+    has reached the end.
+    """
+    def __init__(self, store, key, every=1):
+        self.store = store
+        self.key = key
+        self.every = every
+        self.pages = 0
+
+    def resume(self, kwargs, paginate_param):
+        state = self.store.load(self.key)
+        if state:
+            kwargs[paginate_param] = state['position']
+            self.pages = state.get('pages', 0)
+
+    def page_done(self, meta, paginate_on):
+        self.pages += 1
+        if not meta.get('more'):
+            self.store.clear(self.key)
+        elif self.pages % self.every == 0:
+            self.store.save(self.key, {'position': meta.get(paginate_on), 'pages': self.pages})
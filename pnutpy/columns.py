@@ -0,0 +1,153 @@
+"""
+.. module:: columns
+   :synopsis: Export cursor results as fixed-size columnar batches.
+
+"""
+import array
+import collections
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+from pnutpy.cursor import cursor
+from pnutpy.dates import parse_epoch
+from pnutpy.errors import PnutError
+
+# ``typecode`` is an :mod:`array` type code, or ``None`` for a list of Python objects
+Column = collections.namedtuple('Column', ['name', 'path', 'typecode', 'convert', 'default'])
+
+
+POST_COLUMNS = (
+    Column('id', ('id',), 'q', int, -1),
+    Column('created_at', ('created_at',), 'q', parse_epoch, -1),
+    Column('user_id', ('user', 'id'), 'q', int, -1),
+    Column('replies', ('counts', 'replies'), 'q', int, 0),
+    Column('reposts', ('counts', 'reposts'), 'q', int, 0),
+    Column('bookmarks', ('counts', 'bookmarks'), 'q', int, 0),
+    Column('is_deleted', ('is_deleted',), 'b', bool, False),
+    Column('thread_id', ('thread_id',), 'q', int, -1),
+)
+
+MESSAGE_COLUMNS = (
+    Column('id', ('id',), 'q', int, -1),
+    Column('channel_id', ('channel_id',), 'q', int, -1),
+    Column('created_at', ('created_at',), 'q', parse_epoch, -1),
+    Column('user_id', ('user', 'id'), 'q', int, -1),
+    Column('replies', ('counts', 'replies'), 'q', int, 0),
+    Column('is_deleted', ('is_deleted',), 'b', bool, False),
+    Column('thread_id', ('thread_id',), 'q', int, -1),
+)
+
+FORMATS = ('array', 'numpy', 'arrow')
+
+
+def column(name, path, typecode=None, convert=None, default=None):
+    """
+    Describe an extra column, e.g. ``column('text', 'content.text')``.
+
+    :param path: the dotted path of the field in the response objects
+    :param typecode: an :mod:`array` type code for a typed column, ``None`` for a list
+    """
+    return Column(name, tuple(path.split('.')), typecode, convert, default)
+
+
+def field(obj, path):
+    for key in path:
+        if obj is None:
+            return None
+
+        obj = obj.get(key)
+
+    return obj
+
+
+class ColumnBuilder(object):
+    """Collects the fields of ``columns`` from raw response objects into arrays."""
+    def __init__(self, columns):
+        self.columns = columns
+        self.reset()
+
+    def reset(self):
+        self.arrays = [array.array(c.typecode) if c.typecode else [] for c in self.columns]
+        self.rows = 0
+
+    def add(self, obj):
+        for c, values in zip(self.columns, self.arrays):
+            value = field(obj, c.path)
+            if value is None:
+                value = c.default
+            elif c.convert is not None:
+                value = c.convert(value)
+
+            values.append(value)
+
+        self.rows += 1
+
+    def build(self, format='array'):
+        """The collected columns as a batch of ``format``, then start over."""
+        arrays = self.arrays
+        self.reset()
+        if format == 'array':
+            return collections.OrderedDict((c.name, values) for c, values in zip(self.columns, arrays))
+
+        columns = collections.OrderedDict()
+        for c, values in zip(self.columns, arrays):
+            if c.typecode is None:
+                columns[c.name] = numpy.array(values, dtype=object)
+            elif c.typecode == 'b':
+                columns[c.name] = numpy.frombuffer(values, dtype=numpy.int8).astype(bool)
+            else:
+                # Shares the memory of the array instead of copying it
+                columns[c.name] = numpy.frombuffer(values, dtype=values.typecode)
+
+        if format == 'numpy':
+            return columns
+
+        return pyarrow.Table.from_pydict(dict(
+            (name, values if values.dtype != object else list(values)) for name, values in columns.items()))
+
+
+def check_format(format):
+    if format not in FORMATS:
+        raise ValueError('format must be one of %s' % (', '.join(FORMATS)))
+
+    if format in ('numpy', 'arrow') and numpy is None:
+        raise PnutError('The %s format requires numpy, install it with: pip install numpy' % (format))
+
+    if format == 'arrow' and pyarrow is None:
+        raise PnutError('The arrow format requires pyarrow, install it with: pip install pyarrow')
+
+
+def column_batches(func, *args, columns=POST_COLUMNS, batch_size=10000, format='array', **kwargs):
+    """
+    Iterate over a paginated endpoint like :func:`pnutpy.cursor.cursor`, but yield columnar
+    batches of up to ``batch_size`` objects instead of models::
+
+        for batch in column_batches(api.posts_streams_global, format='numpy'):
+            total += batch['replies'].sum()
+
+    Responses are requested with ``hydrate=False``, so no model is ever built. Every column is
+    filled from a field of the raw objects; ids and counts go into int64 arrays, timestamps
+    into int64 epochs and flags into int8 arrays. Missing fields take the column's default.
+
+    :param columns: the :class:`Column` definitions, :data:`POST_COLUMNS` by default, see
+        :data:`MESSAGE_COLUMNS` and :func:`column`
+    :param format: ``'array'`` for a dict of :class:`array.array`, ``'numpy'`` for a dict of
+        numpy arrays or ``'arrow'`` for a :class:`pyarrow.Table`
+    """
+    check_format(format)
+    builder = ColumnBuilder(columns)
+    for obj in cursor(func, *args, hydrate=False, **kwargs):
+        builder.add(obj)
+        if builder.rows >= batch_size:
+            yield builder.build(format)
+
+    if builder.rows:
+        yield builder.build(format)
@@ -0,0 +1,363 @@
+"""
+.. module:: compact
+   :synopsis: Slotted, typed alternatives to the dict based models.
+
+The classes here have the fields and methods of their counterparts in :mod:`pnutpy.models`, but
+keep them in ``__slots__`` instead of a dict, which makes each object a fraction of the size.
+Choose them with ``API.build_api(model_style='compact')``.
+
+Fields the server sends that a class does not declare are kept in a small ``extra`` dict, and
+nested objects other than ``content``, ``counts`` and ``source`` become :class:`Record` dicts with
+attribute access. Unlike the dict models, ``bookmarked_by`` and ``reposted_by`` of a post hold the
+same hydrated users as ``starred_by`` and ``reposters`` rather than a raw copy.
+"""
+import collections.abc
+
+from pnutpy import models
+from pnutpy.dates import decode_timestamp
+
+
+class Record(dict):
+    """A plain dict with attribute access for nested objects without a typed class."""
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def serialize(self):
+        return serialize_value(self)
+
+
+def plain(value, api=None, identity_map=None):
+    if isinstance(value, collections.abc.Mapping):
+        return Record((k, plain(v)) for k, v in value.items())
+
+    if value and isinstance(value, list) and isinstance(value[0], collections.abc.Mapping):
+        return [plain(x) for x in value]
+
+    return value
+
+
+def serialize_value(value):
+    if isinstance(value, (CompactModel, Record)):
+        return dict((k, serialize_value(v)) for k, v in value.items())
+
+    if isinstance(value, list):
+        return [serialize_value(x) for x in value]
+
+    return value
+
+
+class CompactModel(object):
+    """
+    The base class of the compact models.
+
+    Fields are read as attributes or with ``model['field']``; ``get``, ``items``, ``in`` and
+    ``serialize`` behave like on :class:`pnutpy.models.APIModel`.
+    """
+    __slots__ = ('_api', 'extra', '__weakref__')
+
+    # field name -> converter(value, api, identity_map)
+    converters = {}
+
+    @classmethod
+    def fields(cls):
+        """The names of the declared fields."""
+        names = cls.__dict__.get('_field_names')
+        if names is None:
+            names = []
+            for klass in reversed(cls.__mro__):
+                names.extend(x for x in klass.__dict__.get('__slots__', ()) if x not in ('_api', 'extra', '__weakref__'))
+
+            names = tuple(names)
+            setattr(cls, '_field_names', names)
+            setattr(cls, '_field_set', frozenset(names))
+
+        return names
+
+    @classmethod
+    def field_set(cls):
+        field_set = cls.__dict__.get('_field_set')
+        if field_set is None:
+            cls.fields()
+            field_set = cls.__dict__['_field_set']
+
+        return field_set
+
+    @classmethod
+    def from_response_data(cls, data, api=None, identity_map=None):
+        """
+       :param data: a dict
+       :param api: an instance of :class:`pnutpy.api.API`
+       :param identity_map: a :class:`pnutpy.models.IdentityMap` shared by the models of one response
+       :rtype: model obj
+        """
+        model = cls.__new__(cls)
+        model._api = api
+        model.extra = None
+        slots = cls.field_set()
+        for key, value in data.items():
+            converter = cls.converters.get(key, plain)
+            value = converter(value, api, identity_map)
+            if key in slots:
+                setattr(model, key, value)
+            else:
+                if model.extra is None:
+                    model.extra = {}
+                model.extra[key] = value
+
+        return model
+
+    def __getattr__(self, name):
+        extra = object.__getattribute__(self, 'extra') if name != 'extra' else None
+        if extra and name in extra:
+            return extra[name]
+
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.field_set():
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        try:
+            getattr(self, key)
+            return True
+        except AttributeError:
+            return False
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [key for key, value in self.items()]
+
+    def items(self):
+        items = []
+        for name in self.fields():
+            try:
+                items.append((name, getattr(self, name)))
+            except AttributeError:
+                continue
+
+        items.extend((self.extra or {}).items())
+        return items
+
+    def update(self, other):
+        for key, value in other.items():
+            self[key] = value
+
+    def serialize(self):
+        """
+        Converts the model into a normal dict without references to the api
+        """
+        return serialize_value(self)
+
+    def get_annotation(self, key, result_format='list'):
+        value = [x.get('value', {}) for x in (self.get('annotations') or []) if x.get('type') == key]
+        if not value:
+            return None
+
+        if result_format == 'one':
+            return value[0]
+
+        return value
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactModel):
+            return NotImplemented
+
+        return type(self) is type(other) and self.items() == other.items()
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, self.get('id'))
+
+    def __getstate__(self):
+        return dict(self.items())
+
+    def __setstate__(self, state):
+        self._api = None
+        self.extra = None
+        for key, value in state.items():
+            self[key] = value
+
+
+class Content(CompactModel):
+    __slots__ = ('text', 'html', 'entities', 'links_not_parsed', 'mentions_not_parsed', 'avatar_image', 'cover_image',
+                 'markdown_text')
+
+
+class Counts(CompactModel):
+    __slots__ = ('bookmarks', 'replies', 'reposts', 'threads', 'clients', 'followers', 'following', 'posts', 'users',
+                 'messages', 'subscribers')
+
+
+class Source(CompactModel):
+    __slots__ = ('id', 'name', 'link', 'url')
+
+
+def _compact(cls):
+    def convert(value, api, identity_map):
+        return cls.from_response_data(value, api, identity_map) if value else value
+
+    return convert
+
+
+def _compact_list(cls):
+    def convert(value, api, identity_map):
+        return [cls.from_response_data(x, api, identity_map) for x in value]
+
+    return convert
+
+
+def _int(value, api, identity_map):
+    return int(value)
+
+
+def _date(value, api, identity_map):
+    return decode_timestamp(value, api)
+
+
+class User(CompactModel):
+    """
+    The compact User Model
+    """
+    __slots__ = ('id', 'username', 'name', 'created_at', 'type', 'locale', 'timezone', 'content', 'counts', 'badge',
+                 'verified', 'presence', 'follows_you', 'you_blocked', 'you_follow', 'you_muted', 'you_can_follow', 'raw')
+
+    @classmethod
+    def from_response_data(cls, data, api=None, identity_map=None):
+        if identity_map is not None:
+            user = identity_map.get(User, data.get('id'))
+            if user is not None:
+                return user
+
+        user = super(User, cls).from_response_data(data, api, identity_map)
+        if identity_map is not None:
+            user = identity_map.add(User, user.id, user)
+
+        return user
+
+    update_user = models.User.update_user
+    follow_user = models.User.follow_user
+    unfollow_user = models.User.unfollow_user
+    mute_user = models.User.mute_user
+    unmute_user = models.User.unmute_user
+    block_user = models.User.block_user
+    unblock_user = models.User.unblock_user
+
+
+class Post(CompactModel):
+    """
+    The compact Post Model
+    """
+    __slots__ = ('id', 'created_at', 'user', 'thread_id', 'reply_to', 'is_deleted', 'is_nsfw', 'is_revised', 'revision',
+                 'source', 'content', 'counts', 'you_bookmarked', 'you_reposted', 'repost_of', 'bookmarked_by',
+                 'reposted_by', 'starred_by', 'reposters', 'raw')
+
+    @classmethod
+    def from_response_data(cls, data, api=None, identity_map=None):
+        if identity_map is not None:
+            post = identity_map.get(Post, data.get('id'))
+            if post is not None:
+                return post
+
+        post = super(Post, cls).from_response_data(data, api, identity_map)
+        if 'user' not in data:
+            post.user = None
+
+        post.starred_by = post.get('bookmarked_by') or []
+        post.reposters = post.get('reposted_by') or []
+
+        if identity_map is not None:
+            post = identity_map.add(Post, post.id, post)
+
+        return post
+
+    delete = models.Post.delete
+    repost = models.Post.repost
+    unrepost = models.Post.unrepost
+    bookmark = models.Post.bookmark
+    unbookmark = models.Post.unbookmark
+
+
+class Message(CompactModel):
+    """
+    The compact Message Model
+    """
+    __slots__ = ('id', 'channel_id', 'created_at', 'user', 'thread_id', 'reply_to', 'is_deleted', 'is_sticky', 'source',
+                 'content', 'counts', 'raw')
+
+    @classmethod
+    def from_response_data(cls, data, api=None, identity_map=None):
+        message = super(Message, cls).from_response_data(data, api, identity_map)
+        if 'user' not in data:
+            message.user = None
+
+        return message
+
+
+class Channel(CompactModel):
+    """
+    The compact Channel Model
+    """
+    __slots__ = ('id', 'type', 'owner', 'acl', 'counts', 'is_active', 'has_unread', 'you_subscribed', 'you_muted',
+                 'recent_message_id', 'recent_message', 'raw')
+
+
+class Interaction(CompactModel):
+    """
+    The compact Interaction Model
+    """
+    __slots__ = ('action', 'event_date', 'objects', 'users', 'pagination_id')
+
+    @classmethod
+    def from_response_data(cls, data, api=None, identity_map=None):
+        api_model = User if data.get('action') == 'follow' else Post
+        data = dict(data)
+        objects = data.pop('objects', [])
+        interaction = super(Interaction, cls).from_response_data(data, api, identity_map)
+        interaction.objects = [api_model.from_response_data(x, api, identity_map) for x in objects]
+        return interaction
+
+
+User.converters = {'id': _int, 'created_at': _date, 'content': _compact(Content), 'counts': _compact(Counts)}
+Post.converters = {'id': _int, 'created_at': _date, 'user': _compact(User), 'repost_of': _compact(Post),
+                   'bookmarked_by': _compact_list(User), 'reposted_by': _compact_list(User),
+                   'content': _compact(Content), 'counts': _compact(Counts), 'source': _compact(Source)}
+Message.converters = {'id': _int, 'created_at': _date, 'user': _compact(User), 'content': _compact(Content),
+                      'counts': _compact(Counts), 'source': _compact(Source)}
+Channel.converters = {'owner': _compact(User), 'counts': _compact(Counts), 'recent_message': _compact(Message)}
+Interaction.converters = {'event_date': _date, 'users': _compact_list(User)}
+
+# The compact class standing in for each model of pnutpy.models; the rest keep their dict models
+MODEL_CLASSES = {
+    models.User: User,
+    models.Post: Post,
+    models.Message: Message,
+    models.Channel: Channel,
+    models.Interaction: Interaction,
+}
+
+
+def model_class(api, payload_type):
+    """The class ``api`` hydrates payloads of ``payload_type`` with."""
+    if getattr(api, 'model_style', 'dict') == 'compact':
+        return MODEL_CLASSES.get(payload_type, payload_type)
+
+    return payload_type
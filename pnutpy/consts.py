@@ -1,7 +1,13 @@
+# The most ids the bulk lookup endpoints accept in one request
+MAX_BULK_IDS = 200
+
+
 PAGINATION_PARAMS = [
     'since_id',
     'before_id',
     'count',
+    # Subscribes the endpoint to a user stream, see pnutpy.realtime
+    'connection_id',
 ]
 
 
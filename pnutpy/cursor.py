@@ -1,37 +1,430 @@
+import asyncio
 import logging
+import queue
+import threading
 import time
 
+from pnutpy.checkpoint import Checkpointer, checkpoint_key
 from pnutpy.errors import PnutRateLimitAPIException
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of the pages handed over by a prefetching producer
+_DONE = object()
 
-def get_data(func, args, kwargs, sleep=None):
-    try:
-        data, meta = func(*args, **kwargs)
-    except PnutRateLimitAPIException:
-        if sleep:
-            sleep = sleep * 2
-        else:
-            sleep = 10
 
-        logger.debug('Hit ratelimit sleeping: %s seconds', sleep)
-        time.sleep(sleep)
-        return get_data(func, kwargs, sleep)
+def rate_limit_backoff(func, sleep):
+    """
+    How long to sleep after ``func`` hit the rate limit, or ``None`` when the client's
+    :class:`pnutpy.ratelimit.RateLimiter` already holds the next request back until the
+    rate limit window resets.
+    """
+    limiter = getattr(getattr(func, '__self__', None), 'rate_limiter', None)
+    if limiter is not None and limiter.knows_reset():
+        return None
 
-    return data, meta
+    return sleep * 2 if sleep else 10
 
 
-def cursor(func, *args, **kwargs):
+def get_data(func, args, kwargs):
+    sleep = None
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except PnutRateLimitAPIException:
+            sleep = rate_limit_backoff(func, sleep)
+            if sleep:
+                logger.debug('Hit ratelimit sleeping: %s seconds', sleep)
+                time.sleep(sleep)
+
+
+async def get_data_async(func, args, kwargs):
+    sleep = None
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except PnutRateLimitAPIException:
+            sleep = rate_limit_backoff(func, sleep)
+            if sleep:
+                logger.debug('Hit ratelimit sleeping: %s seconds', sleep)
+                await asyncio.sleep(sleep)
+
 
+def pagination_options(kwargs):
     paginate_on = kwargs.pop('paginate_on', 'min_id')
     paginate_param = kwargs.pop('paginate_param', 'before_id')
     kwargs['count'] = kwargs.pop('count', 200)
+    return paginate_on, paginate_param
+
+
+def pages(func, *args, **kwargs):
+    """
+    Yield ``(data, meta)`` for every page of a paginated endpoint, newest first.
+    """
+    paginate_on, paginate_param = pagination_options(kwargs)
     more = True
 
     while more:
         data, meta = get_data(func, args, kwargs)
-        more = meta.more
+        more = meta.get('more')
         kwargs[paginate_param] = meta.get(paginate_on)
+        yield data, meta
+
+
+def cursor(func, *args, **kwargs):
+    """
+    Iterate over every object of a paginated endpoint, fetching pages as needed::
+
+        for post in cursor(api.users_posts, 1, count=200):
+            ...
+
+    :param prefetch: fetch up to this many pages ahead on a background thread while the
+        current page is being consumed. ``0`` (the default) fetches each page only once the
+        previous one is used up.
+    :param checkpoint: a store from :mod:`pnutpy.checkpoint` to save the position in, so a
+        cursor built again with the same arguments continues where the last one stopped
+    :param checkpoint_key: the name of the checkpoint, by default derived from the method and
+        its arguments
+    :param checkpoint_every: save the position after this many consumed pages (default ``1``)
+    """
+    prefetch = kwargs.pop('prefetch', 0)
+    checkpointer = build_checkpointer(func, args, kwargs)
+    page_iter = pages(func, *args, **kwargs)
+    if prefetch:
+        page_iter = prefetch_pages(page_iter, prefetch)
+
+    if checkpointer is not None:
+        return checkpointed(page_iter, checkpointer, kwargs.get('paginate_on', 'min_id'))
+
+    return (obj for data, meta in page_iter for obj in data)
+
+
+def build_checkpointer(func, args, kwargs):
+    """
+    The :class:`pnutpy.checkpoint.Checkpointer` of a cursor, moving a saved position into
+    ``kwargs``, or ``None``.
+    """
+    store = kwargs.pop('checkpoint', None)
+    key = kwargs.pop('checkpoint_key', None)
+    every = kwargs.pop('checkpoint_every', 1)
+    if store is None:
+        return None
+
+    paginate_param = kwargs.get('paginate_param', 'before_id')
+    checkpointer = Checkpointer(store, key or checkpoint_key(func, args, kwargs, paginate_param), every)
+    checkpointer.resume(kwargs, paginate_param)
+    return checkpointer
+
+
+def checkpointed(page_iter, checkpointer, paginate_on):
+    for data, meta in page_iter:
         for obj in data:
             yield obj
+
+        checkpointer.page_done(meta, paginate_on)
+
+
+def prefetch_pages(page_iter, depth):
+    """
+    Consume ``page_iter`` on a background thread, keeping at most ``depth`` pages buffered.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def hand_over(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce():
+        try:
+            for page in page_iter:
+                if not hand_over((page, None)):
+                    return
+        except Exception as e:
+            hand_over((None, e))
+            return
+
+        hand_over((_DONE, None))
+
+    worker = threading.Thread(target=produce, name='pnutpy-cursor-prefetch', daemon=True)
+    worker.start()
+
+    try:
+        while True:
+            page, error = buffer.get()
+            if error is not None:
+                raise error
+
+            if page is _DONE:
+                return
+
+            yield page
+    finally:
+        stop.set()
+
+
+async def async_pages(func, *args, **kwargs):
+    """
+    The asyncio version of :func:`pages` for :class:`pnutpy.async_api.AsyncAPI` methods.
+    """
+    paginate_on, paginate_param = pagination_options(kwargs)
+    more = True
+
+    while more:
+        data, meta = await get_data_async(func, args, kwargs)
+        more = meta.get('more')
+        kwargs[paginate_param] = meta.get(paginate_on)
+        yield data, meta
+
+
+async def async_cursor(func, *args, **kwargs):
+    """
+    Iterate over every object of a paginated :class:`pnutpy.async_api.AsyncAPI` endpoint::
+
+        async for post in async_cursor(api.users_posts, 1, count=200):
+            ...
+
+    The next page is requested as soon as the current one arrives, so the network round trip
+    overlaps with the time spent consuming it.
+
+    :param prefetch: the number of pages to fetch ahead of the consumer (default ``1``).
+        ``0`` disables prefetching.
+
+    ``checkpoint``, ``checkpoint_key`` and ``checkpoint_every`` work as for :func:`cursor`.
+    """
+    prefetch = kwargs.pop('prefetch', 1)
+    checkpointer = build_checkpointer(func, args, kwargs)
+    paginate_on = kwargs.get('paginate_on', 'min_id')
+    page_iter = async_pages(func, *args, **kwargs)
+
+    if not prefetch:
+        async for data, meta in page_iter:
+            for obj in data:
+                yield obj
+
+            if checkpointer is not None:
+                checkpointer.page_done(meta, paginate_on)
+
+        return
+
+    buffer = asyncio.Queue(maxsize=prefetch)
+
+    async def produce():
+        try:
+            async for page in page_iter:
+                await buffer.put((page, None))
+        except Exception as e:
+            await buffer.put((None, e))
+            return
+
+        await buffer.put((_DONE, None))
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            page, error = await buffer.get()
+            if error is not None:
+                raise error
+
+            if page is _DONE:
+                return
+
+            data, meta = page
+            for obj in data:
+                yield obj
+
+            if checkpointer is not None:
+                checkpointer.page_done(meta, paginate_on)
+    finally:
+        producer.cancel()
+
+
+def id_slices(since_id, before_id, partitions):
+    """
+    Split the ids between ``since_id`` and ``before_id`` (both exclusive, like the pnut.io
+    pagination parameters) into at most ``partitions`` contiguous ``(low, high)`` ranges,
+    newest first. Each range holds the ids ``low <= id < high``.
+    """
+    low, high = since_id + 1, before_id
+    if high <= low:
+        return []
+
+    partitions = max(1, min(partitions, high - low))
+    step, extra = divmod(high - low, partitions)
+    bounds = [low]
+    for i in range(partitions):
+        bounds.append(bounds[-1] + step + (1 if i < extra else 0))
+
+    return [(bounds[i], bounds[i + 1]) for i in reversed(range(partitions))]
+
+
+def in_slice(data, low, high):
+    return [obj for obj in data if low <= int(obj['id']) < high]
+
+
+def backfill_options(kwargs):
+    """
+    Pop the options of :func:`backfill` from ``kwargs``; returns ``partitions``, ``ordered``,
+    ``buffer``, ``since_id`` and ``before_id`` (``None`` when the newest id has to be looked up).
+    """
+    partitions = kwargs.pop('partitions', 4)
+    ordered = kwargs.pop('ordered', True)
+    buffer = kwargs.pop('buffer', 2)
+    kwargs.pop('paginate_on', None)
+    kwargs.pop('paginate_param', None)
+    since_id = int(kwargs.pop('since_id', None) or 0)
+    before_id = kwargs.pop('before_id', None)
+    return partitions, ordered, buffer, since_id, None if before_id is None else int(before_id)
+
+
+def newest_before_id(meta):
+    return int(meta.get('max_id') or 0) + 1
+
+
+class SliceMerge(object):
+    """
+    The queues the workers of a backfill hand their pages over on, and the order the consumer
+    reads them in. ``make_queue(maxsize)`` builds a :class:`queue.Queue` or an
+    :class:`asyncio.Queue`.
+
+    Ordered, every slice has a queue of its own that is read once the slices before it are done.
+    Those queues are unbounded so the workers of later slices keep fetching meanwhile. Unordered,
+    all workers share one queue of ``buffer`` pages per slice.
+    """
+    def __init__(self, slices, ordered, buffer, make_queue):
+        if ordered:
+            self.queues = [make_queue(0) for _ in slices]
+        else:
+            self.queues = [make_queue(buffer * len(slices) or 1)] * len(slices)
+
+        self.ordered = ordered
+        self.index = 0
+        self.remaining = len(slices)
+
+    def current(self):
+        """The queue to take the next page from."""
+        return self.queues[self.index]
+
+    def take(self, item):
+        """The objects of a page taken from :meth:`current`; raises the error of a worker."""
+        data, error = item
+        if error is not None:
+            raise error
+
+        if data is _DONE:
+            self.remaining -= 1
+            if self.ordered:
+                self.index += 1
+            return []
+
+        return data
+
+
+def backfill(func, *args, **kwargs):
+    """
+    Walk the ids between ``since_id`` and ``before_id`` of a paginated endpoint with several
+    workers at once::
+
+        for post in backfill(api.posts_streams_global, since_id=1000, before_id=500000, partitions=8):
+            ...
+
+    The range is split into ``partitions`` id slices. Each slice is paged on its own thread and
+    stops at its boundaries, so no object is emitted twice. When ``before_id`` is omitted the
+    newest id of the stream is used.
+
+    :param partitions: the number of slices (and worker threads), default ``4``
+    :param ordered: yield newest first like :func:`cursor` (the default). The workers of later
+        slices don't wait for the consumer, so up to all of their pages are held in memory until
+        it gets to them. With ``False`` objects are yielded as soon as any worker has them, and
+        memory stays bounded by ``buffer``.
+    :param buffer: with ``ordered=False``, the number of pages each worker may hold before
+        waiting for the consumer
+    """
+    partitions, ordered, buffer, since_id, before_id = backfill_options(kwargs)
+    if before_id is None:
+        data, meta = get_data(func, args, dict(kwargs, count=1))
+        before_id = newest_before_id(meta)
+
+    slices = id_slices(since_id, before_id, partitions)
+    merge = SliceMerge(slices, ordered, buffer, queue.Queue)
+    stop = threading.Event()
+
+    def hand_over(target, item):
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce(index, low, high):
+        slice_kwargs = dict(kwargs, since_id=low - 1, before_id=high)
+        target = merge.queues[index]
+        try:
+            for data, meta in pages(func, *args, **slice_kwargs):
+                if not hand_over(target, (in_slice(data, low, high), None)):
+                    return
+        except Exception as e:
+            hand_over(target, (None, e))
+            return
+
+        hand_over(target, (_DONE, None))
+
+    workers = [threading.Thread(target=produce, args=(i, low, high), name='pnutpy-backfill-%s' % i, daemon=True)
+               for i, (low, high) in enumerate(slices)]
+
+    def consume():
+        for worker in workers:
+            worker.start()
+
+        try:
+            while merge.remaining:
+                for obj in merge.take(merge.current().get()):
+                    yield obj
+        finally:
+            stop.set()
+
+    return consume()
+
+
+async def async_backfill(func, *args, **kwargs):
+    """
+    The asyncio version of :func:`backfill` for :class:`pnutpy.async_api.AsyncAPI` methods, with
+    one task per slice.
+    """
+    partitions, ordered, buffer, since_id, before_id = backfill_options(kwargs)
+    if before_id is None:
+        data, meta = await get_data_async(func, args, dict(kwargs, count=1))
+        before_id = newest_before_id(meta)
+
+    slices = id_slices(since_id, before_id, partitions)
+    merge = SliceMerge(slices, ordered, buffer, asyncio.Queue)
+
+    async def produce(index, low, high):
+        slice_kwargs = dict(kwargs, since_id=low - 1, before_id=high)
+        target = merge.queues[index]
+        try:
+            async for data, meta in async_pages(func, *args, **slice_kwargs):
+                await target.put((in_slice(data, low, high), None))
+        except Exception as e:
+            await target.put((None, e))
+            return
+
+        await target.put((_DONE, None))
+
+    tasks = [asyncio.ensure_future(produce(i, low, high)) for i, (low, high) in enumerate(slices)]
+    try:
+        while merge.remaining:
+            for obj in merge.take(await merge.current().get()):
+                yield obj
+    finally:
+        for task in tasks:
+            task.cancel()
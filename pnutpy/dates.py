@@ -0,0 +1,81 @@
+"""
+.. module:: dates
+   :synopsis: Decoding of the timestamps in API responses.
+
+"""
+import calendar
+import functools
+from datetime import datetime, timezone
+
+from dateutil.parser import parse
+
+from pnutpy.profiling import profile_phase
+
+TIMESTAMP_FORMATS = ('datetime', 'string', 'epoch')
+
+
+def _fields(value):
+    """
+    The date and time fields of the ``YYYY-MM-DDTHH:MM:SSZ`` timestamps pnut.io sends, or ``None``
+    for anything else.
+    """
+    if len(value) != 20 or value[4] != '-' or value[7] != '-' or value[10] != 'T' or value[13] != ':' \
+            or value[16] != ':' or value[19] != 'Z':
+        return None
+
+    try:
+        return (int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), int(value[14:16]),
+                int(value[17:19]))
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_datetime(value):
+    """
+    Parse a timestamp into an aware :class:`datetime.datetime`.
+
+    The fixed format the API uses is decoded directly; anything else goes through
+    :func:`dateutil.parser.parse`. Results are cached, since the same timestamps come back with
+    every repost and embedded user.
+    """
+    fields = _fields(value)
+    if fields is not None:
+        try:
+            return datetime(*fields, tzinfo=timezone.utc)
+        except ValueError:
+            pass
+
+    return parse(value)
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_epoch(value):
+    """Parse a timestamp into seconds since the epoch."""
+    fields = _fields(value)
+    if fields is not None:
+        return calendar.timegm(fields)
+
+    return int(parse_datetime(value).timestamp())
+
+
+def decode_timestamp(value, api=None):
+    """
+    Decode a timestamp the way the client ``api`` asks for with its ``timestamps`` setting:
+    ``'datetime'`` (the default), ``'epoch'`` for an int or ``'string'`` to keep it as it is.
+    """
+    if not isinstance(value, str):
+        return value
+
+    timestamps = getattr(api, 'timestamps', 'datetime')
+    if timestamps == 'string':
+        return value
+
+    if getattr(api, 'profiler', None) is not None:
+        with profile_phase(api, 'dates'):
+            return parse_epoch(value) if timestamps == 'epoch' else parse_datetime(value)
+
+    if timestamps == 'epoch':
+        return parse_epoch(value)
+
+    return parse_datetime(value)
@@ -0,0 +1,106 @@
+"""
+.. module:: json_backends
+   :synopsis: The JSON parsers and serializers pnutpy can use.
+
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from pnutpy.errors import PnutError
+
+
+def _default(obj):
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    elif hasattr(obj, 'serialize'):
+        return obj.serialize()
+
+    raise TypeError('Object of type %s is not JSON serializable' % (type(obj).__name__))
+
+
+def _serialized(data):
+    """
+    ``data`` with its models replaced by what ``_default`` makes of them. The stdlib encoder
+    writes dict subclasses as they are, without ever calling ``default`` for them.
+    """
+    if hasattr(data, 'serialize'):
+        return _serialized(_default(data))
+    elif isinstance(data, dict):
+        return dict((k, _serialized(v)) for k, v in data.items())
+    elif isinstance(data, (list, tuple)):
+        return [_serialized(v) for v in data]
+
+    return data
+
+
+class StdlibBackend(object):
+    """
+    The :mod:`json` module of the standard library, writing the same compact UTF-8 JSON as
+    :class:`OrjsonBackend`.
+    """
+    name = 'json'
+
+    def loads(self, raw_json):
+        # json.loads detects the encoding of bytes itself
+        return json.loads(raw_json)
+
+    def dumps(self, data):
+        return json.dumps(_serialized(data), default=_default, separators=(',', ':'), ensure_ascii=False)
+
+
+class OrjsonBackend(object):
+    """
+    `orjson <https://github.com/ijl/orjson>`_, which parses bytes directly and encodes datetimes
+    natively. Its output matches :class:`StdlibBackend` where requests depend on it: ``dumps``
+    returns a string, and non-string dict keys are turned into strings.
+    """
+    name = 'orjson'
+
+    # Models are dict subclasses, but have to go through serialize() to drop their internal keys
+    options = orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def loads(self, raw_json):
+        return orjson.loads(raw_json)
+
+    def dumps(self, data):
+        return orjson.dumps(data, default=_default, option=self.options).decode('utf-8')
+
+
+BACKENDS = {
+    'json': StdlibBackend,
+    'orjson': OrjsonBackend,
+}
+
+
+def available_backends():
+    """The names of the backends that can be used here."""
+    return [name for name in BACKENDS if name == 'json' or globals().get(name) is not None]
+
+
+def get_backend(backend='auto'):
+    """
+    The JSON backend named ``backend``.
+
+    :param backend: ``'auto'`` for the fastest installed backend, ``'json'``, ``'orjson'``, or any
+        object with ``loads(bytes)`` and ``dumps(data)`` methods
+    """
+    if not isinstance(backend, str):
+        return backend
+
+    if backend == 'auto':
+        backend = available_backends()[-1]
+
+    if backend not in BACKENDS:
+        raise ValueError('json_backend must be one of auto, %s' % (', '.join(BACKENDS)))
+
+    if backend not in available_backends():
+        raise PnutError('The %s json backend is not installed, install it with: pip install %s' % (backend, backend))
+
+    return BACKENDS[backend]()
+
+
+default_backend = StdlibBackend()
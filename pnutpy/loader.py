@@ -0,0 +1,143 @@
+"""
+.. module:: loader
+   :synopsis: Coalesce single-object lookups into bulk requests.
+
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from pnutpy.consts import MAX_BULK_IDS
+from pnutpy.errors import PnutMissing
+from pnutpy.models import APIModel
+
+
+def missing_error(id_):
+    return PnutMissing(APIModel({'meta': {'code': 404, 'error_message': 'Not found: %s' % (id_)}}))
+
+
+def batch_key(many_name, params):
+    return many_name, tuple(sorted(params.items()))
+
+
+class Batch(list):
+    """The ``(id, future)`` pairs of one bulk request, and the timer that sends it."""
+    timer = None
+
+    def cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+class BatchLoader(object):
+    """
+    Collects ``get_user``/``get_post``/``get_channel`` calls made within ``window`` seconds of
+    each other (from any thread) and sends them as one ``get_users``/``get_posts``/``get_channels``
+    request.
+
+    Every caller still gets its own ``(obj, meta)`` or :class:`pnutpy.errors.PnutMissing`.
+    Enable it with ``API.build_api(batch_window=0.01)``.
+    """
+    def __init__(self, api, window=0.005, max_batch=MAX_BULK_IDS):
+        self.api = api
+        self.window = window
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def load(self, many_name, id_, params):
+        key = batch_key(many_name, params)
+        future = Future()
+        with self.lock:
+            batch = self.pending.get(key)
+            if batch is None:
+                batch = self.pending[key] = Batch()
+                batch.timer = threading.Timer(self.window, self.flush, args=(key, batch))
+                batch.timer.daemon = True
+                batch.timer.start()
+
+            batch.append((str(id_), future))
+            full = len(batch) >= self.max_batch
+
+        if full:
+            self.flush(key, batch)
+
+        return future.result()
+
+    def flush(self, key, batch):
+        # The timer of a batch flushed early must not cut the next batch of the key short
+        with self.lock:
+            if self.pending.get(key) is not batch:
+                return
+
+            del self.pending[key]
+
+        batch.cancel_timer()
+
+        many_name, params = key
+        try:
+            data, meta = getattr(self.api, many_name)(ids=[id_ for id_, future in batch], **dict(params))
+        except Exception as e:
+            for id_, future in batch:
+                future.set_exception(e)
+            return
+
+        resolve(batch, data, meta)
+
+
+class AsyncBatchLoader(BatchLoader):
+    """
+    The :class:`pnutpy.async_api.AsyncAPI` version of :class:`BatchLoader`. With the default
+    ``window`` of ``0`` it batches the lookups made in the same event loop iteration.
+    """
+    def __init__(self, api, window=0, max_batch=MAX_BULK_IDS):
+        super(AsyncBatchLoader, self).__init__(api, window, max_batch)
+
+    async def load(self, many_name, id_, params):
+        loop = asyncio.get_running_loop()
+        key = batch_key(many_name, params)
+        future = loop.create_future()
+        batch = self.pending.get(key)
+        if batch is None:
+            batch = self.pending[key] = Batch()
+            if self.window:
+                batch.timer = loop.call_later(self.window, self.schedule_flush, key, batch)
+            else:
+                batch.timer = loop.call_soon(self.schedule_flush, key, batch)
+
+        batch.append((str(id_), future))
+        if len(batch) >= self.max_batch:
+            self.schedule_flush(key, batch)
+
+        return await future
+
+    def schedule_flush(self, key, batch):
+        if self.pending.get(key) is not batch:
+            return
+
+        del self.pending[key]
+        batch.cancel_timer()
+        asyncio.ensure_future(self.flush_batch(key, batch))
+
+    async def flush_batch(self, key, batch):
+        many_name, params = key
+        try:
+            data, meta = await getattr(self.api, many_name)(ids=[id_ for id_, future in batch], **dict(params))
+        except Exception as e:
+            for id_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        resolve(batch, data, meta)
+
+
+def resolve(batch, data, meta):
+    for (id_, future), obj in zip(batch, data):
+        if future.done():
+            continue
+
+        if obj is None:
+            future.set_exception(missing_error(id_))
+        else:
+            future.set_result((obj, meta))
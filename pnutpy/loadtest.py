@@ -0,0 +1,235 @@
+"""
+.. module:: loadtest
+   :synopsis: Drive load through pnutpy clients and measure throughput and tail latency.
+
+"""
+import argparse
+import asyncio
+import collections
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pnutpy.api import API
+from pnutpy.standin import StandInProcess
+from pnutpy.transport import Transport
+
+MODES = ('sync', 'threads', 'async')
+
+
+def get_post(rng, posts):
+    return 'get_post', (rng.randint(1, posts),), {}
+
+
+def global_stream(rng, posts):
+    return 'posts_streams_global', (), {'count': 200, 'before_id': rng.randint(201, posts + 1)}
+
+
+def user_posts(rng, posts):
+    return 'users_posts', (rng.randint(1, 100),), {'count': 50}
+
+
+def bulk_posts(rng, posts):
+    return 'get_posts', (), {'ids': [rng.randint(1, posts) for i in range(50)]}
+
+
+def channel_messages(rng, posts):
+    return 'get_channel_messages', (rng.randint(1, 50),), {'count': 100}
+
+
+# What a scenario calls: a function of a random generator and the number of posts returning
+# the endpoint method name with its arguments
+SCENARIOS = collections.OrderedDict([
+    ('get_post', get_post),
+    ('global_stream', global_stream),
+    ('user_posts', user_posts),
+    ('bulk_posts', bulk_posts),
+    ('channel_messages', channel_messages),
+])
+
+
+class LoadResult(object):
+    """The latencies and failures of a load run."""
+    def __init__(self, scenario, mode, concurrency):
+        self.scenario = scenario
+        self.mode = mode
+        self.concurrency = concurrency
+        self.latencies = []
+        self.errors = collections.Counter()
+        self.elapsed = None
+        self.lock = threading.Lock()
+
+    def record(self, seconds, error=None):
+        with self.lock:
+            self.latencies.append(seconds)
+            if error is not None:
+                self.errors[type(error).__name__] += 1
+
+    def percentile(self, fraction):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+
+        return latencies[min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))]
+
+    def summary(self):
+        requests = len(self.latencies)
+        return {
+            'scenario': self.scenario,
+            'mode': self.mode,
+            'concurrency': self.concurrency,
+            'calls': requests,
+            'errors': dict(self.errors),
+            'elapsed': self.elapsed,
+            'calls_per_second': requests / self.elapsed if self.elapsed else None,
+            'latency': {
+                'mean': sum(self.latencies) / requests if requests else None,
+                'p50': self.percentile(0.5),
+                'p90': self.percentile(0.9),
+                'p99': self.percentile(0.99),
+                'max': max(self.latencies) if requests else None,
+            },
+        }
+
+    def report(self):
+        summary = self.summary()
+        latency = summary['latency']
+        lines = [
+            '%s, %s x %s: %d calls in %.2fs, %.1f calls/s' % (
+                self.scenario, self.mode, self.concurrency, summary['calls'], summary['elapsed'],
+                summary['calls_per_second'] or 0),
+            'latency ms: mean %.1f  p50 %.1f  p90 %.1f  p99 %.1f  max %.1f' % tuple(
+                (latency[k] or 0) * 1000 for k in ('mean', 'p50', 'p90', 'p99', 'max')),
+        ]
+        if self.errors:
+            lines.append('errors: %s' % ', '.join('%s %d' % item for item in sorted(self.errors.items())))
+
+        return '\n'.join(lines)
+
+
+def run_load(api_root, scenario='get_post', mode='threads', calls=1000, concurrency=8, posts=10000, seed=None,
+             **build_kwargs):
+    """
+    Make ``calls`` calls of ``scenario`` (see :data:`SCENARIOS`) against ``api_root``.
+
+    :param mode: ``'sync'`` calls one after the other, ``'threads'`` from ``concurrency`` threads
+        sharing one :class:`pnutpy.api.API`, ``'async'`` as ``concurrency`` concurrent tasks of
+        one :class:`pnutpy.async_api.AsyncAPI`
+    :param posts: the number of posts the server has, to pick ids from
+    :param build_kwargs: passed to ``build_api``
+    :returns: a :class:`LoadResult`
+    """
+    if mode not in MODES:
+        raise ValueError('mode must be one of %s' % (', '.join(MODES)))
+
+    rng = random.Random(seed)
+    plan = [SCENARIOS[scenario](rng, posts) for i in range(calls)]
+    result = LoadResult(scenario, mode, 1 if mode == 'sync' else concurrency)
+    started = time.perf_counter()
+    if mode == 'async':
+        asyncio.run(run_async(api_root, plan, result, concurrency, build_kwargs))
+    else:
+        api = API.build_api(api_root=api_root, **build_kwargs)
+        try:
+            if mode == 'sync':
+                for call in plan:
+                    timed_call(api, call, result)
+            else:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    list(executor.map(lambda call: timed_call(api, call, result), plan))
+        finally:
+            api.close()
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def timed_call(api, call, result):
+    name, args, kwargs = call
+    started = time.perf_counter()
+    try:
+        getattr(api, name)(*args, **kwargs)
+    except Exception as e:
+        result.record(time.perf_counter() - started, e)
+    else:
+        result.record(time.perf_counter() - started)
+
+
+async def run_async(api_root, plan, result, concurrency, build_kwargs):
+    from pnutpy.async_api import AsyncAPI
+
+    calls = iter(plan)
+
+    async def worker(api):
+        for name, args, kwargs in calls:
+            started = time.perf_counter()
+            try:
+                await getattr(api, name)(*args, **kwargs)
+            except Exception as e:
+                result.record(time.perf_counter() - started, e)
+            else:
+                result.record(time.perf_counter() - started)
+
+    async with AsyncAPI.build_api(api_root=api_root, **build_kwargs) as api:
+        await asyncio.gather(*[worker(api) for i in range(concurrency)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pnutpy.loadtest',
+                                     description='Measure pnutpy throughput and latency against a pnut.io API.')
+    parser.add_argument('--api-root', help='the API to load, by default a stand-in server in a child process')
+    parser.add_argument('--access-token', default='loadtest')
+    parser.add_argument('--scenario', choices=list(SCENARIOS), action='append',
+                        help='what to call, can be given several times (default: all)')
+    parser.add_argument('--mode', choices=MODES, action='append', help='can be given several times (default: all)')
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--retries', type=int, default=0, help='retry failed GET requests this often')
+    parser.add_argument('--no-rate-limiter', dest='rate_limiter', action='store_false')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='write the results as JSON')
+    server_options = parser.add_argument_group('stand-in server')
+    server_options.add_argument('--posts', type=int, default=10000)
+    server_options.add_argument('--latency', type=float, default=0.02)
+    server_options.add_argument('--jitter', type=float, default=0.01)
+    server_options.add_argument('--error-rate', type=float, default=0)
+    server_options.add_argument('--throttle-rate', type=float, default=0)
+    server_options.add_argument('--rate-limit', type=int, default=None)
+    options = parser.parse_args(argv)
+
+    server = None
+    api_root = options.api_root
+    if api_root is None:
+        server = StandInProcess(posts=options.posts, latency=options.latency, jitter=options.jitter,
+                                error_rate=options.error_rate, throttle_rate=options.throttle_rate,
+                                rate_limit=options.rate_limit, seed=options.seed).start()
+        api_root = server.api_root
+
+    build_kwargs = {'access_token': options.access_token, 'rate_limiter': options.rate_limiter}
+    if options.retries:
+        build_kwargs['transport_config'] = Transport(retries=options.retries,
+                                                     pool_maxsize=max(10, options.concurrency))
+
+    results = []
+    try:
+        for scenario in options.scenario or list(SCENARIOS):
+            for mode in options.mode or list(MODES):
+                result = run_load(api_root, scenario, mode, options.calls, options.concurrency, options.posts,
+                                  options.seed, **build_kwargs)
+                results.append(result.summary())
+                if not options.json:
+                    print(result.report() + '\n')
+    finally:
+        if server is not None:
+            server.stop()
+
+    if options.json:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
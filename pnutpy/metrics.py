@@ -0,0 +1,274 @@
+"""
+.. module:: metrics
+   :synopsis: Request hooks, per endpoint metrics and a Prometheus exporter.
+
+"""
+import bisect
+import collections
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RequestEvent(object):
+    """
+    One request as seen by the hooks of an :class:`Instrumentation`.
+
+    ``endpoint`` is the name of the endpoint method (``'users_posts'``), or the path for requests
+    made with :meth:`pnutpy.api.API.request` directly. ``status_code`` is ``None`` and ``error``
+    is set when no response came back. ``elapsed`` covers the whole request including rate limit
+    waits and retries, ``rate_limit_wait`` the part spent waiting for the rate limit budget.
+    Hooks can keep their own state in ``context``.
+    """
+    __slots__ = ('endpoint', 'method', 'path', 'started', 'elapsed', 'status_code', 'bytes_sent', 'bytes_received',
+                 'retries', 'rate_limit_wait', 'error', 'context')
+
+    def __init__(self, endpoint, method, path):
+        self.endpoint = endpoint
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.status_code = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.rate_limit_wait = 0.0
+        self.error = None
+        self.context = {}
+
+    def __repr__(self):
+        return '<RequestEvent %s %s %s>' % (self.method, self.endpoint, self.status_code)
+
+    def response_received(self, response, content=None):
+        """Record the status and size of ``response``; ``content`` is the body if it was read."""
+        self.status_code = response.status_code
+        request = getattr(response, 'request', None)
+        body = getattr(request, 'body', None) if request is not None else None
+        if body is None and request is not None and hasattr(request, 'content'):
+            body = request.content
+
+        self.bytes_sent = len(body) if body else 0
+        if content is not None:
+            self.bytes_received = len(content)
+        else:
+            self.bytes_received = int(response.headers.get('Content-Length') or 0)
+
+
+class Histogram(object):
+    """A cumulative histogram over fixed bucket bounds, as Prometheus expects them."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """``(upper bound, count)`` pairs, ending with ``float('inf')``."""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointMetrics(object):
+    """The counters of one endpoint."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.latency = Histogram(buckets)
+        self.statuses = collections.Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.rate_limit_wait = 0.0
+
+    @property
+    def requests(self):
+        return self.latency.count
+
+    def count_statuses(self, low, high):
+        return sum(count for status, count in self.statuses.items() if isinstance(status, int) and low <= status < high)
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'statuses': dict(self.statuses),
+            'client_errors': self.count_statuses(400, 500),
+            'server_errors': self.count_statuses(500, 600),
+            'rate_limited': self.statuses.get(429, 0),
+            'connection_errors': self.statuses.get('error', 0),
+            'latency_sum': self.latency.sum,
+            'latency_buckets': list(self.latency.cumulative()),
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'retries': self.retries,
+            'rate_limit_wait': self.rate_limit_wait,
+        }
+
+
+class MetricsRegistry(object):
+    """
+    Collects latency, sizes, status codes, retries and rate limit waits per endpoint method.
+    One registry can be shared by several clients.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS, namespace='pnutpy'):
+        self.buckets = buckets
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.endpoints = collections.OrderedDict()
+
+    def observe(self, event):
+        with self.lock:
+            metrics = self.endpoints.get(event.endpoint)
+            if metrics is None:
+                metrics = self.endpoints[event.endpoint] = EndpointMetrics(self.buckets)
+
+            metrics.latency.observe(event.elapsed)
+            metrics.statuses['error' if event.status_code is None else event.status_code] += 1
+            metrics.bytes_sent += event.bytes_sent
+            metrics.bytes_received += event.bytes_received
+            metrics.retries += event.retries
+            metrics.rate_limit_wait += event.rate_limit_wait
+
+    def snapshot(self):
+        """The counters of every endpoint as plain dicts, by endpoint name."""
+        with self.lock:
+            return dict((name, metrics.snapshot()) for name, metrics in self.endpoints.items())
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        ns = self.namespace
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append('# HELP %s_%s %s' % (ns, name, help_text))
+            lines.append('# TYPE %s_%s %s' % (ns, name, kind))
+            for suffix, labels, value in samples:
+                lines.append('%s_%s%s{%s} %s' % (ns, name, suffix, format_labels(labels), format_value(value)))
+
+        family('requests_total', 'counter', 'Requests by endpoint and status code.', [
+            ('', [('endpoint', endpoint), ('status', status)], count)
+            for endpoint, metrics in snapshot.items() for status, count in sorted(metrics['statuses'].items(), key=str)
+        ])
+
+        samples = []
+        for endpoint, metrics in snapshot.items():
+            for bound, count in metrics['latency_buckets']:
+                samples.append(('_bucket', [('endpoint', endpoint), ('le', bound)], count))
+
+            samples.append(('_sum', [('endpoint', endpoint)], metrics['latency_sum']))
+            samples.append(('_count', [('endpoint', endpoint)], metrics['requests']))
+
+        family('request_duration_seconds', 'histogram', 'Request latency including rate limit waits and retries.',
+               samples)
+
+        for name, key, help_text in (('request_bytes_total', 'bytes_sent', 'Bytes of request bodies sent.'),
+                                     ('response_bytes_total', 'bytes_received', 'Bytes of response bodies received.'),
+                                     ('retries_total', 'retries', 'Requests sent again after a failure.'),
+                                     ('rate_limit_wait_seconds_total', 'rate_limit_wait',
+                                      'Time spent waiting for the rate limit budget.')):
+            family(name, 'counter', help_text,
+                   [('', [('endpoint', endpoint)], metrics[key]) for endpoint, metrics in snapshot.items()])
+
+        return '\n'.join(lines) + '\n'
+
+
+class Instrumentation(object):
+    """
+    Observes every request of a client, passed as ``API.build_api(instrumentation=...)``
+    (``True`` for one with a fresh :class:`MetricsRegistry`)::
+
+        instrumentation = Instrumentation(before=[log_start], after=[log_end])
+        api = pnutpy.API.build_api(access_token=token, instrumentation=instrumentation)
+        ...
+        print(instrumentation.metrics.to_prometheus())
+
+    :param metrics: the :class:`MetricsRegistry` to record into, ``False`` for none
+    :param before: functions called with the :class:`RequestEvent` before a request is sent
+    :param after: functions called with the finished :class:`RequestEvent`
+    :param span: a function called with the :class:`RequestEvent` that returns a context manager
+        wrapping the request, e.g. to start a tracing span
+    """
+    def __init__(self, metrics=None, before=None, after=None, span=None):
+        self.metrics = MetricsRegistry() if metrics is None else (metrics or None)
+        self.before = list(before or [])
+        self.after = list(after or [])
+        self.span = span
+
+    def start(self, endpoint, method, path):
+        event = RequestEvent(endpoint or path, method, path)
+        for hook in self.before:
+            hook(event)
+
+        return event
+
+    def open_span(self, event):
+        return self.span(event) if self.span is not None else contextlib.nullcontext()
+
+    def finish(self, event, error=None):
+        event.elapsed = time.perf_counter() - event.started
+        event.error = error
+        if self.metrics is not None:
+            self.metrics.observe(event)
+
+        for hook in self.after:
+            hook(event)
+
+
+def build_instrumentation(instrumentation):
+    if instrumentation is True:
+        return Instrumentation()
+
+    return instrumentation or None
+
+
+def format_labels(labels):
+    return ','.join('%s="%s"' % (name, escape_label(value)) for name, value in labels)
+
+
+def escape_label(value):
+    if value == float('inf'):
+        return '+Inf'
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def serve_metrics(registry, port=9464, address=''):
+    """
+    Serve ``registry`` for Prometheus to scrape on ``http://address:port/metrics`` from a daemon
+    thread. Returns the server; call its ``shutdown()`` to stop it.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
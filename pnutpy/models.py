@@ -4,8 +4,12 @@
 
 """
 import collections.abc
-from dateutil.parser import parse
-import json
+import threading
+import weakref
+
+from pnutpy.dates import decode_timestamp
+from pnutpy.json_backends import default_backend
+
 
 def is_iterable(obj):
     try:
@@ -20,14 +24,60 @@ def is_seq_not_string(obj):
 
     return is_iterable(obj)
 
+class IdentityMap(object):
+    """
+    Hands out a single model instance per entity, so a user that wrote fifty posts of a page is
+    hydrated once and shared by all of them.
+
+    A map is created for every response. With ``API.build_api(identity_map=True)`` the client
+    also keeps a ``shared`` map: an entity seen again in a later response updates the instance
+    handed out before, for as long as anything still references it.
+    """
+    def __init__(self, parent=None, shared=False):
+        self.parent = parent
+        self.lock = threading.Lock()
+        self.objects = weakref.WeakValueDictionary() if shared else {}
+
+    def get(self, cls, id_):
+        if id_ is None:
+            return None
+
+        return self.objects.get((cls.__name__, str(id_)))
+
+    def add(self, cls, id_, obj):
+        """
+        Remember ``obj`` and return the instance to use for it.
+        """
+        if id_ is None:
+            return obj
+
+        key = (cls.__name__, str(id_))
+        if self.parent is not None:
+            obj = self.parent.merge(key, obj)
+
+        self.objects[key] = obj
+        return obj
+
+    def merge(self, key, obj):
+        # The update happens under the lock too, so concurrent merges of an entity don't interleave
+        with self.lock:
+            existing = self.objects.get(key)
+            if existing is None:
+                self.objects[key] = obj
+                return obj
+
+            existing.update(obj)
+            return existing
+
+
 class SimpleValueModel(object):
     @classmethod
-    def from_response_data(cls, data, api):
+    def from_response_data(cls, data, api, identity_map=None):
         return data
 
 class SimpleValueDictListMode(object):
     @classmethod
-    def from_response_data(cls, data, api):
+    def from_response_data(cls, data, api, identity_map=None):
         resp = dict()
         for key, val in list(data.items()):
             resp[key] = [int(x) for x in val]
@@ -81,17 +131,31 @@ class APIModel(dict):
     @classmethod
     def from_string(cls, raw_json, api=None):
         """
-       :param raw_json: a json response from the API
+       :param raw_json: a json response from the API, as bytes
        :param api: an instance of :class:`pnutpy.api.API`
        :rtype: model obj
         """
-        return cls(json.loads(raw_json.decode('utf-8')), api)
+        return cls.from_decoded(getattr(api, 'json_backend', default_backend).loads(raw_json), api)
+
+    @classmethod
+    def from_decoded(cls, data, api=None):
+        """
+       :param data: a decoded json response from the API
+       :param api: an instance of :class:`pnutpy.api.API`
+       :rtype: model obj
+        """
+        # Leave the payload raw for the models the client hydrates it with
+        if getattr(api, 'lazy_models', False) or getattr(api, 'model_style', 'dict') != 'dict':
+            return lazy_model(cls, data, api)
+
+        return cls(data, api)
 
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         """
        :param data: a dict
        :param api: an instance of :class:`pnutpy.api.API`
+       :param identity_map: a :class:`IdentityMap` shared by the models of one response
        :rtype: model obj
         """
         model = cls(data, api)
@@ -135,6 +199,202 @@ class APIModel(dict):
     def __getstate__(self):
         return self.serialize()
 
+    # Conversions :class:`LazyModel` does on first access, mirroring from_response_data
+    lazy_fields = {}
+    lazy_derived = {}
+    lazy_defaults = {}
+
+class LazyModel(object):
+    """
+    Mixin that defers hydration to the first access of each field.
+
+    Nested mappings, lists of mappings and the fields a model converts (dates, embedded users,
+    reposted posts, ...) are kept as they came from the server until they are read through
+    ``model.field``, ``model['field']``, ``get``, ``items``, ``values``, ``copy``, ``dict(model)``
+    or a comparison. The converted value replaces the raw one, so every field is converted at
+    most once.
+
+    Instances are created by :func:`lazy_model`, which builds a lazy subclass of every model class
+    on demand so ``isinstance(post, Post)`` still holds.
+
+    The identity map of the response and the fields left to convert are kept as attributes, not
+    as keys, and let go of once every field is converted.
+    """
+    _identity_map = None
+    _pending = None
+
+    def __init__(self, data=None, api=None, identity_map=None):
+        dict.__init__(self, data or ())
+        dict.__setitem__(self, '_api', api)
+        for key, derive_from in self.lazy_derived.items():
+            dict.__setitem__(self, key, dict.get(self, derive_from) or [])
+
+        for key, default in self.lazy_defaults.items():
+            if not dict.__contains__(self, key):
+                dict.__setitem__(self, key, default)
+
+        pending = set(key for key in self.lazy_fields if dict.__contains__(self, key))
+        for k, v in dict.items(self):
+            if isinstance(v, collections.abc.Mapping) or (v and isinstance(v, list) and isinstance(v[0], collections.abc.Mapping)):
+                pending.add(k)
+
+        if pending:
+            object.__setattr__(self, '_pending', pending)
+            object.__setattr__(self, '_identity_map', identity_map)
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        pending = self._pending
+        if pending and key in pending:
+            pending.discard(key)
+            value = self.convert(key, value)
+            dict.__setitem__(self, key, value)
+            if not pending:
+                self.hydrated()
+
+        return value
+
+    def __setitem__(self, key, value):
+        pending = self._pending
+        if pending:
+            pending.discard(key)
+            if not pending:
+                self.hydrated()
+
+        dict.__setitem__(self, key, value)
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+
+        return default
+
+    def update(self, other=(), **kwargs):
+        if not isinstance(other, LazyModel):
+            for key, value in dict(other, **kwargs).items():
+                self[key] = value
+            return
+
+        # Take the fields of ``other`` as they are, along with the ones it has still to convert
+        pending = set(self._pending or ()) - set(dict.keys(other))
+        pending.update(other._pending or ())
+        dict.update(self, other)
+        if pending:
+            object.__setattr__(self, '_pending', pending)
+            object.__setattr__(self, '_identity_map', other._identity_map or self._identity_map)
+        else:
+            self.hydrated()
+
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def hydrated(self):
+        object.__setattr__(self, '_pending', None)
+        object.__setattr__(self, '_identity_map', None)
+
+    def hydrate(self):
+        """Convert every field that has not been read yet."""
+        for key in list(self._pending or ()):
+            self[key]
+
+    def items(self):
+        self.hydrate()
+        return dict.items(self)
+
+    def values(self):
+        self.hydrate()
+        return dict.values(self)
+
+    def copy(self):
+        self.hydrate()
+        return dict.copy(self)
+
+    def __iter__(self):
+        # dict(model) and {**model} read a dict subclass with its own __iter__ through __getitem__,
+        # instead of copying the raw values
+        return dict.__iter__(self)
+
+    def __eq__(self, other):
+        self.hydrate()
+        if isinstance(other, LazyModel):
+            other.hydrate()
+
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def convert(self, key, value):
+        api = dict.get(self, '_api')
+        identity_map = self._identity_map
+        converter = self.lazy_fields.get(key)
+        if converter is not None:
+            return converter(self, value, api, identity_map)
+
+        if isinstance(value, collections.abc.Mapping):
+            return lazy_model(APIModel, value, api, identity_map)
+
+        return [lazy_model(APIModel, x, api, identity_map) for x in value]
+
+    def get_annotation(self, key, result_format='list'):
+        if not dict.__contains__(self, '_annotations_by_key'):
+            annotations_by_key = collections.defaultdict(list)
+            for annotation in self.get('annotations') or []:
+                annotations_by_key[annotation.type].append(annotation.get('value', {}))
+            dict.__setitem__(self, '_annotations_by_key', annotations_by_key)
+
+        return super(LazyModel, self).get_annotation(key, result_format)
+
+
+_lazy_classes = {}
+
+
+def lazy_model(cls, data, api=None, identity_map=None):
+    """
+    Wrap ``data`` in a lazily hydrated version of the model class ``cls``, see :class:`LazyModel`.
+    """
+    if identity_map is not None and cls in (User, Post):
+        model = identity_map.get(cls, data.get('id'))
+        if model is not None:
+            return model
+
+    lazy_cls = _lazy_classes.get(cls)
+    if lazy_cls is None:
+        lazy_cls = _lazy_classes[cls] = type(cls.__name__, (LazyModel, cls), {'__module__': cls.__module__})
+
+    model = lazy_cls(data, api, identity_map)
+    if identity_map is not None and cls in (User, Post):
+        model = identity_map.add(cls, data.get('id'), model)
+
+    return model
+
+
+def _lazy_int(model, value, api, identity_map):
+    return int(value)
+
+
+def _lazy_date(model, value, api, identity_map):
+    return decode_timestamp(value, api)
+
+
+def _lazy_user(model, value, api, identity_map):
+    return lazy_model(User, value, api, identity_map) if value else None
+
+
+def _lazy_users(model, value, api, identity_map):
+    return [lazy_model(User, x, api, identity_map) for x in value]
+
+
+def _lazy_post(model, value, api, identity_map):
+    return lazy_model(Post, value, api, identity_map) if value else value
+
+
+def _lazy_interaction_objects(model, value, api, identity_map):
+    api_model = User if model['action'] == 'follow' else Post
+    return [lazy_model(api_model, x, api, identity_map) for x in value]
+
+
 class APIMeta(APIModel):
     """API response metadata."""
     pass
@@ -143,11 +403,21 @@ class User(APIModel):
     """
     The User Model
     """
+    lazy_fields = {'id': _lazy_int, 'created_at': _lazy_date}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
+        if identity_map is not None:
+            user = identity_map.get(User, data.get('id'))
+            if user is not None:
+                return user
+
         user = super(User, cls).from_response_data(data, api)
         user.id = int(user.id)
-        user.created_at = parse(user.created_at)
+        user.created_at = decode_timestamp(user.created_at, api)
+
+        if identity_map is not None:
+            user = identity_map.add(User, user.id, user)
 
         return user
 
@@ -202,24 +472,37 @@ class Post(APIModel):
     """
     The Post Model
     """
+    lazy_fields = {'id': _lazy_int, 'created_at': _lazy_date, 'user': _lazy_user, 'repost_of': _lazy_post,
+                   'starred_by': _lazy_users, 'reposters': _lazy_users}
+    lazy_derived = {'starred_by': 'bookmarked_by', 'reposters': 'reposted_by'}
+    lazy_defaults = {'user': None}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
+        if identity_map is not None:
+            post = identity_map.get(Post, data.get('id'))
+            if post is not None:
+                return post
+
         post = super(Post, cls).from_response_data(data, api)
         post.id = int(post.id)
         if 'user' in post:
-            post.user = User.from_response_data(post.user, api)
+            post.user = User.from_response_data(post.user, api, identity_map)
         else:
             post.user = None
 
-        post.starred_by = [User.from_response_data(u, api) for u in post.get('bookmarked_by', [])]
-        post.reposters = [User.from_response_data(u, api) for u in post.get('reposted_by', [])]
+        post.starred_by = [User.from_response_data(u, api, identity_map) for u in post.get('bookmarked_by', [])]
+        post.reposters = [User.from_response_data(u, api, identity_map) for u in post.get('reposted_by', [])]
 
-        post.created_at = parse(post.created_at)
+        post.created_at = decode_timestamp(post.created_at, api)
 
         # If there is a repost object setup the avatar assets for it as well
         repost_of = post.get('repost_of')
         if repost_of:
-            post.repost_of = Post.from_response_data(post.repost_of, api)
+            post.repost_of = Post.from_response_data(post.repost_of, api, identity_map)
+
+        if identity_map is not None:
+            post = identity_map.add(Post, post.id, post)
 
         return post
 
@@ -257,75 +540,88 @@ class Message(APIModel):
     """
     The Message Model
     """
+    lazy_fields = {'id': _lazy_int, 'created_at': _lazy_date, 'user': _lazy_user}
+    lazy_defaults = {'user': None}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         message = super(Message, cls).from_response_data(data, api)
         message.id = int(message.id)
         if 'user' in message:
-            message.user = User.from_response_data(message.user, api)
+            message.user = User.from_response_data(message.user, api, identity_map)
         else:
             message.user = None
 
-        message.created_at = parse(message.created_at)
+        message.created_at = decode_timestamp(message.created_at, api)
         return message
 
 class Interaction(APIModel):
     """
     The Interaction Model
     """
+    lazy_fields = {'event_date': _lazy_date, 'objects': _lazy_interaction_objects, 'users': _lazy_users}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         interaction = super(Interaction, cls).from_response_data(data, api)
 
         api_model = User if interaction.action == 'follow' else Post
 
-        interaction.objects = [api_model.from_response_data(x, api) for x in interaction.objects]
-        interaction.users = [User.from_response_data(x, api) for x in interaction.users]
+        interaction.objects = [api_model.from_response_data(x, api, identity_map) for x in interaction.objects]
+        interaction.users = [User.from_response_data(x, api, identity_map) for x in interaction.users]
 
-        interaction.event_date = parse(interaction.event_date)
+        interaction.event_date = decode_timestamp(interaction.event_date, api)
         return interaction
 
 class Channel(APIModel):
     """
     The Channel Model
     """
+    lazy_fields = {'owner': _lazy_user}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         channel = super(Channel, cls).from_response_data(data, api)
-        channel.owner = User.from_response_data(channel.owner, api)
+        channel.owner = User.from_response_data(channel.owner, api, identity_map)
         return channel
 
 class File(APIModel):
     """
     The File Model
     """
+    lazy_fields = {'user': _lazy_user}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         file_ = super(File, cls).from_response_data(data, api)
         if file_.get('user'):
-            file_.user = User.from_response_data(file_.user, api)
+            file_.user = User.from_response_data(file_.user, api, identity_map)
         return file_
 
 class Poll(APIModel):
     """
     The Poll Model
     """
+    lazy_fields = {'user': _lazy_user}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         poll_ = super(Poll, cls).from_response_data(data, api)
         if poll_.get('user'):
-            poll_.user = User.from_response_data(poll_.user, api)
+            poll_.user = User.from_response_data(poll_.user, api, identity_map)
         return poll_
 
 class Token(APIModel):
     """
     The Token Model
     """
+    lazy_fields = {'user': _lazy_user}
+
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         token = super(Token, cls).from_response_data(data, api)
         if token.get('user'):
-            token.user = User.from_response_data(token.user, api)
+            token.user = User.from_response_data(token.user, api, identity_map)
 
         return token
 
@@ -334,7 +630,7 @@ class ExploreStream(APIModel):
     The Explore Stream Model
     """
     @classmethod
-    def from_response_data(cls, data, api=None):
+    def from_response_data(cls, data, api=None, identity_map=None):
         explore_stream = super(ExploreStream, cls).from_response_data(data, api)
 
         return explore_stream
@@ -342,3 +638,4 @@ class ExploreStream(APIModel):
     @property
     def id(self):
         return self.slug
+
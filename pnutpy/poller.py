@@ -0,0 +1,239 @@
+"""
+.. module:: poller
+   :synopsis: Poll many streams, each as often as its activity calls for.
+
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from pnutpy.errors import PnutAPIException
+
+logger = logging.getLogger(__name__)
+
+
+class RequestBudget(object):
+    """
+    A token bucket shared by all streams of a :class:`Poller`: at most ``rate`` requests per
+    second on average, with bursts of up to ``burst``.
+    """
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def acquire(self):
+        """Take a token, returning the seconds to wait before using it."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+
+            return -self.tokens / self.rate
+
+    def wait(self):
+        delay = self.acquire()
+        if delay:
+            self.sleep(delay)
+
+
+class PolledStream(object):
+    """
+    One polled endpoint call and its state: the ``since_id`` watermark and the current
+    interval, which shrinks while the stream is busy and grows while it is quiet.
+    """
+    def __init__(self, key, func, args, kwargs, callback, since_id, interval):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = callback
+        self.since_id = since_id
+        self.interval = interval
+        self.next_at = 0
+        self.polls = 0
+        self.items = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return '<PolledStream %s every %.1fs>' % (self.key, self.interval)
+
+
+class Poller(object):
+    """
+    Polls any number of paginated endpoints for new objects::
+
+        poller = Poller(requests_per_second=2)
+        for channel_id in channel_ids:
+            poller.add(api.get_channel_messages, channel_id, callback=store_messages)
+
+        poller.add(api.posts_with_hashtag, 'pnut', callback=store_posts)
+        poller.run()
+
+    Every stream keeps a ``since_id`` watermark, so each poll only returns what is new; bursts
+    larger than a page are paged through so nothing is skipped. A stream that had new objects
+    is polled again ``speedup`` times sooner, a quiet one ``slowdown`` times later, always
+    within ``min_interval`` and ``max_interval`` seconds. All polls draw from one
+    :class:`RequestBudget`, and the most overdue stream goes first, so requests go where the
+    traffic is.
+
+    New objects are passed to the stream's ``callback`` as ``(stream, items)``, newest first,
+    and/or put on ``queue`` as ``(stream.key, items)``.
+
+    :param requests_per_second: the shared budget, ``None`` for no limit besides the client's
+        own :class:`pnutpy.ratelimit.RateLimiter`
+    :param workers: the number of polls running at the same time
+    """
+    def __init__(self, requests_per_second=None, min_interval=2, max_interval=300, initial_interval=None,
+                 speedup=2.0, slowdown=1.5, count=200, queue=None, workers=1, clock=time.monotonic, sleep=time.sleep):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval or min_interval
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.count = count
+        self.queue = queue
+        self.workers = workers
+        self.clock = clock
+        self.sleep = sleep
+        self.budget = RequestBudget(requests_per_second, clock=clock, sleep=sleep) if requests_per_second else None
+        self.lock = threading.Lock()
+        self.streams = {}
+        self.schedule = []
+        self.order = itertools.count()
+        self.stop_event = threading.Event()
+
+    def add(self, func, *args, callback=None, key=None, since_id=None, **kwargs):
+        """
+        Poll ``func(*args, **kwargs)``.
+
+        :param key: names the stream, by default ``'method_name:arg,...'``
+        :param since_id: start after this id; by default the first poll delivers the newest page
+        """
+        key = key or '%s:%s' % (func.__name__, ','.join(str(getattr(x, 'id', x)) for x in args))
+        stream = PolledStream(key, func, args, kwargs, callback, since_id, self.initial_interval)
+        with self.lock:
+            self.streams[key] = stream
+            self.push(stream, self.clock())
+
+        return stream
+
+    def remove(self, key):
+        with self.lock:
+            self.streams.pop(key, None)
+
+    def push(self, stream, at):
+        stream.next_at = at
+        heapq.heappush(self.schedule, (at, next(self.order), stream))
+
+    def due(self, now, limit):
+        """Pop up to ``limit`` streams due at ``now``, most overdue first."""
+        streams = []
+        with self.lock:
+            while self.schedule and len(streams) < limit:
+                at, order, stream = self.schedule[0]
+                if self.streams.get(stream.key) is not stream or at != stream.next_at:
+                    heapq.heappop(self.schedule)
+                    continue
+
+                if at > now:
+                    break
+
+                heapq.heappop(self.schedule)
+                streams.append(stream)
+
+        return streams
+
+    def next_due(self):
+        with self.lock:
+            return self.schedule[0][0] if self.schedule else None
+
+    def fetch(self, stream):
+        """The objects of ``stream`` newer than its watermark, newest first."""
+        kwargs = dict(stream.kwargs)
+        kwargs.setdefault('count', self.count)
+        if stream.since_id is not None:
+            kwargs['since_id'] = stream.since_id
+
+        items = []
+        while True:
+            if self.budget is not None:
+                self.budget.wait()
+
+            data, meta = stream.func(*stream.args, **kwargs)
+            items.extend(data)
+            # The first poll only takes the newest page, later ones page down to the watermark
+            if not data or not meta.get('more') or stream.since_id is None:
+                return items
+
+            kwargs['before_id'] = meta.get('min_id')
+
+    def poll(self, stream):
+        """Poll one stream, deliver what is new and reschedule it."""
+        try:
+            items = self.fetch(stream)
+        except (PnutAPIException, requests.RequestException) as e:
+            logger.warning('Polling %s failed: %s', stream.key, e)
+            stream.errors += 1
+            stream.interval = min(self.max_interval, stream.interval * self.slowdown)
+            items = None
+
+        stream.polls += 1
+        if items:
+            try:
+                if stream.callback is not None:
+                    stream.callback(stream, items)
+            except Exception:
+                # The watermark stays, so the items are delivered again on the next poll
+                logger.exception('The callback of %s failed', stream.key)
+                stream.errors += 1
+                stream.interval = min(self.max_interval, stream.interval * self.slowdown)
+            else:
+                stream.items += len(items)
+                stream.since_id = max(int(obj['id']) for obj in items)
+                stream.interval = max(self.min_interval, stream.interval / self.speedup)
+                if self.queue is not None:
+                    self.queue.put((stream.key, items))
+        elif items is not None:
+            stream.interval = min(self.max_interval, stream.interval * self.slowdown)
+
+        with self.lock:
+            if self.streams.get(stream.key) is stream:
+                self.push(stream, self.clock() + stream.interval)
+
+    def poll_due(self):
+        """Poll every stream that is due now; returns how many were polled."""
+        streams = self.due(self.clock(), len(self.streams) or 1)
+        if self.workers > 1 and len(streams) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(streams))) as executor:
+                list(executor.map(self.poll, streams))
+        else:
+            for stream in streams:
+                self.poll(stream)
+
+        return len(streams)
+
+    def run(self):
+        """Poll until :meth:`stop` is called."""
+        self.stop_event.clear()
+        while not self.stop_event.is_set():
+            self.poll_due()
+            next_at = self.next_due()
+            delay = self.max_interval if next_at is None else max(0, next_at - self.clock())
+            if delay:
+                self.stop_event.wait(delay)
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,154 @@
+"""
+.. module:: pool
+   :synopsis: Clients for many access tokens sharing one connection pool.
+
+"""
+import collections
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+from pnutpy.api import API
+
+Call = collections.namedtuple('Call', ['access_token', 'method', 'args', 'kwargs'])
+
+
+def call(access_token, method, *args, **kwargs):
+    """
+    Describe one call of :meth:`ClientPool.run`, e.g. ``call(token, 'get_post', 1)``. With
+    ``None`` as the token it is made with an app token.
+    """
+    return Call(access_token, method, args, kwargs)
+
+
+class ClientPool(object):
+    """
+    Hands out an :class:`pnutpy.api.API` per access token. All of them send their requests
+    through one shared connection pool, but each keeps its own
+    :class:`pnutpy.ratelimit.RateLimiter`, so every token can use its full allowance::
+
+        pool = ClientPool(app_tokens=[app_token_1, app_token_2])
+        posts, meta = pool.client(user_token).users_post_streams_me()
+        results = pool.run([call(token, 'users_post_streams_me') for token in user_tokens])
+        post, meta = pool.app_client().get_post(1)
+
+    :param pool_maxsize: the connections kept open per host, shared by all tokens
+    :param adapter: the requests transport adapter all clients share; by default one is built
+        from ``transport_config`` when that is given (so HTTP/2 and its pool settings apply to
+        the whole pool), or an :class:`requests.adapters.HTTPAdapter` of ``pool_connections``
+        and ``pool_maxsize``. Passing both ``adapter`` and ``transport_config`` is an error.
+    :param max_clients: how many per-token clients to keep; the least recently used ones are
+        closed and dropped beyond that (their tokens' budgets are then learned again)
+    :param max_workers: the threads :meth:`run` uses
+    :param app_tokens: app access tokens to spread app-level reads over, see :meth:`app_client`
+    :param build_kwargs: passed to :meth:`pnutpy.api.API.build_api` for every client
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=100, max_clients=10000, max_workers=8, app_tokens=None,
+                 adapter=None, **build_kwargs):
+        self.transport_config = build_kwargs.pop('transport_config', None)
+        if adapter is not None and self.transport_config is not None:
+            raise ValueError('Pass either adapter or transport_config, the transport builds the adapter')
+
+        if adapter is None:
+            if self.transport_config is not None:
+                adapter = self.transport_config.adapter()
+            else:
+                adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+        self.adapter = adapter
+        self.max_clients = max_clients
+        self.max_workers = max_workers
+        self.build_kwargs = build_kwargs
+        self.lock = threading.Lock()
+        self.clients = collections.OrderedDict()
+        self.app_clients = [self.build_client(token) for token in app_tokens or []]
+        self.app_order = itertools.count()
+
+    def build_client(self, access_token):
+        api = API.build_api(access_token=access_token, **self.build_kwargs)
+        # The timeouts and retries of the transport apply per client, its adapter is shared
+        api.transport_config = self.transport_config
+        api.mount('https://', self.adapter)
+        api.mount('http://', self.adapter)
+        return api
+
+    def release(self, api):
+        """Close a client dropped from the pool, leaving the shared adapter open."""
+        for prefix in [prefix for prefix, adapter in api.adapters.items() if adapter is self.adapter]:
+            del api.adapters[prefix]
+
+        api.close()
+
+    def client(self, access_token):
+        """The client for ``access_token``."""
+        with self.lock:
+            api = self.clients.get(access_token)
+            if api is not None:
+                self.clients.move_to_end(access_token)
+                return api
+
+            api = self.clients[access_token] = self.build_client(access_token)
+            while len(self.clients) > self.max_clients:
+                token, evicted = self.clients.popitem(last=False)
+                self.release(evicted)
+
+            return api
+
+    def app_client(self):
+        """
+        The app token client with the most requests left in its current rate limit window,
+        taking turns while they are equal.
+        """
+        if not self.app_clients:
+            raise ValueError('The pool has no app tokens')
+
+        with self.lock:
+            start = next(self.app_order)
+
+        clients = self.app_clients[start % len(self.app_clients):] + self.app_clients[:start % len(self.app_clients)]
+        return max(clients, key=remaining_budget)
+
+    def run(self, calls, return_exceptions=False):
+        """
+        Run ``calls`` (see :func:`call`) concurrently, each with the client of its token.
+
+        :param return_exceptions: put the exceptions of failed calls into the results instead of
+            raising the first one
+        :returns: the results in the order of ``calls``
+        """
+        def run_call(item):
+            access_token, method, args, kwargs = item
+            api = self.app_client() if access_token is None else self.client(access_token)
+            try:
+                return getattr(api, method)(*args, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        calls = list(calls)
+        if len(calls) <= 1 or self.max_workers <= 1:
+            return [run_call(item) for item in calls]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls))) as executor:
+            return list(executor.map(run_call, calls))
+
+    def budgets(self):
+        """The ``(remaining, limit)`` rate budget of every client, by access token."""
+        with self.lock:
+            clients = list(self.clients.items())
+
+        clients.extend((api.headers['Authorization'][len('Bearer '):], api) for api in self.app_clients)
+        return dict((token, (api.rate_limiter.available(), api.rate_limiter.limit)) for token, api in clients
+                    if api.rate_limiter is not None)
+
+    def close(self):
+        self.adapter.close()
+
+
+def remaining_budget(api):
+    limiter = api.rate_limiter
+    remaining = limiter.available() if limiter is not None else None
+    return float('inf') if remaining is None else remaining
@@ -0,0 +1,177 @@
+"""
+.. module:: profiling
+   :synopsis: Where the time of an endpoint call goes: network, JSON decoding or hydration.
+
+"""
+import collections
+import contextlib
+import contextvars
+import threading
+import time
+
+# The phases of a call, in the order they happen
+PHASES = ('wait', 'ttfb', 'download', 'decode', 'hydrate', 'dates', 'total')
+NETWORK_PHASES = ('wait', 'ttfb', 'download')
+CPU_PHASES = ('decode', 'hydrate')
+
+_current = contextvars.ContextVar('pnutpy_profile', default=None)
+
+
+class CallProfile(dict):
+    """
+    The seconds one endpoint call spent in each phase:
+
+    * ``wait``: held back by the rate limiter
+    * ``ttfb``: from sending the request to the response headers
+    * ``download``: reading the response body
+    * ``decode``: parsing the JSON
+    * ``hydrate``: building the models, including ``dates``
+    * ``dates``: decoding timestamps
+    * ``total``: the whole call
+
+    Retries and the chunks of bulk lookups add up, so with concurrent chunks the phases can
+    exceed ``total``.
+    """
+    def __init__(self):
+        super(CallProfile, self).__init__()
+        self.lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self.lock:
+            self[phase] = self.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+
+class PhaseStats(object):
+    """The aggregated phases of all calls of one endpoint."""
+    def __init__(self):
+        self.calls = 0
+        self.totals = collections.defaultdict(float)
+        self.maxima = collections.defaultdict(float)
+
+    def record(self, profile):
+        self.calls += 1
+        for phase, seconds in profile.items():
+            self.totals[phase] += seconds
+            self.maxima[phase] = max(self.maxima[phase], seconds)
+
+    def snapshot(self):
+        phases = dict((phase, {'total': self.totals[phase], 'mean': self.totals[phase] / self.calls,
+                               'max': self.maxima[phase]}) for phase in PHASES if phase in self.totals)
+        total = self.totals.get('total') or 0.0
+        return {
+            'calls': self.calls,
+            'phases': phases,
+            'network_share': sum(self.totals[p] for p in NETWORK_PHASES) / total if total else 0.0,
+            'cpu_share': sum(self.totals[p] for p in CPU_PHASES) / total if total else 0.0,
+        }
+
+
+class Profiler(object):
+    """
+    Times the phases of every endpoint call, enabled with ``API.build_api(profile=True)``::
+
+        api = pnutpy.API.build_api(access_token=token, profile=True)
+        posts, meta = api.users_posts(1)
+        meta['profile']        # {'wait': 0.0, 'ttfb': 0.41, 'download': 0.12, 'decode': 0.03, ...}
+        print(api.profiler.report())
+
+    Every call's :class:`CallProfile` is attached to its meta as ``profile`` and added to the
+    statistics of its endpoint. Streamed pages are profiled up to the response headers only, as
+    they are read and hydrated after the call returns; the same goes for lazy models.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = collections.OrderedDict()
+
+    def run(self, endpoint, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)`` as a profiled call of ``endpoint``."""
+        profile = CallProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            self.finish(endpoint, profile, started)
+
+        return attach_profile(result, profile)
+
+    async def run_async(self, endpoint, func, *args, **kwargs):
+        """The coroutine counterpart of :meth:`run`."""
+        profile = CallProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            self.finish(endpoint, profile, started)
+
+        return attach_profile(result, profile)
+
+    def finish(self, endpoint, profile, started):
+        profile['total'] = time.perf_counter() - started
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = PhaseStats()
+
+            stats.record(profile)
+
+    def stats(self):
+        """The aggregated phases and the network and CPU share of the time, by endpoint name."""
+        with self.lock:
+            return dict((endpoint, stats.snapshot()) for endpoint, stats in self.endpoints.items())
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def report(self):
+        """The mean milliseconds per phase of every endpoint as a text table."""
+        lines = ['%-32s %7s %s %8s %8s' % ('endpoint', 'calls', ' '.join('%9s' % p for p in PHASES), 'network', 'cpu')]
+        for endpoint, stats in sorted(self.stats().items()):
+            phases = stats['phases']
+            lines.append('%-32s %7d %s %7.0f%% %7.0f%%' % (
+                endpoint, stats['calls'],
+                ' '.join('%9.2f' % (phases[p]['mean'] * 1000 if p in phases else 0) for p in PHASES),
+                stats['network_share'] * 100, stats['cpu_share'] * 100))
+
+        return '\n'.join(lines)
+
+
+def build_profiler(profile):
+    if profile is True:
+        return Profiler()
+
+    return profile or None
+
+
+def current_profile():
+    """The :class:`CallProfile` of the call running in this thread or task, if it is profiled."""
+    return _current.get()
+
+
+def profile_phase(api, name):
+    """A context manager timing phase ``name`` of the current call, if ``api`` profiles calls."""
+    if getattr(api, 'profiler', None) is not None:
+        profile = _current.get()
+        if profile is not None:
+            return profile.phase(name)
+
+    return contextlib.nullcontext()
+
+
+def attach_profile(result, profile):
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], dict):
+        result[1]['profile'] = profile
+
+    return result
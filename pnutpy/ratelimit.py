@@ -0,0 +1,150 @@
+"""
+.. module:: ratelimit
+   :synopsis: Pace requests with the rate limit budget the server reports.
+
+"""
+import asyncio
+import threading
+import time
+
+# Seconds to hold requests back after a 429 that doesn't say when to retry
+DEFAULT_BACKOFF = 10
+
+
+class RateLimiter(object):
+    """
+    A token bucket fed by the ``X-RateLimit-*`` headers of every response.
+
+    One limiter is shared by all threads and coroutines using a client. Each request takes a
+    token; once the budget of the current window is used up requests are held back until the
+    window resets instead of running into ``429 Too Many Requests``.
+
+    A ``429`` always ends the current window: without an ``X-RateLimit-Reset`` or
+    ``Retry-After`` header requests are held back for the length of the last known window, or
+    :data:`DEFAULT_BACKOFF` seconds.
+
+    :param reserve: tokens to leave unused in every window, e.g. for other processes sharing
+        the same access token
+    """
+    def __init__(self, reserve=0, clock=time.monotonic, sleep=time.sleep):
+        self.reserve = reserve
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.window = None
+        self.available_at = 0
+        self.waited = 0.0
+
+    def acquire(self):
+        """
+        Take a token for one request.
+
+        :returns: the number of seconds the caller has to wait before sending it
+        """
+        with self.lock:
+            if self.remaining is None:
+                return 0
+
+            now = self.clock()
+            if self.reset_at is not None and now >= self.reset_at and now >= self.available_at:
+                # Until a response says otherwise the new window has the full budget
+                self.remaining = self.limit or 1
+                self.reset_at = now + self.window
+
+            if self.remaining <= self.reserve:
+                if self.reset_at is None:
+                    return 0
+
+                # Book this request into the next window
+                self.available_at = self.reset_at
+                self.remaining = self.limit or 1
+                self.reset_at = self.reset_at + self.window
+
+            self.remaining -= 1
+            wait = max(0, self.available_at - now)
+            self.waited += wait
+            return wait
+
+    def update(self, headers, status_code=None):
+        """
+        Adopt the budget reported by the server.
+
+        :param headers: the response headers
+        :param status_code: the HTTP status of the response
+        """
+        limit = _int_header(headers, 'X-RateLimit-Limit')
+        remaining = _int_header(headers, 'X-RateLimit-Remaining')
+        reset = _int_header(headers, 'X-RateLimit-Reset')
+        if reset is None:
+            reset = _int_header(headers, 'Retry-After')
+
+        if status_code == 429:
+            remaining = 0
+
+        with self.lock:
+            if status_code == 429 and not reset:
+                reset = self.window or DEFAULT_BACKOFF
+
+            if remaining is None or reset is None:
+                return
+
+            now = self.clock()
+            if status_code == 429:
+                # The server refused, whatever was booked: nothing goes out before the reset
+                self.available_at = max(self.available_at, now + reset)
+            elif now < self.available_at:
+                # Requests already booked into a later window know better than this response
+                return
+
+            self.limit = limit if limit is not None else max(self.limit or 0, remaining)
+            self.window = max(self.window or 0, reset)
+            self.remaining = remaining
+            self.reset_at = max(self.reset_at or 0, now + reset) if status_code == 429 else now + reset
+
+    def available(self):
+        """
+        The requests left in the current window, the whole ``limit`` once it has passed, or
+        ``None`` before any response reported a budget.
+        """
+        with self.lock:
+            if self.remaining is None:
+                return None
+
+            if self.reset_at is not None and self.clock() >= self.reset_at:
+                return self.limit or self.remaining
+
+            return self.remaining
+
+    def knows_reset(self):
+        """
+        Whether the limiter knows when the current window ends, and it is yet to come, so
+        requests are held back until then.
+        """
+        with self.lock:
+            return self.reset_at is not None and self.clock() < self.reset_at
+
+    def wait(self):
+        """Take a token, sleeping until the request may be sent."""
+        delay = self.acquire()
+        if delay:
+            self.sleep(delay)
+
+    async def wait_async(self):
+        """Take a token, sleeping on the event loop until the request may be sent."""
+        delay = self.acquire()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def _int_header(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
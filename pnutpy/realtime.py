@@ -0,0 +1,288 @@
+"""
+.. module:: realtime
+   :synopsis: Consume pnut.io user and app streams over WebSocket.
+
+"""
+import asyncio
+import collections
+import functools
+import logging
+import random
+
+import requests
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - optional dependency
+    websockets = None
+
+from pnutpy.api import ENDPOINTS
+from pnutpy.compact import model_class
+from pnutpy.errors import PnutError
+from pnutpy.json_backends import default_backend
+from pnutpy.models import APIMeta, APIModel, Channel, IdentityMap, Interaction, Message, Post, User
+
+logger = logging.getLogger(__name__)
+
+USER_STREAM_URL = 'wss://stream.pnut.io/v1/user'
+APP_STREAM_URL = 'wss://stream.pnut.io/v1/app'
+
+# The model events of each ``meta.type`` are hydrated with, others become plain APIModels
+EVENT_MODELS = {
+    'post': Post,
+    'message': Message,
+    'channel': Channel,
+    'user': User,
+    'interaction': Interaction,
+}
+
+
+class Subscription(object):
+    """
+    An endpoint subscribed to the stream, e.g. ``api.users_post_streams_unified``.
+
+    ``last_id`` is the newest object seen for it; after a reconnect the endpoint is asked for
+    everything newer, so nothing that happened while disconnected is lost.
+    """
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        endpoint = ENDPOINTS.get(getattr(func, '__name__', None))
+        self.payload_type = endpoint.payload_type if endpoint else None
+        self.subscription_id = None
+        self.last_id = None
+
+    def seen(self, obj_id):
+        try:
+            obj_id = int(obj_id)
+        except (TypeError, ValueError):
+            return
+
+        self.last_id = max(self.last_id or 0, obj_id)
+
+
+class StreamConsumer(object):
+    """
+    Receives the events of a pnut.io user stream (or app stream) and hands them to handlers as
+    models::
+
+        consumer = StreamConsumer(api)
+        consumer.subscribe(api.users_post_streams_unified)
+        consumer.subscribe(api.subscribed_channels)
+
+        @consumer.on('post')
+        def new_post(post, meta):
+            ...
+
+        asyncio.run(consumer.run())
+
+    The consumer opens the WebSocket, reads the ``connection_id`` the server assigns and calls
+    every subscribed endpoint with it. Lost connections are reopened with exponential backoff;
+    the subscriptions are then renewed on the new connection and asked for the objects missed in
+    between. Events seen before (also through that catch up) are not dispatched again.
+
+    ``api`` can be a :class:`pnutpy.api.API`, whose calls are run in a thread, or a
+    :class:`pnutpy.async_api.AsyncAPI`. Handlers can be functions or coroutines and get
+    ``(obj, meta)``; ``'*'`` receives every event. Objects from the catch up come with a meta like
+    the stream's, with their ``type``, ``connection_id`` and ``subscription_ids``. Exceptions of
+    handlers are logged and don't stop the consumer. Requires the ``websockets`` package.
+
+    :param url: the stream to connect to, :data:`USER_STREAM_URL` by default. App streams
+        (:data:`APP_STREAM_URL`) need ``key``.
+    :param access_token: defaults to the token of ``api``
+    :param backoff: the first reconnect delay in seconds, doubled up to ``max_backoff``
+    """
+    def __init__(self, api, url=USER_STREAM_URL, access_token=None, key=None, backoff=1, max_backoff=60,
+                 dedupe_size=10000, **connect_kwargs):
+        if websockets is None:
+            raise PnutError('StreamConsumer requires websockets, install it with: pip install pnutpy[stream]')
+
+        self.api = api
+        self.url = url
+        self.access_token = access_token or api_token(api)
+        self.key = key
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.connect_kwargs = connect_kwargs
+        self.subscriptions = []
+        self.handlers = collections.defaultdict(list)
+        self.seen = collections.OrderedDict()
+        self.dedupe_size = dedupe_size
+        self.connection_id = None
+        self.connection = None
+        self.connects = 0
+        self.stopped = False
+        self.backend = getattr(api, 'json_backend', default_backend)
+
+    def subscribe(self, func, *args, **kwargs):
+        """Subscribe the endpoint method ``func`` (called with ``args`` and ``kwargs``) to the stream."""
+        subscription = Subscription(func, args, kwargs)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def on(self, event_type, handler=None):
+        """Register ``handler`` for events of ``event_type``; works as a decorator too."""
+        if handler is None:
+            return functools.partial(self.on, event_type)
+
+        self.handlers[event_type].append(handler)
+        return handler
+
+    def stream_url(self):
+        params = [('access_token', self.access_token)]
+        if self.key:
+            params.append(('key', self.key))
+
+        return '%s?%s' % (self.url, '&'.join('%s=%s' % (k, v) for k, v in params if v))
+
+    async def run(self):
+        """Consume the stream until :meth:`stop` is called."""
+        delay = self.backoff
+        while not self.stopped:
+            try:
+                async with websockets.connect(self.stream_url(), **self.connect_kwargs) as connection:
+                    self.connection = connection
+                    delay = self.backoff
+                    await self.consume(connection)
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                logger.debug('Stream connection lost: %s', e)
+            except (PnutError, requests.RequestException) as e:
+                # Renewing the subscriptions failed, e.g. on a 5xx or a rate limit
+                logger.warning('Subscribing to the stream failed: %s', e)
+            finally:
+                self.connection = None
+                self.connection_id = None
+
+            if self.stopped:
+                break
+
+            # Full jitter keeps many clients from reconnecting in lockstep
+            await asyncio.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, self.max_backoff)
+
+    async def stop(self):
+        self.stopped = True
+        if self.connection is not None:
+            await self.connection.close()
+
+    async def consume(self, connection):
+        async for raw in connection:
+            message = self.backend.loads(raw)
+            meta = message.get('meta') or {}
+            if self.connection_id is None and meta.get('connection_id'):
+                self.connection_id = meta['connection_id']
+                self.connects += 1
+                await self.subscribe_all(resume=self.connects > 1)
+                if 'data' not in message:
+                    continue
+
+            await self.dispatch(message)
+
+    async def subscribe_all(self, resume=False):
+        for subscription in self.subscriptions:
+            kwargs = dict(subscription.kwargs, connection_id=self.connection_id)
+            resume_from = subscription.last_id if resume else None
+            if resume_from is not None:
+                kwargs['since_id'] = resume_from
+
+            data, meta = await self.call(subscription.func, *subscription.args, **kwargs)
+            subscription.subscription_id = meta.get('subscription_id')
+            objects = list(data) if isinstance(data, list) else [data]
+            if resume_from is not None:
+                # Page down to the last object seen, the subscription is already renewed
+                page_kwargs = dict(kwargs)
+                del page_kwargs['connection_id']
+                page, page_meta = data, meta
+                while page and page_meta.get('more') and page_meta.get('min_id'):
+                    page_kwargs['before_id'] = page_meta.get('min_id')
+                    page, page_meta = await self.call(subscription.func, *subscription.args, **page_kwargs)
+                    objects.extend(page)
+
+            event_type = type_name(subscription.payload_type)
+            event_meta = self.catch_up_meta(event_type, subscription) if resume else None
+            for obj in objects:
+                if getattr(obj, 'get', None) is None or obj.get('id') is None:
+                    continue
+
+                # The objects created while the stream was disconnected
+                if resume:
+                    await self.deliver(event_type, obj, event_meta)
+
+                subscription.seen(obj.get('id'))
+
+    def catch_up_meta(self, event_type, subscription):
+        """The meta of a stream event for objects a subscription caught up on, in place of the page's."""
+        meta = {'type': event_type, 'connection_id': self.connection_id}
+        if subscription.subscription_id is not None:
+            meta['subscription_ids'] = [subscription.subscription_id]
+
+        return APIMeta.from_response_data(meta, api=self.api)
+
+    async def call(self, func, *args, **kwargs):
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def dispatch(self, message):
+        """Hydrate the objects of one stream event and hand them to the handlers."""
+        meta = APIMeta.from_response_data(message.get('meta') or {}, api=self.api)
+        event_type = meta.get('type')
+        model = model_class(self.api, EVENT_MODELS.get(event_type, APIModel))
+        data = message.get('data')
+        identity_map = IdentityMap(parent=getattr(self.api, 'identity_map', None))
+        for raw in data if isinstance(data, list) else [data]:
+            if raw is None:
+                continue
+
+            obj = model.from_response_data(raw, api=self.api, identity_map=identity_map)
+            for subscription in self.matching_subscriptions(event_type, meta):
+                subscription.seen(raw.get('id'))
+
+            await self.deliver(event_type, obj, meta)
+
+    def matching_subscriptions(self, event_type, meta):
+        """The subscriptions an event belongs to, by ``meta.subscription_ids`` when it is sent."""
+        subscription_ids = meta.get('subscription_ids')
+        for subscription in self.subscriptions:
+            if type_name(subscription.payload_type) != event_type:
+                continue
+
+            if subscription_ids and subscription.subscription_id not in subscription_ids:
+                continue
+
+            yield subscription
+
+    async def deliver(self, event_type, obj, meta):
+        key = (event_type, str(obj.get('id')), bool(obj.get('is_deleted') or meta.get('is_deleted')), obj.get('revision'))
+        if obj.get('id') is not None:
+            if key in self.seen:
+                return
+
+            self.seen[key] = True
+            if len(self.seen) > self.dedupe_size:
+                self.seen.popitem(last=False)
+
+        for handler in self.handlers.get(event_type, []) + self.handlers.get('*', []):
+            # A failing handler must not end the stream for the others
+            try:
+                result = handler(obj, meta)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                logger.exception('Stream handler %r failed on %s %s', handler, event_type, obj.get('id'))
+
+
+def type_name(payload_type):
+    for name, model in EVENT_MODELS.items():
+        if payload_type is model:
+            return name
+
+    return None
+
+
+def api_token(api):
+    authorization = (getattr(api, 'headers', None) or {}).get('Authorization', '')
+    return authorization[len('Bearer '):] if authorization.startswith('Bearer ') else None
@@ -0,0 +1,580 @@
+"""
+.. module:: standin
+   :synopsis: A local stand-in for the pnut.io API, for tests and load tests.
+
+"""
+import argparse
+import collections
+import datetime
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from pnutpy.api import ENDPOINTS, re_path_template
+from pnutpy.models import Channel, Interaction, Message, Post, Token, User
+
+EPOCH = datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc)
+
+INJECTED_ERRORS = (500, 502, 503)
+
+
+class Route(object):
+    """One endpoint of :data:`pnutpy.api.ENDPOINTS` as the server matches it."""
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.params = [name[1:-1] for name in re_path_template.findall(endpoint.path)]
+        self.pattern = re.compile('^%s$' % re_path_template.sub('([^/]+)', endpoint.path))
+
+    def match(self, method, path):
+        if method != self.endpoint.method:
+            return None
+
+        match = self.pattern.match(path)
+        return dict(zip(self.params, match.groups())) if match else None
+
+
+def build_routes():
+    # Literal paths first, so /posts/streams/global wins over /posts/{post_id}
+    routes = [Route(endpoint) for endpoint in ENDPOINTS.values()]
+    return sorted(routes, key=lambda route: (len(route.params), -len(route.endpoint.path)))
+
+
+def page_ids(top, count, before_id=None, since_id=None, step=1, offset=0):
+    """
+    A page of the ids ``1..top`` that are ``offset`` modulo ``step``, newest first, with
+    pnut.io's ``before_id``/``since_id`` pagination. Returns the ids and whether there are more.
+    """
+    high = top if before_id is None else min(top, before_id - 1)
+    high -= (high - offset) % step
+    low = 1 if since_id is None else since_id + 1
+    ids = []
+    while high >= low and len(ids) <= count:
+        ids.append(high)
+        high -= step
+
+    return ids[:count], len(ids) > count
+
+
+class StandInServer(object):
+    """
+    A local HTTP server answering every endpoint :class:`pnutpy.api.API` knows with made up but
+    consistently shaped data, for tests and load tests that shouldn't go to pnut.io::
+
+        with StandInServer(latency=0.05, jitter=0.02, error_rate=0.01, rate_limit=5000) as server:
+            api = pnutpy.API.build_api(api_root=server.api_root, access_token='token')
+            posts, meta = api.posts_streams_global(count=200)
+
+    There are ``posts`` posts, by ``users`` users in turn, and ``messages`` messages spread over
+    ``channels`` channels; created objects get the next id. Lists are paginated like the real
+    API, with ``before_id``, ``since_id``, ``count`` and ``meta.more``/``min_id``/``max_id``.
+
+    :param latency: seconds every response is delayed by
+    :param jitter: up to this many seconds more, at random
+    :param error_rate: the share of requests answered with a 500, 502 or 503
+    :param throttle_rate: the share of requests answered with a 429
+    :param rate_limit: requests per ``window`` seconds and access token; responses carry
+        ``X-RateLimit-*`` headers and requests beyond the budget get a 429
+    :param seed: makes the injected latency and failures repeatable
+    """
+    def __init__(self, host='127.0.0.1', port=0, posts=10000, users=500, channels=50, messages=10000, latency=0,
+                 jitter=0, error_rate=0, throttle_rate=0, rate_limit=None, window=60, seed=None):
+        self.host = host
+        self.port = port
+        self.post_count = posts
+        self.user_count = users
+        self.channel_count = channels
+        self.message_count = messages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.window = window
+        self.random = random.Random(seed)
+        self.routes = build_routes()
+        self.lock = threading.Lock()
+        self.created = {}
+        self.budgets = {}
+        self.statuses = collections.Counter()
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%s' % (self.httpd.server_address[0], self.httpd.server_address[1])
+
+    @property
+    def api_root(self):
+        return self.url + '/v0'
+
+    def start(self):
+        """Serve from a daemon thread."""
+        server = self
+
+        class Handler(StandInHandler):
+            standin = server
+
+        self.httpd = StandInHTTPServer((self.host, self.port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, method, url, headers, body):
+        """The ``(status, envelope, headers)`` to answer a request with."""
+        split = urlsplit(url)
+        query = dict((k, v[0]) for k, v in parse_qs(split.query).items())
+        path = split.path[3:] if split.path.startswith('/v0') else split.path
+        with self.lock:
+            within_budget, response_headers = self.spend_budget(headers.get('Authorization') or 'anonymous')
+            injected = self.random.random()
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+        if delay:
+            time.sleep(delay)
+
+        if not within_budget:
+            return 429, error_envelope(429, 'Rate limit exceeded'), response_headers
+
+        if injected < self.throttle_rate:
+            return 429, error_envelope(429, 'Injected rate limit'), response_headers
+
+        if injected < self.throttle_rate + self.error_rate:
+            code = INJECTED_ERRORS[int(injected * 1000) % len(INJECTED_ERRORS)]
+            return code, error_envelope(code, 'Injected failure'), response_headers
+
+        for route in self.routes:
+            params = route.match(method, path)
+            if params is not None:
+                break
+        else:
+            return 404, error_envelope(404, 'Not found'), response_headers
+
+        try:
+            data = json.loads(body) if body and body[:1] in (b'{', b'[') else {}
+        except ValueError:
+            return 400, error_envelope(400, 'Invalid JSON'), response_headers
+
+        try:
+            code, envelope = self.handle(route.endpoint, params, query, data)
+        except (KeyError, ValueError):
+            return 404, error_envelope(404, 'Not found'), response_headers
+
+        return code, envelope, response_headers
+
+    def spend_budget(self, token):
+        """Count a request of ``token``; returns whether it is within the rate limit, and the headers."""
+        if not self.rate_limit:
+            return True, {}
+
+        now = time.monotonic()
+        started, used = self.budgets.get(token, (now, 0))
+        if now - started >= self.window:
+            started, used = now, 0
+
+        used += 1
+        self.budgets[token] = (started, used)
+        return used <= self.rate_limit, {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(max(0, self.rate_limit - used)),
+            'X-RateLimit-Reset': str(int(max(1, started + self.window - now))),
+        }
+
+    def handle(self, endpoint, params, query, data):
+        handler = {
+            Post: self.handle_posts,
+            Message: self.handle_messages,
+            User: self.handle_users,
+            Channel: self.handle_channels,
+            Interaction: self.handle_interactions,
+            Token: self.handle_token,
+        }.get(endpoint.payload_type, self.handle_other)
+        return handler(endpoint, params, query, data)
+
+    def handle_posts(self, endpoint, params, query, data):
+        if endpoint.payload_list:
+            if 'ids' in query:
+                return listing([self.post(i) for i in parse_ids(query) if 0 < i <= self.post_count])
+
+            user_id = params.get('user_id')
+            if user_id is not None:
+                return self.page(self.post, self.post_count, query, self.user_count, self.user_id(user_id))
+
+            return self.page(self.post, self.post_count, query)
+
+        if endpoint.method == 'POST':
+            with self.lock:
+                self.post_count += 1
+                post_id = self.post_count
+                self.created[('post', post_id)] = dict(self.post(post_id), content=content(data.get('text', '')))
+
+            return 201, envelope(self.post(post_id))
+
+        post = self.post(self.existing(params['post_id'], self.post_count))
+        if endpoint.method == 'DELETE' and endpoint.path == '/posts/{post_id}':
+            post['is_deleted'] = True
+        elif endpoint.path.endswith('/bookmark'):
+            post['you_bookmarked'] = endpoint.method == 'PUT'
+        elif endpoint.path.endswith('/repost'):
+            post['you_reposted'] = endpoint.method == 'PUT'
+
+        return 200, envelope(post)
+
+    def handle_messages(self, endpoint, params, query, data):
+        if endpoint.payload_list:
+            if 'ids' in query:
+                return listing([self.message(i) for i in parse_ids(query) if 0 < i <= self.message_count])
+
+            channel_id = params.get('channel_id')
+            if channel_id is not None:
+                return self.page(self.message, self.message_count, query, self.channel_count, int(channel_id))
+
+            return self.page(self.message, self.message_count, query)
+
+        if endpoint.method == 'POST':
+            channel_id = int(params['channel_id'])
+            with self.lock:
+                # The next id that belongs to the channel
+                message_id = self.message_count + 1
+                message_id += (channel_id - message_id) % self.channel_count
+                self.message_count = message_id
+                self.created[('message', message_id)] = dict(self.message(message_id),
+                                                            content=content(data.get('text', '')))
+
+            return 201, envelope(self.message(message_id))
+
+        message = self.message(self.existing(params['message_id'], self.message_count))
+        if endpoint.method == 'DELETE' and endpoint.path.endswith('{message_id}'):
+            message['is_deleted'] = True
+
+        return 200, envelope(message)
+
+    def handle_users(self, endpoint, params, query, data):
+        if endpoint.payload_list:
+            if 'ids' in query:
+                return listing([self.user(i) for i in parse_ids(query) if 0 < i <= self.user_count])
+
+            return self.page(self.user, self.user_count, query)
+
+        user = self.user(self.existing(self.user_id(params.get('user_id', 'me')), self.user_count))
+        if endpoint.method in ('PUT', 'PATCH'):
+            user.update((k, v) for k, v in data.items() if k in ('name', 'locale', 'timezone'))
+        elif endpoint.path.endswith('/follow'):
+            user['you_follow'] = endpoint.method == 'PUT'
+
+        return 200, envelope(user)
+
+    def handle_channels(self, endpoint, params, query, data):
+        if endpoint.payload_list:
+            if 'ids' in query:
+                return listing([self.channel(i) for i in parse_ids(query) if 0 < i <= self.channel_count])
+
+            return self.page(self.channel, self.channel_count, query)
+
+        if endpoint.method == 'POST':
+            with self.lock:
+                self.channel_count += 1
+                channel_id = self.channel_count
+
+            return 201, envelope(self.channel(channel_id))
+
+        channel_id = params.get('channel_id', '1')
+        return 200, envelope(self.channel(self.existing(channel_id, self.channel_count)))
+
+    def handle_interactions(self, endpoint, params, query, data):
+        ids, more = page_ids(self.post_count, page_count(query), int_param(query, 'before_id'),
+                             int_param(query, 'since_id'))
+        meta = {'more': more}
+        if ids:
+            meta.update(max_id=str(ids[0]), min_id=str(ids[-1]))
+
+        return 200, envelope([self.interaction(i) for i in ids], **meta)
+
+    def handle_token(self, endpoint, params, query, data):
+        return 200, envelope({
+            'app': {'id': 'standin', 'name': 'Stand-in', 'link': 'http://localhost'},
+            'scopes': ['basic', 'stream', 'write_post', 'follow', 'update_profile', 'presence', 'messages'],
+            'user': self.user(1),
+            'storage': {'available': 10 ** 9, 'total': 10 ** 10},
+        })
+
+    def handle_other(self, endpoint, params, query, data):
+        if endpoint.payload_list:
+            return listing([])
+
+        values = list(params.values())
+        return 200, envelope({'id': values[0] if values else '1'})
+
+    def page(self, build, top, query, step=1, offset=0):
+        ids, more = page_ids(top, page_count(query), int_param(query, 'before_id'), int_param(query, 'since_id'),
+                             step, offset)
+        return listing([build(i) for i in ids], more)
+
+    def existing(self, object_id, top):
+        object_id = int(object_id)
+        if not 0 < object_id <= top:
+            raise KeyError(object_id)
+
+        return object_id
+
+    def user_id(self, value):
+        if value == 'me':
+            return 1
+
+        digits = re.sub(r'\D', '', value)
+        return int(digits) if digits else 1
+
+    def user(self, user_id):
+        return {
+            'id': str(user_id),
+            'username': 'user%s' % user_id,
+            'name': 'User %s' % user_id,
+            'created_at': timestamp(user_id * 3600),
+            'locale': 'en_US',
+            'timezone': 'Europe/Berlin',
+            'type': 'human',
+            'content': dict(content('Stand-in user %s' % user_id), avatar_image={
+                'link': 'https://cdn.pnut.io/avatars/%s.png' % user_id, 'is_default': False, 'width': 200,
+                'height': 200}),
+            'counts': {'bookmarks': user_id % 50, 'clients': 0, 'followers': user_id % 300,
+                       'following': user_id % 200, 'posts': self.post_count // self.user_count, 'users': 0},
+            'follows_you': user_id % 3 == 0,
+            'you_blocked': False,
+            'you_can_follow': True,
+            'you_follow': user_id % 4 == 0,
+            'you_muted': False,
+        }
+
+    def post(self, post_id):
+        created = self.created.get(('post', post_id))
+        if created is not None:
+            return dict(created)
+
+        author = post_id % self.user_count or self.user_count
+        return {
+            'id': str(post_id),
+            'created_at': timestamp(post_id * 60),
+            'is_deleted': False,
+            'is_nsfw': False,
+            'is_revised': False,
+            'source': {'name': 'Stand-in', 'link': 'http://localhost', 'id': 'standin'},
+            'thread_id': str(post_id),
+            'user': self.user(author),
+            'counts': {'bookmarks': post_id % 7, 'replies': post_id % 3, 'reposts': post_id % 5, 'threads': 1},
+            'content': content('Post %s by @user%s about #pnut' % (post_id, author), author),
+            'you_bookmarked': False,
+            'you_reposted': False,
+        }
+
+    def message(self, message_id):
+        created = self.created.get(('message', message_id))
+        if created is not None:
+            return dict(created)
+
+        channel_id = message_id % self.channel_count or self.channel_count
+        author = message_id % self.user_count or self.user_count
+        return {
+            'id': str(message_id),
+            'channel_id': str(channel_id),
+            'created_at': timestamp(message_id * 30),
+            'is_deleted': False,
+            'is_sticky': False,
+            'source': {'name': 'Stand-in', 'link': 'http://localhost', 'id': 'standin'},
+            'thread_id': str(message_id),
+            'user': self.user(author),
+            'counts': {'replies': 0},
+            'content': content('Message %s in channel %s' % (message_id, channel_id)),
+            'raw': [{'type': 'io.pnut.core.oembed', 'value': {
+                'type': 'photo', 'version': '1.0', 'width': 640, 'height': 480,
+                'url': 'https://files.pnut.io/%s.jpg' % message_id}}] if message_id % 4 == 0 else [],
+        }
+
+    def channel(self, channel_id):
+        return {
+            'id': str(channel_id),
+            'type': 'io.pnut.core.chat',
+            'is_active': True,
+            'owner': self.user(channel_id % self.user_count or self.user_count),
+            'counts': {'messages': self.message_count // self.channel_count, 'subscribers': channel_id % 40 + 1},
+            'acl': {'full': {'immutable': False, 'you': True, 'user_ids': []},
+                    'read': {'any_user': False, 'immutable': False, 'public': True, 'you': True, 'user_ids': []},
+                    'write': {'any_user': False, 'immutable': False, 'you': True, 'user_ids': []}},
+            'has_unread': False,
+            'you_muted': False,
+            'you_subscribed': True,
+        }
+
+    def interaction(self, number):
+        action = ('bookmark', 'repost', 'reply', 'follow')[number % 4]
+        objects = [self.user(1)] if action == 'follow' else [self.post(number)]
+        return {
+            'action': action,
+            'event_date': timestamp(number * 60 + 30),
+            'users': [self.user(number % self.user_count or self.user_count)],
+            'objects': objects,
+            'pagination_id': str(number),
+        }
+
+
+class StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients connect at once in load tests, don't drop their connections
+    request_queue_size = 512
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, don't hold the body back for a delayed ACK
+    disable_nagle_algorithm = True
+    standin = None
+
+    def answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        code, envelope, headers = self.standin.respond(self.command, self.path, self.headers, body)
+        with self.standin.lock:
+            self.standin.statuses[code] += 1
+
+        payload = json.dumps(envelope).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = answer
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInProcess(object):
+    """
+    A :class:`StandInServer` in a child process, so serving doesn't compete with the client
+    being measured for the interpreter lock. Takes the same arguments.
+    """
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.process = None
+        self.api_root = None
+
+    def start(self):
+        queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=serve_process, args=(queue, self.kwargs), daemon=True)
+        self.process.start()
+        self.api_root = queue.get(timeout=30)
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def serve_process(queue, kwargs):
+    server = StandInServer(**kwargs).start()
+    queue.put(server.api_root)
+    server.thread.join()
+
+
+def timestamp(seconds):
+    return (EPOCH + datetime.timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def content(text, mentioned=None):
+    entities = {'links': [], 'mentions': [], 'tags': []}
+    if mentioned is not None and '@' in text:
+        username = 'user%s' % mentioned
+        entities['mentions'].append({'id': str(mentioned), 'len': len(username), 'pos': text.index('@'),
+                                     'text': username})
+
+    if '#' in text:
+        tag = text[text.index('#') + 1:].split(' ')[0]
+        entities['tags'].append({'len': len(tag), 'pos': text.index('#'), 'text': tag})
+
+    return {'text': text, 'html': '<span>%s</span>' % text, 'entities': entities}
+
+
+def envelope(data, code=200, **meta):
+    meta['code'] = code
+    return {'meta': meta, 'data': data}
+
+
+def listing(data, more=False):
+    meta = {'more': more}
+    if data:
+        meta.update(max_id=data[0]['id'], min_id=data[-1]['id'])
+
+    return 200, envelope(data, **meta)
+
+
+def error_envelope(code, message):
+    return {'meta': {'code': code, 'error_message': message}}
+
+
+def parse_ids(query):
+    return [int(i) for i in query['ids'].split(',') if i.strip().isdigit()]
+
+
+def int_param(query, name):
+    value = query.get(name)
+    return int(value) if value is not None else None
+
+
+def page_count(query):
+    return max(1, min(200, int(query.get('count', 20))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pnutpy.standin', description='Run a local pnut.io API stand-in.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0, help='seconds every response is delayed by')
+    parser.add_argument('--jitter', type=float, default=0, help='up to this many seconds more, at random')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of requests failing with a 5xx')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='share of requests answered with a 429')
+    parser.add_argument('--rate-limit', type=int, default=None, help='requests per window and access token')
+    parser.add_argument('--window', type=int, default=60, help='the rate limit window in seconds')
+    options = parser.parse_args(argv)
+
+    server = StandInServer(host=options.host, port=options.port, posts=options.posts, users=options.users,
+                           latency=options.latency, jitter=options.jitter, error_rate=options.error_rate,
+                           throttle_rate=options.throttle_rate, rate_limit=options.rate_limit, window=options.window)
+    server.start()
+    print('Serving the pnut.io API stand-in on %s' % (server.api_root))
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+.. module:: stream
+   :synopsis: Hydrate the objects of a list response while it is still being received.
+
+"""
+import re
+
+from pnutpy.errors import PnutError
+from pnutpy.models import APIMeta, IdentityMap
+
+CHUNK_SIZE = 64 * 1024
+
+# The characters that matter outside and inside of strings, everything else is skipped over
+_structure = re.compile(rb'["{}\[\]]')
+_string = re.compile(rb'["\\]')
+
+
+class EnvelopeSplitter(object):
+    """
+    An incremental scanner for a response envelope.
+
+    Bytes are fed in as they arrive; every complete element of the top level ``data`` array comes
+    out as soon as its closing brace has been read. Scalar elements, like the ids of an id list,
+    come out once the separator after them has. Everything else is kept, with ``data`` emptied,
+    and parsed into :attr:`envelope` at the end.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.string_start = 0
+        self.last_key = None
+        self.in_data = False
+        self.element_start = None
+        # Where the bytes between two elements of data start, which may hold scalar elements
+        self.gap_start = None
+        self.envelope_parts = []
+        self.segment_start = 0
+
+    def feed(self, chunk):
+        """Add ``chunk`` and return the raw bytes of the elements it completed."""
+        self.buffer.extend(chunk)
+        elements = []
+        buf = self.buffer
+        while True:
+            if self.in_string:
+                match = _string.search(buf, self.pos)
+                if match is None:
+                    self.pos = len(buf)
+                    break
+
+                i = match.start()
+                if buf[i] == 0x5c:  # backslash, skip the escaped character
+                    if i + 1 >= len(buf):
+                        self.pos = i
+                        break
+
+                    self.pos = i + 2
+                    continue
+
+                self.in_string = False
+                self.pos = i + 1
+                if self.depth == 1 and not self.in_data:
+                    self.last_key = bytes(buf[self.string_start + 1:i])
+                elif self.depth == 2 and self.in_data:
+                    elements.append(bytes(buf[self.element_start:i + 1]))
+                    self.element_start = None
+                    self.gap_start = i + 1
+                continue
+
+            match = _structure.search(buf, self.pos)
+            if match is None:
+                self.pos = len(buf)
+                break
+
+            i = match.start()
+            char = buf[i]
+            self.pos = i + 1
+            if self.gap_start is not None:
+                elements.extend(scalar_elements(buf[self.gap_start:i]))
+                self.gap_start = None
+
+            if char == 0x22:  # quote
+                self.in_string = True
+                self.string_start = i
+                if self.depth == 2 and self.in_data:
+                    self.element_start = i
+            elif char in (0x7b, 0x5b):  # { [
+                self.depth += 1
+                if self.depth == 2 and char == 0x5b and self.last_key == b'data':
+                    self.envelope_parts.append(bytes(buf[self.segment_start:i + 1]))
+                    self.in_data = True
+                    self.gap_start = i + 1
+                elif self.depth == 3 and self.in_data:
+                    self.element_start = i
+            else:
+                self.depth -= 1
+                if self.in_data and self.depth == 2 and self.element_start is not None:
+                    elements.append(bytes(buf[self.element_start:i + 1]))
+                    self.element_start = None
+                    self.gap_start = i + 1
+                elif self.in_data and self.depth == 1:
+                    self.in_data = False
+                    self.segment_start = i
+
+        self.compact()
+        return elements
+
+    def compact(self):
+        """Drop the bytes that are no longer needed."""
+        keep = self.pos
+        if self.in_string:
+            # A key has to be read in one piece
+            keep = self.string_start
+
+        if self.in_data:
+            if self.element_start is not None:
+                keep = self.element_start
+            elif self.gap_start is not None:
+                keep = self.gap_start
+        else:
+            self.envelope_parts.append(bytes(self.buffer[self.segment_start:keep]))
+
+        del self.buffer[:keep]
+        self.pos -= keep
+        self.string_start -= keep
+        self.segment_start = 0
+        if self.element_start is not None:
+            self.element_start -= keep
+        if self.gap_start is not None:
+            self.gap_start -= keep
+
+    @property
+    def envelope(self):
+        """The raw envelope without the elements of ``data``."""
+        return b''.join(self.envelope_parts)
+
+
+def scalar_elements(gap):
+    """The numbers, ``true``, ``false`` and ``null`` elements between two other elements of data."""
+    gap = bytes(gap).strip(b', \t\r\n')
+    if not gap:
+        return []
+
+    return [element.strip() for element in gap.split(b',')]
+
+
+class StreamedPage(object):
+    """
+    The result of calling a list endpoint with ``stream=True``.
+
+    Iterating it hydrates the objects of the response one at a time while the body is still being
+    read from the socket, so only the object at hand is kept in memory. :attr:`meta` is set once
+    the whole response has been read::
+
+        page = api.get_channel_messages(channel_id, count=200, stream=True)
+        for message in page:
+            export(message)
+
+        if page.meta.more:
+            ...
+
+    A page can be iterated once.
+    """
+    def __init__(self, response, hydrate, backend, api=None, chunk_size=CHUNK_SIZE, plain_meta=False):
+        self.response = response
+        self.hydrate = hydrate
+        self.backend = backend
+        self.api = api
+        self.chunk_size = chunk_size
+        self.plain_meta = plain_meta
+        self.meta = None
+        self.consumed = False
+
+    def start(self):
+        if self.consumed:
+            raise PnutError('A streamed page can only be iterated once')
+
+        self.consumed = True
+        return EnvelopeSplitter()
+
+    def finish(self, splitter):
+        meta = self.backend.loads(splitter.envelope).get('meta', {})
+        self.meta = meta if self.plain_meta else APIMeta.from_response_data(meta, api=self.api)
+
+    def __iter__(self):
+        splitter = self.start()
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                for raw in splitter.feed(chunk):
+                    yield self.hydrate(self.backend.loads(raw))
+        finally:
+            self.response.close()
+
+        self.finish(splitter)
+
+    def __repr__(self):
+        return '<StreamedPage %s>' % (self.response.url)
+
+
+class AsyncStreamedPage(StreamedPage):
+    """
+    The :class:`pnutpy.async_api.AsyncAPI` version of :class:`StreamedPage`, iterated with
+    ``async for``.
+    """
+    def __iter__(self):
+        raise TypeError('Use async for with an AsyncStreamedPage')
+
+    async def __aiter__(self):
+        splitter = self.start()
+        try:
+            async for chunk in self.response.aiter_bytes(self.chunk_size):
+                for raw in splitter.feed(chunk):
+                    yield self.hydrate(self.backend.loads(raw))
+        finally:
+            await self.response.aclose()
+
+        self.finish(splitter)
+
+
+def stream_identity_map(api):
+    """
+    Repeated users and posts are still shared while a page is consumed, but only for as long as
+    the caller keeps them.
+    """
+    return IdentityMap(parent=getattr(api, 'identity_map', None), shared=True)
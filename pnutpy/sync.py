@@ -0,0 +1,248 @@
+"""
+.. module:: sync
+   :synopsis: Keep a local SQLite copy of streams and fetch only what is new.
+
+"""
+import sqlite3
+import threading
+import time
+
+from pnutpy.compact import model_class
+from pnutpy.cursor import pages
+from pnutpy.json_backends import default_backend
+from pnutpy.models import Channel, Message, Post, User
+
+MODELS = {
+    'post': Post,
+    'message': Message,
+    'channel': Channel,
+    'user': User,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    is_deleted INTEGER NOT NULL DEFAULT 0,
+    data BLOB NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE TABLE IF NOT EXISTS stream_entities (
+    stream TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (stream, id)
+);
+CREATE TABLE IF NOT EXISTS streams (
+    stream TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    since_id INTEGER,
+    synced_at REAL
+);
+"""
+
+
+class SyncStore(object):
+    """
+    The local database: every entity once per kind and id, which streams it belongs to, and the
+    high-water mark of every stream.
+
+    :param path: the SQLite database file, ``':memory:'`` for a throwaway store
+    """
+    def __init__(self, path=':memory:', backend=default_backend):
+        self.path = path
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def save(self, stream, kind, objects):
+        """Store raw response ``objects`` of ``kind`` as members of ``stream``."""
+        rows = [(kind, int(obj['id']), 1 if obj.get('is_deleted') else 0, self.backend.dumps(obj)) for obj in objects]
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO entities (kind, id, is_deleted, data) VALUES (?, ?, ?, ?)',
+                                        rows)
+            if stream is not None:
+                self.connection.executemany('INSERT OR IGNORE INTO stream_entities (stream, id) VALUES (?, ?)',
+                                            [(stream, row[1]) for row in rows])
+
+    def replace_members(self, stream, kind, objects):
+        """Make ``objects`` the complete contents of ``stream``."""
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM stream_entities WHERE stream = ?', (stream,))
+
+        self.save(stream, kind, objects)
+
+    def since_id(self, stream):
+        """The id of the newest object of ``stream`` synced so far, or ``None``."""
+        with self.lock:
+            row = self.connection.execute('SELECT since_id FROM streams WHERE stream = ?', (stream,)).fetchone()
+
+        return row[0] if row else None
+
+    def mark_synced(self, stream, kind, since_id):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO streams (stream, kind, since_id, synced_at) VALUES (?, ?, ?, ?)',
+                                    (stream, kind, since_id, time.time()))
+
+    def recent_ids(self, stream, count):
+        """The ids of the ``count`` newest objects of ``stream``."""
+        with self.lock:
+            rows = self.connection.execute('SELECT id FROM stream_entities WHERE stream = ? ORDER BY id DESC LIMIT ?',
+                                           (stream, count)).fetchall()
+
+        return [row[0] for row in rows]
+
+    def get(self, kind, id_):
+        """The raw object of ``kind`` with ``id_``, or ``None``."""
+        with self.lock:
+            row = self.connection.execute('SELECT data FROM entities WHERE kind = ? AND id = ?',
+                                          (kind, int(id_))).fetchone()
+
+        return self.backend.loads(row[0]) if row else None
+
+    def items(self, stream, count=None, before_id=None, include_deleted=False):
+        """The raw objects of ``stream``, newest first."""
+        query = ('SELECT e.data FROM stream_entities s JOIN entities e ON e.id = s.id '
+                 'AND e.kind = (SELECT kind FROM streams WHERE stream = s.stream) WHERE s.stream = ?')
+        params = [stream]
+        if before_id is not None:
+            query += ' AND s.id < ?'
+            params.append(int(before_id))
+
+        if not include_deleted:
+            query += ' AND e.is_deleted = 0'
+
+        query += ' ORDER BY s.id DESC'
+        if count is not None:
+            query += ' LIMIT ?'
+            params.append(count)
+
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+
+        return [self.backend.loads(row[0]) for row in rows]
+
+    def stream_kind(self, stream):
+        """The kind of objects in ``stream``, or ``None`` for a stream never synced."""
+        with self.lock:
+            row = self.connection.execute('SELECT kind FROM streams WHERE stream = ?', (stream,)).fetchone()
+
+        return row[0] if row else None
+
+    def streams(self):
+        """The names of the synced streams."""
+        with self.lock:
+            return [row[0] for row in self.connection.execute('SELECT stream FROM streams ORDER BY stream')]
+
+    def close(self):
+        self.connection.close()
+
+
+class SyncEngine(object):
+    """
+    Mirrors streams into a :class:`SyncStore`, so every run only fetches what is new::
+
+        engine = SyncEngine(api, SyncStore('pnut.sqlite'))
+        engine.sync_user_posts('me')
+        posts = engine.items('users_posts:me', count=50)
+
+    The first run pages through the whole stream, later runs only the objects newer than the
+    stream's high-water mark, which is saved once a run has completed. Pages are requested
+    with ``include_deleted`` so deletions of new objects are stored, and the ``recheck`` newest
+    objects already stored are fetched again by id to pick up deletes and edits
+    (``is_revised``) of recent posts and messages.
+
+    :param recheck: how many of the newest stored objects to fetch again on every run
+    """
+    def __init__(self, api, store, recheck=200, count=200):
+        self.api = api
+        self.store = store
+        self.recheck = recheck
+        self.count = count
+
+    def sync(self, stream, func, *args, kind='post', recheck_with=None, **kwargs):
+        """
+        Fetch the objects of ``func(*args, **kwargs)`` newer than the last run into ``stream``.
+
+        :param recheck_with: the bulk lookup (e.g. ``api.get_posts``) used to fetch recent
+            objects again, or ``None``
+        :returns: the number of objects stored
+        """
+        since_id = self.store.since_id(stream)
+        if since_id is not None:
+            kwargs['since_id'] = since_id
+
+        kwargs.setdefault('include_deleted', True)
+        kwargs.setdefault('count', self.count)
+        newest = since_id
+        saved = 0
+        for data, meta in pages(func, *args, hydrate=False, **kwargs):
+            self.store.save(stream, kind, data)
+            saved += len(data)
+            if data:
+                newest = max(newest or 0, max(int(obj['id']) for obj in data))
+
+        if recheck_with is not None and since_id is not None and self.recheck:
+            saved += self.recheck_recent(stream, kind, recheck_with, since_id)
+
+        self.store.mark_synced(stream, kind, newest)
+        return saved
+
+    def recheck_recent(self, stream, kind, lookup, since_id):
+        ids = [id_ for id_ in self.store.recent_ids(stream, self.recheck) if id_ <= since_id]
+        if not ids:
+            return 0
+
+        data, meta = lookup(ids=ids, include_deleted=True, hydrate=False)
+        found = [obj for obj in data if obj is not None]
+        self.store.save(stream, kind, found)
+        return len(found)
+
+    def refresh(self, stream, func, *args, kind='channel', **kwargs):
+        """
+        Replace ``stream`` with a complete listing, for streams not ordered by id such as
+        subscribed channels.
+        """
+        kwargs.setdefault('count', self.count)
+        objects = [obj for data, meta in pages(func, *args, hydrate=False, **kwargs) for obj in data]
+        self.store.replace_members(stream, kind, objects)
+        self.store.mark_synced(stream, kind, None)
+        return len(objects)
+
+    def sync_user_posts(self, user_id):
+        return self.sync('users_posts:%s' % (user_id), self.api.users_posts, user_id, recheck_with=self.api.get_posts)
+
+    def sync_mentions(self, user_id):
+        return self.sync('users_mentioned_posts:%s' % (user_id), self.api.users_mentioned_posts, user_id,
+                         recheck_with=self.api.get_posts)
+
+    def sync_channel_messages(self, channel_id):
+        return self.sync('get_channel_messages:%s' % (channel_id), self.api.get_channel_messages, channel_id,
+                         kind='message', recheck_with=self.api.get_messages)
+
+    def sync_subscribed_channels(self):
+        return self.refresh('subscribed_channels', self.api.subscribed_channels)
+
+    def items(self, stream, count=None, before_id=None, include_deleted=False, hydrate=True):
+        """
+        Read ``stream`` from the local store, newest first, as models of the client or, with
+        ``hydrate=False``, as the raw objects.
+        """
+        kind = self.store.stream_kind(stream)
+        if kind is None:
+            return []
+
+        objects = self.store.items(stream, count=count, before_id=before_id, include_deleted=include_deleted)
+        if not hydrate:
+            return objects
+
+        model = model_class(self.api, MODELS[kind])
+        return [model.from_response_data(obj, api=self.api) for obj in objects]
+
+    def get(self, kind, id_, hydrate=True):
+        """A single stored object, or ``None``."""
+        obj = self.store.get(kind, id_)
+        if obj is None or not hydrate:
+            return obj
+
+        return model_class(self.api, MODELS[kind]).from_response_data(obj, api=self.api)
@@ -0,0 +1,258 @@
+"""
+.. module:: transport
+   :synopsis: Connection pooling, timeouts, retries and the optional HTTP/2 transport.
+
+"""
+import io
+import os
+import random
+import ssl
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import select_proxy
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+from pnutpy.errors import PnutError
+
+# Methods that can be sent again without changing anything twice
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Transport(object):
+    """
+    How a client talks to the API, passed as ``API.build_api(transport_config=Transport(...))``.
+
+    :param pool_connections: the number of hosts to keep connection pools for
+    :param pool_maxsize: the connections kept open per host
+    :param pool_block: wait for a free connection instead of opening (and dropping) extra ones
+        once ``pool_maxsize`` connections are in use
+    :param connect_timeout: seconds to wait for a connection, ``None`` to wait forever
+    :param read_timeout: seconds to wait for the server between bytes of the response
+    :param retries: how often a failed idempotent request (connection error, timeout or one of
+        ``retry_statuses``) is sent again
+    :param backoff: the delay before the first retry; it doubles with every further retry up to
+        ``max_backoff`` and is jittered, so clients don't retry in lockstep
+    :param http2: send requests over HTTP/2 with httpx (``pip install pnutpy[http2]``), so many
+        concurrent requests share one connection
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, connect_timeout=5, read_timeout=30,
+                 retries=3, backoff=0.5, max_backoff=10, retry_statuses=(502, 503, 504), retry_methods=IDEMPOTENT_METHODS,
+                 http2=False, sleep=time.sleep):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.retry_methods = retry_methods
+        self.http2 = http2
+        self.sleep = sleep
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def adapter(self):
+        """The requests transport adapter for :class:`pnutpy.api.API`."""
+        if self.http2:
+            return HTTPXAdapter(http2=True, **self.httpx_options())
+
+        return HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                           pool_block=self.pool_block)
+
+    def httpx_options(self):
+        """Keyword arguments for an httpx client, as used by :class:`pnutpy.async_api.AsyncAPI`."""
+        if httpx is None:
+            raise PnutError('This transport requires httpx, install it with: pip install pnutpy[http2]')
+
+        return {
+            'limits': httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize),
+            'timeout': httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+        }
+
+    def can_retry(self, method, attempt):
+        return attempt < self.retries and method.upper() in self.retry_methods
+
+    def should_retry(self, method, status_code, attempt):
+        return status_code in self.retry_statuses and self.can_retry(method, attempt)
+
+    def delay(self, attempt):
+        """The jittered delay before retry number ``attempt + 1``."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def wait(self, attempt):
+        self.sleep(self.delay(attempt))
+
+
+def ssl_context(verify, cert=None):
+    """
+    The httpx ``verify`` option for the ``verify`` and ``cert`` options of requests: a boolean,
+    or an :class:`ssl.SSLContext` for a CA bundle or client certificate.
+    """
+    if isinstance(verify, bool) and not cert:
+        return verify
+
+    if verify is False:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif verify is True:
+        context = ssl.create_default_context(cafile=requests.certs.where())
+    elif os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    else:
+        context = ssl.create_default_context(cafile=verify)
+
+    if cert:
+        if isinstance(cert, tuple):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+
+    return context
+
+
+class IterReader(io.RawIOBase):
+    """A file-like view of an iterator of bytes, for streamed ``requests`` responses."""
+    def __init__(self, chunks, close=None):
+        self.chunks = chunks
+        self.buffer = b''
+        self.on_close = close
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+
+            self.buffer += chunk
+
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+
+        return data
+
+    def close(self):
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+
+        super(IterReader, self).close()
+
+
+class HTTPXAdapter(BaseAdapter):
+    """
+    A requests transport adapter sending requests through an :class:`httpx.Client`, which
+    can speak HTTP/2 and multiplex concurrent requests over one connection.
+
+    httpx takes certificate checks, client certificates and proxies per client, so requests
+    whose ``verify``, ``cert`` or proxy differ from the defaults get a client of their own. A
+    ``client`` passed in can't be copied that way: requests that turn certificate checks off or
+    need a client certificate or proxy raise :class:`pnutpy.errors.PnutError`, and a CA bundle
+    is left to the client's own settings. Pass ``client_kwargs`` to configure the clients instead.
+    """
+    def __init__(self, http2=True, client=None, **client_kwargs):
+        super(HTTPXAdapter, self).__init__()
+        if httpx is None:
+            raise PnutError('The HTTP/2 transport requires httpx, install it with: pip install pnutpy[http2]')
+
+        # requests already picked the proxies and CA bundle of the environment
+        client_kwargs.setdefault('trust_env', False)
+        self.http2 = http2
+        self.client_kwargs = client_kwargs
+        self.own_client = client is None
+        self.client = self.build_client() if client is None else client
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def build_client(self, **settings):
+        try:
+            return httpx.Client(http2=self.http2, **dict(self.client_kwargs, **settings))
+        except ImportError:
+            raise PnutError('HTTP/2 requires the h2 package, install it with: pip install pnutpy[http2]')
+
+    def client_for(self, url, verify=True, cert=None, proxies=None):
+        """The client for a request with the TLS and proxy settings requests resolved for it."""
+        proxy = select_proxy(url, proxies or {})
+        if verify is True and not cert and not proxy:
+            return self.client
+
+        if not self.own_client:
+            if verify is not False and not cert and not proxy:
+                return self.client
+
+            raise PnutError('The httpx client given to HTTPXAdapter only sends requests with verify=True and no '
+                            'client certificate or proxy; pass its options as client_kwargs instead')
+
+        key = (verify, tuple(cert) if isinstance(cert, (list, tuple)) else cert, proxy)
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                settings = {'verify': ssl_context(verify, key[1])}
+                if proxy:
+                    settings['proxy'] = proxy
+                client = self.clients[key] = self.build_client(**settings)
+
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+
+        client = self.client_for(request.url, verify, cert, proxies)
+        options = {} if timeout is None else {'timeout': timeout}
+        httpx_request = client.build_request(request.method, request.url, headers=dict(request.headers),
+                                             content=request.body, **options)
+        try:
+            response = client.send(httpx_request, stream=True)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e), request=request)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e), request=request)
+
+        return self.build_response(request, response)
+
+    def build_response(self, request, response):
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.headers = CaseInsensitiveDict(response.headers.multi_items())
+        result.url = request.url
+        result.request = request
+        result.reason = response.reason_phrase
+        # Like the urllib3 adapter, return once the headers are in: requests takes that as the
+        # response's elapsed time, then reads the body unless it is streamed
+        result.raw = IterReader(self.iter_body(request, response), close=response.close)
+        return result
+
+    def iter_body(self, request, response):
+        try:
+            for chunk in response.iter_bytes():
+                yield chunk
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e), request=request)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e), request=request)
+
+    def close(self):
+        self.client.close()
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+
+            self.clients.clear()
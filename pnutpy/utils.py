@@ -1,23 +1,23 @@
-import json
 import requests
 
+from pnutpy.json_backends import default_backend
 from pnutpy.models import APIModel
 
 
 def json_handler(obj):
     if hasattr(obj, 'isoformat'):
         return obj.isoformat()
-    elif isinstance(obj, APIModel):
+    elif isinstance(obj, APIModel) or hasattr(obj, 'serialize'):
         return obj.serialize()
 
     return obj
 
 
-def json_encoder(data):
-    if isinstance(data, APIModel):
+def json_encoder(data, backend=default_backend):
+    if isinstance(data, APIModel) or hasattr(data, 'serialize'):
         data = data.serialize()
 
-    return json.dumps(data, default=json_handler)
+    return backend.dumps(data)
 
 
 def get_app_access_token(client_id, client_secret, host='pnut.io', verify_ssl=True):
@@ -10,10 +10,16 @@ setup(name='pnutpy',
       author='33MHz, pnut.io',
       author_email='support@pnut.io',
       url='https://github.com/pnut-api/PNUTpy',
-      packages=find_packages(exclude=['tests']),
+      packages=find_packages(exclude=['tests', 'benchmarks']),
       install_requires=[
           'python-dateutil>=2.2',
           'requests>=2.4.3',
       ],
+      extras_require={
+          'async': ['httpx>=0.23'],
+          'fast': ['orjson>=3.0'],
+          'http2': ['httpx[http2]>=0.26'],
+          'stream': ['websockets>=10.1'],
+      },
       keywords='pnut.io api library',
       zip_safe=True)
@@ -0,0 +1,172 @@
+"""
+Offline helpers: canned pnut.io payloads and fake transports for :class:`pnutpy.api.API`
+and :class:`pnutpy.async_api.AsyncAPI`.
+"""
+import io
+import json
+import unittest
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from pnutpy.api import API
+
+API_ROOT = 'https://api.pnut.test/v0'
+
+# For tests of AsyncAPI and the HTTP/2 transport, which need the optional httpx
+requires_httpx = unittest.skipIf(httpx is None, 'httpx is not installed')
+
+
+def user_data(user_id, username=None):
+    return {
+        'id': str(user_id),
+        'username': username or 'user%s' % user_id,
+        'name': 'User %s' % user_id,
+        'created_at': '2017-01-02T03:04:05Z',
+        'type': 'human',
+        'content': {'text': 'hello', 'entities': {'links': [], 'mentions': [], 'tags': []}},
+        'counts': {'bookmarks': 1, 'clients': 0, 'followers': 2, 'following': 3, 'posts': 4, 'users': 0},
+    }
+
+
+def post_data(post_id, user_id=1, text=None, **extra):
+    data = {
+        'id': str(post_id),
+        'created_at': '2018-05-06T07:08:09Z',
+        'is_deleted': False,
+        'thread_id': str(post_id),
+        'source': {'name': 'pnutpy', 'link': 'https://pnut.io', 'id': 'abc'},
+        'user': user_data(user_id),
+        'counts': {'bookmarks': 0, 'replies': 1, 'reposts': 2, 'threads': 1},
+        'content': {'text': text or 'post %s' % post_id, 'entities': {'links': [], 'mentions': [], 'tags': []}},
+    }
+    data.update(extra)
+    return data
+
+
+def message_data(message_id, channel_id=1, user_id=1):
+    return {
+        'id': str(message_id),
+        'channel_id': str(channel_id),
+        'created_at': '2019-01-01T00:00:00Z',
+        'is_deleted': False,
+        'thread_id': str(message_id),
+        'user': user_data(user_id),
+        'content': {'text': 'message %s' % message_id},
+        'raw': [{'type': 'io.pnut.core.test', 'value': {'n': message_id}}],
+    }
+
+
+def channel_data(channel_id, owner_id=1):
+    return {
+        'id': str(channel_id),
+        'type': 'io.pnut.core.chat',
+        'owner': user_data(owner_id),
+        'counts': {'messages': 10, 'subscribers': 2},
+    }
+
+
+def envelope(data, code=200, **meta):
+    meta['code'] = code
+    return {'meta': meta, 'data': data}
+
+
+def error_envelope(code, message='error'):
+    return {'meta': {'code': code, 'error_message': message}}
+
+
+class FakeAdapter(BaseAdapter):
+    """
+    A requests transport adapter that answers every request with ``handler(request)``.
+
+    ``handler`` returns ``(status_code, body)`` or ``(status_code, body, headers)`` where body is
+    a JSON-serializable object or bytes.
+    """
+    def __init__(self, handler):
+        super(FakeAdapter, self).__init__()
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        result = self.handler(request)
+        status, body = result[0], result[1]
+        headers = result[2] if len(result) > 2 else {}
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+
+        response = requests.Response()
+        response.status_code = status
+        response.raw = io.BytesIO(body)
+        response.headers.update(headers)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def query(request):
+    """The query string of a prepared request as a flat dict."""
+    return dict((k, v[0]) for k, v in parse_qs(urlsplit(str(request.url)).query).items())
+
+
+def path(request):
+    return urlsplit(str(request.url)).path.replace(urlsplit(API_ROOT).path, '', 1)
+
+
+def fake_api(handler, **kwargs):
+    api = API.build_api(api_root=API_ROOT, **kwargs)
+    adapter = FakeAdapter(handler)
+    api.mount('https://', adapter)
+    return api, adapter
+
+
+def fake_async_api(handler, **kwargs):
+    """An :class:`pnutpy.async_api.AsyncAPI` whose httpx transport answers with ``handler(request)``."""
+    from pnutpy.async_api import AsyncAPI
+
+    seen = []
+
+    def respond(request):
+        seen.append(request)
+        result = handler(request)
+        body = result[1]
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+
+        return httpx.Response(result[0], content=body, headers=result[2] if len(result) > 2 else {})
+
+    api = AsyncAPI.build_api(api_root=API_ROOT, transport=httpx.MockTransport(respond), **kwargs)
+    return api, seen
+
+
+def paged_handler(ids, make=post_data):
+    """
+    Serve ``ids`` (sorted newest first) with pnut's before_id/since_id pagination.
+    """
+    ids = sorted(ids, reverse=True)
+
+    def handler(request):
+        params = query(request)
+        count = int(params.get('count', 20))
+        before_id = params.get('before_id')
+        since_id = params.get('since_id')
+        page = [i for i in ids if (before_id is None or i < int(before_id)) and (since_id is None or i > int(since_id))]
+        more = len(page) > count
+        page = page[:count]
+        meta = {'more': more}
+        if page:
+            meta['max_id'] = str(page[0])
+            meta['min_id'] = str(page[-1])
+
+        return 200, envelope([make(i) for i in page], **meta)
+
+    return handler
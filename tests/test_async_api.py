@@ -0,0 +1,96 @@
+import asyncio
+import json
+import unittest
+
+from pnutpy.api import API, ENDPOINTS
+from pnutpy.async_api import AsyncAPI
+from pnutpy.errors import PnutMissing, PnutRateLimitAPIException
+from pnutpy.models import Post, User
+
+from tests.fakes import envelope, error_envelope, fake_async_api, path, post_data, query, requires_httpx, user_data
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@requires_httpx
+class AsyncAPITests(unittest.TestCase):
+
+    def test_every_endpoint_is_bound(self):
+        for name in ENDPOINTS:
+            self.assertTrue(asyncio.iscoroutinefunction(getattr(AsyncAPI, name)), name)
+            self.assertEqual(getattr(AsyncAPI, name).__doc__, getattr(API, name).__doc__)
+
+    def test_get_post(self):
+        def handler(request):
+            self.assertEqual(path(request), '/posts/5')
+            self.assertEqual(query(request), {'include_raw': '1'})
+            self.assertEqual(request.headers['Authorization'], 'Bearer token')
+            return 200, envelope(post_data(5))
+
+        async def go():
+            api, seen = fake_async_api(handler, access_token='token')
+            async with api:
+                return await api.get_post(5, include_raw=True)
+
+        post, meta = run(go())
+        self.assertIsInstance(post, Post)
+        self.assertIsInstance(post.user, User)
+        self.assertEqual(post.id, 5)
+        self.assertEqual(post.created_at.year, 2018)
+        self.assertEqual(meta.code, 200)
+
+    def test_list_and_path_from_model(self):
+        def handler(request):
+            self.assertEqual(path(request), '/users/3/posts')
+            return 200, envelope([post_data(2), post_data(1)], more=False)
+
+        async def go():
+            api, seen = fake_async_api(handler)
+            async with api:
+                return await api.users_posts(User.from_response_data(user_data(3)))
+
+        posts, meta = run(go())
+        self.assertEqual([p.id for p in posts], [2, 1])
+
+    def test_json_body(self):
+        def handler(request):
+            self.assertEqual(request.method, 'POST')
+            self.assertEqual(request.headers['Content-Type'], 'application/json')
+            self.assertEqual(json.loads(request.content), {'text': 'hi'})
+            return 201, envelope(post_data(9, text='hi'), code=201)
+
+        async def go():
+            api, seen = fake_async_api(handler)
+            async with api:
+                return await api.create_post(data={'text': 'hi'})
+
+        post, meta = run(go())
+        self.assertEqual(post.content.text, 'hi')
+
+    def test_errors(self):
+        responses = [(404, error_envelope(404)), (429, error_envelope(429))]
+
+        async def go():
+            api, seen = fake_async_api(lambda request: responses.pop(0))
+            async with api:
+                with self.assertRaises(PnutMissing):
+                    await api.get_post(1)
+                with self.assertRaises(PnutRateLimitAPIException):
+                    await api.get_post(1)
+
+        run(go())
+
+    def test_concurrent_requests(self):
+        async def go():
+            api, seen = fake_async_api(lambda request: (200, envelope(post_data(int(path(request).split('/')[-1])))))
+            async with api:
+                return await asyncio.gather(*[api.get_post(i) for i in range(1, 51)])
+
+        results = run(go())
+        self.assertEqual([post.id for post, meta in results], list(range(1, 51)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import payloads, suite
+
+
+class BenchmarkSuiteTests(unittest.TestCase):
+
+    def test_payloads_match_the_generator(self):
+        for name in payloads.PAYLOADS:
+            self.assertEqual(json.loads(payloads.load(name)), payloads.generate(name))
+
+    def test_every_benchmark_runs(self):
+        options = suite.parse_args(['--samples', '1', '--min-time', '0', '--pages', '2', '--quiet'])
+        document = suite.run(options)
+        self.assertEqual(list(document['results']), list(suite.BENCHMARKS))
+        self.assertEqual(document['results']['cursor.posts_streams_global']['items'], 400)
+        self.assertTrue(all(result['median'] > 0 for result in document['results'].values()))
+
+    def test_output_and_compare(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            args = ['decode.json', '--samples', '1', '--min-time', '0', '--quiet', '--output', output]
+            self.assertEqual(suite.main(args), 0)
+            with open(output) as f:
+                document = json.load(f)
+
+            self.assertEqual(document['schema'], suite.SCHEMA)
+            self.assertEqual(list(document['results']), ['decode.json'])
+
+            baseline = json.loads(json.dumps(document))
+            baseline['results']['decode.json']['median'] /= 2
+            lines, regressions = suite.compare(document, baseline, 0.1)
+            self.assertEqual(regressions, ['decode.json'])
+            self.assertIn('REGRESSION', lines[0])
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+
+from pnutpy.models import Post, User
+
+from tests.fakes import envelope, fake_api, fake_async_api, post_data, query, requires_httpx, user_data
+
+
+def bulk_handler(make, missing=()):
+    def handler(request):
+        ids = [i for i in query(request)['ids'].split(',') if int(i) not in missing]
+        # The server answers in its own order
+        return 200, envelope([make(int(i)) for i in reversed(ids)])
+
+    return handler
+
+
+class BulkIdsTests(unittest.TestCase):
+
+    def test_string_ids_pass_through(self):
+        api, adapter = fake_api(bulk_handler(post_data))
+        posts, meta = api.get_posts(ids='1,2,3')
+        self.assertEqual([p.id for p in posts], [3, 2, 1])
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_chunks_in_input_order(self):
+        api, adapter = fake_api(bulk_handler(user_data, missing=(7, 450)))
+        wanted = list(range(1, 501))
+        users, meta = api.get_users(ids=iter(wanted))
+        self.assertEqual(len(adapter.requests), 3)
+        self.assertTrue(all(len(query(r)['ids'].split(',')) <= 200 for r in adapter.requests))
+        self.assertEqual(len(users), 500)
+        self.assertIsNone(users[6])
+        self.assertIsNone(users[449])
+        self.assertEqual([u.id for u in users if u is not None], [i for i in wanted if i not in (7, 450)])
+        self.assertEqual(meta.code, 200)
+
+    def test_models_and_duplicates(self):
+        api, adapter = fake_api(bulk_handler(post_data))
+        ids = [Post.from_response_data(post_data(5)), 3, '5']
+        posts, meta = api.get_posts(ids=ids, include_raw=True)
+        self.assertEqual([p.id for p in posts], [5, 3, 5])
+        self.assertEqual(query(adapter.requests[0]), {'ids': '5,3', 'include_raw': '1'})
+
+    def test_no_ids(self):
+        api, adapter = fake_api(bulk_handler(post_data))
+        posts, meta = api.get_posts(ids=[])
+        self.assertEqual(posts, [])
+        self.assertEqual(meta.code, 200)
+        self.assertEqual(api.get_users(ids=[], hydrate=False), ([], {'code': 200}))
+        self.assertEqual(len(adapter.requests), 0)
+
+    @requires_httpx
+    def test_async_no_ids(self):
+        async def go():
+            api, seen = fake_async_api(bulk_handler(post_data))
+            async with api:
+                return await api.get_posts(ids=[]), seen
+
+        (posts, meta), seen = asyncio.run(go())
+        self.assertEqual((posts, meta.code, seen), ([], 200, []))
+
+    @requires_httpx
+    def test_async_chunks(self):
+        async def go():
+            api, seen = fake_async_api(bulk_handler(user_data, missing=(250,)))
+            async with api:
+                users, meta = await api.get_users(ids=range(1, 402))
+            return users, seen
+
+        users, seen = asyncio.run(go())
+        self.assertEqual(len(seen), 3)
+        self.assertIsInstance(users[0], User)
+        self.assertIsNone(users[249])
+        self.assertEqual(users[400].id, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
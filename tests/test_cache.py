@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pnutpy.cache import FileCache, MemoryCache, cache_key, invalidated_paths, resource_path
+
+from tests.fakes import envelope, fake_api, fake_async_api, path, requires_httpx, user_data
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Server(object):
+    """Serves users with an ETag and answers conditional requests with 304."""
+    def __init__(self):
+        self.name = 'first'
+
+    def __call__(self, request):
+        if request.method != 'GET':
+            self.name = 'second'
+            return 200, envelope(user_data(9))
+
+        etag = '"%s"' % self.name
+        if request.headers.get('If-None-Match') == etag:
+            return 304, b'', {'ETag': etag}
+
+        data = user_data(9)
+        data['name'] = self.name
+        return 200, envelope(data), {'ETag': etag}
+
+
+class CacheTests(unittest.TestCase):
+
+    def test_keys(self):
+        key = cache_key('GET', '/users/9', {'b': 1, 'a': 2, 'c': None}, {'Authorization': 'Bearer x'})
+        self.assertTrue(key.startswith('GET /users/9?a=2&b=1#'))
+        self.assertNotEqual(key, cache_key('GET', '/users/9', {'b': 1, 'a': 2}, {'Authorization': 'Bearer y'}))
+        self.assertEqual(resource_path('/users/9/follow'), '/users/9')
+        self.assertEqual(resource_path('/posts'), '/posts')
+        self.assertEqual(invalidated_paths('/users/9/follow'), ['/users/9', '/users/me'])
+        self.assertEqual(invalidated_paths('/users/me/bookmarks/5'), ['/users/me'])
+
+    def test_lru(self):
+        cache = MemoryCache(max_entries=2)
+        for key in 'abc':
+            cache.set(key, cache.build_entry('/' + key, b'', {}, 10))
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_fresh_stale_and_invalidated(self):
+        clock = Clock()
+        server = Server()
+        api, adapter = fake_api(server, cache=MemoryCache(clock=clock))
+
+        self.assertEqual(api.get_user(9)[0].name, 'first')
+        self.assertEqual(api.get_user(9)[0].name, 'first')
+        self.assertEqual(len(adapter.requests), 1)
+
+        # Different parameters are a different entry
+        api.get_user(9, include_raw=True)
+        self.assertEqual(len(adapter.requests), 2)
+
+        # Stale entries are revalidated
+        clock.now += 61
+        self.assertEqual(api.get_user(9)[0].name, 'first')
+        self.assertEqual(adapter.requests[-1].headers['If-None-Match'], '"first"')
+        api.get_user(9)
+        self.assertEqual(len(adapter.requests), 3)
+
+        # Changing the user drops its entries
+        api.follow_user(9)
+        self.assertEqual(api.get_user(9)[0].name, 'second')
+        self.assertEqual(len(adapter.requests), 5)
+
+    def test_streams_not_cached(self):
+        api, adapter = fake_api(lambda request: (200, envelope([])), cache=MemoryCache())
+        api.posts_streams_global()
+        api.posts_streams_global()
+        self.assertEqual(len(adapter.requests), 2)
+
+    def test_ttl_override(self):
+        api, adapter = fake_api(lambda request: (200, envelope([])), cache=MemoryCache(),
+                                cache_ttls={'posts_streams_global': 30, 'get_user': 0})
+        api.posts_streams_global()
+        api.posts_streams_global()
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_file_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        server = Server()
+        api, adapter = fake_api(server, cache=FileCache(directory))
+        api.get_user(9)
+        api2, adapter2 = fake_api(server, cache=FileCache(directory))
+        self.assertEqual(api2.get_user(9)[0].name, 'first')
+        self.assertEqual(len(adapter2.requests), 0)
+        api2.unfollow_user(9)
+        api2.get_user(9)
+        self.assertEqual(len(adapter2.requests), 2)
+
+    def test_follow_drops_own_user(self):
+        api, adapter = fake_api(Server(), cache=MemoryCache())
+        api.get_user('me')
+        api.follow_user(9)
+        api.get_user('me')
+        self.assertEqual([path(r) for r in adapter.requests], ['/users/me', '/users/9/follow', '/users/me'])
+
+    def test_file_cache_layout(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = FileCache(directory)
+        for entry_path in ('/users/9', '/users/9/posts', '/users/10', '/posts', '/posts/5', '/users/../x'):
+            cache.set(cache_key('GET', entry_path, {}, {}), cache.build_entry(entry_path, b'{"data": 1}\xff', {}, 60))
+
+        key = cache_key('GET', '/users/9', {}, {})
+        with open(cache.filename(key)) as f:
+            self.assertEqual(json.load(f)['path'], '/users/9')
+        self.assertEqual(os.path.dirname(cache.filename(key)), os.path.join(directory, 'users', '9'))
+        self.assertEqual(cache.get(key).content, b'{"data": 1}\xff')
+        # Path segments never escape the cache directory
+        self.assertTrue(cache.filename(cache_key('GET', '/users/../x', {}, {})).startswith(directory))
+
+        cache.invalidate('/users/9')
+        self.assertIsNone(cache.get(key))
+        self.assertIsNone(cache.get(cache_key('GET', '/users/9/posts', {}, {})))
+        self.assertIsNotNone(cache.get(cache_key('GET', '/users/10', {}, {})))
+        cache.invalidate('/posts')
+        self.assertIsNone(cache.get(cache_key('GET', '/posts/5', {}, {})))
+
+        # Files that aren't cache entries are ignored
+        key = cache_key('GET', '/users/10', {}, {})
+        with open(cache.filename(key), 'w') as f:
+            f.write('not json')
+        self.assertIsNone(cache.get(key))
+
+    @requires_httpx
+    def test_async(self):
+        async def go():
+            api, seen = fake_async_api(Server(), cache=MemoryCache())
+            async with api:
+                await api.get_user(9)
+                user, meta = await api.get_user(9)
+            return user, seen
+
+        user, seen = asyncio.run(go())
+        self.assertEqual(user.name, 'first')
+        self.assertEqual([path(r) for r in seen], ['/users/9'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from pnutpy.checkpoint import CallbackCheckpointStore, FileCheckpointStore, SQLiteCheckpointStore, checkpoint_key
+from pnutpy.cursor import async_cursor, cursor
+
+from tests.fakes import fake_api, fake_async_api, paged_handler, query, requires_httpx
+
+
+class CheckpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def interrupted_run(self, store, **kwargs):
+        api, adapter = fake_api(paged_handler(range(1, 51)))
+        posts = cursor(api.users_followers, 1, count=10, checkpoint=store, **kwargs)
+        first = [next(posts).id for i in range(25)]
+        posts.close()
+
+        api, adapter = fake_api(paged_handler(range(1, 51)))
+        rest = [p.id for p in cursor(api.users_followers, 1, count=10, checkpoint=store, **kwargs)]
+        return first, rest, adapter
+
+    def test_file_store(self):
+        store = FileCheckpointStore(os.path.join(self.directory, 'cursors.json'))
+        first, rest, adapter = self.interrupted_run(store)
+        self.assertEqual(first, list(range(50, 25, -1)))
+        # The half consumed third page is fetched again
+        self.assertEqual(rest, list(range(30, 0, -1)))
+        self.assertEqual(query(adapter.requests[0])['before_id'], '31')
+        self.assertEqual(store.read(), {})
+        self.assertEqual([n for n in os.listdir(self.directory) if n.endswith('.tmp')], [])
+
+    def test_failed_write_leaves_no_temporary_file(self):
+        store = FileCheckpointStore(os.path.join(self.directory, 'cursors.json'))
+        with self.assertRaises(TypeError):
+            store.save('followers', {'position': object()})
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_key_keeps_since_id(self):
+        api, adapter = fake_api(paged_handler(range(1, 51)))
+        older = checkpoint_key(api.users_followers, (1,), {'count': 10, 'since_id': 5, 'before_id': 40})
+        newer = checkpoint_key(api.users_followers, (1,), {'count': 10, 'since_id': 20})
+        self.assertNotEqual(older, newer)
+        self.assertEqual(older, checkpoint_key(api.users_followers, (1,), {'count': 10, 'since_id': 5}))
+
+        # Paging on since_id it is the position instead
+        self.assertEqual(checkpoint_key(api.users_followers, (1,), {'since_id': 5}, 'since_id'),
+                         checkpoint_key(api.users_followers, (1,), {'since_id': 20}, 'since_id'))
+
+        store = FileCheckpointStore(os.path.join(self.directory, 'cursors.json'))
+        posts = cursor(api.users_followers, 1, count=10, since_id=5, checkpoint=store)
+        for i in range(11):
+            next(posts)
+
+        self.assertEqual(list(store.read()), [older])
+        posts.close()
+
+    def test_sqlite_store_every(self):
+        store = SQLiteCheckpointStore(os.path.join(self.directory, 'cursors.sqlite'))
+        first, rest, adapter = self.interrupted_run(store, checkpoint_every=2, checkpoint_key='followers')
+        self.assertEqual(rest, list(range(30, 0, -1)))
+        self.assertIsNone(store.load('followers'))
+
+    def test_callback_store(self):
+        saved = {}
+        store = CallbackCheckpointStore(saved.__setitem__, saved.get, saved.pop)
+        api, adapter = fake_api(paged_handler(range(1, 31)))
+        posts = cursor(api.users_followers, 1, count=10, checkpoint=store, checkpoint_key='f')
+        for i in range(11):
+            next(posts)
+
+        self.assertEqual(saved, {'f': {'position': '21', 'pages': 1}})
+        list(posts)
+        self.assertEqual(saved, {})
+
+    @requires_httpx
+    def test_async(self):
+        store = FileCheckpointStore(os.path.join(self.directory, 'cursors.json'))
+        store.save('posts', {'position': '21', 'pages': 3})
+
+        async def main():
+            api, seen = fake_async_api(paged_handler(range(1, 51)))
+            return [p.id async for p in async_cursor(api.users_posts, 1, count=10, checkpoint=store,
+                                                     checkpoint_key='posts')]
+
+        self.assertEqual(asyncio.run(main()), list(range(20, 0, -1)))
+        self.assertIsNone(store.load('posts'))
@@ -0,0 +1,55 @@
+import unittest
+
+from pnutpy.columns import MESSAGE_COLUMNS, POST_COLUMNS, column, column_batches, numpy, pyarrow
+from pnutpy.dates import parse_epoch
+
+from tests.fakes import envelope, fake_api, message_data, paged_handler, post_data
+
+
+def post_with_counts(post_id):
+    return post_data(post_id, user_id=post_id % 3, counts={'replies': post_id, 'reposts': 1, 'bookmarks': 2})
+
+
+class ColumnBatchTests(unittest.TestCase):
+
+    def test_array_batches(self):
+        api, adapter = fake_api(paged_handler(range(1, 26), make=post_with_counts))
+        batches = list(column_batches(api.posts_streams_global, batch_size=10, count=10))
+        self.assertEqual([len(b['id']) for b in batches], [10, 10, 5])
+        self.assertEqual(list(batches[0]), [c.name for c in POST_COLUMNS])
+        self.assertEqual(batches[0]['id'].typecode, 'q')
+        self.assertEqual(list(batches[0]['id']), list(range(25, 15, -1)))
+        self.assertEqual(list(batches[0]['replies']), list(range(25, 15, -1)))
+        self.assertEqual(batches[0]['user_id'][0], 1)
+        self.assertEqual(batches[0]['created_at'][0], parse_epoch('2018-05-06T07:08:09Z'))
+        self.assertEqual(batches[0]['is_deleted'][0], 0)
+
+    def test_missing_fields_and_extra_columns(self):
+        deleted = post_data(5, is_deleted=True)
+        del deleted['user']
+        api, adapter = fake_api(lambda request: (200, envelope([deleted], more=False)))
+        columns = POST_COLUMNS + (column('text', 'content.text'),)
+        batch, = column_batches(api.posts_streams_global, columns=columns)
+        self.assertEqual(batch['user_id'][0], -1)
+        self.assertEqual(batch['is_deleted'][0], 1)
+        self.assertEqual(batch['text'], [deleted['content']['text']])
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy(self):
+        api, adapter = fake_api(paged_handler(range(1, 8), make=lambda i: message_data(i, channel_id=4)))
+        batch, = column_batches(api.get_channel_messages, 4, columns=MESSAGE_COLUMNS, format='numpy')
+        self.assertEqual(batch['id'].dtype, numpy.int64)
+        self.assertEqual(int(batch['id'].sum()), 28)
+        self.assertEqual(set(batch['channel_id'].tolist()), {4})
+        self.assertEqual(batch['is_deleted'].dtype, bool)
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_arrow(self):
+        api, adapter = fake_api(paged_handler(range(1, 8), make=post_with_counts))
+        table, = column_batches(api.posts_streams_global, format='arrow')
+        self.assertEqual(table.num_rows, 7)
+        self.assertEqual(table.column_names, [c.name for c in POST_COLUMNS])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            next(column_batches(None, format='csv'))
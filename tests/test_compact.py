@@ -0,0 +1,76 @@
+import pickle
+import sys
+import unittest
+
+from pnutpy import compact, models
+from pnutpy.utils import json_encoder
+
+from tests.fakes import channel_data, envelope, fake_api, message_data, post_data, user_data
+
+
+class CompactModelTests(unittest.TestCase):
+
+    def test_same_fields_as_dict_models(self):
+        data = post_data(3, repost_of=post_data(2), bookmarked_by=[user_data(4)], unknown_field={'a': 1})
+        post = compact.Post.from_response_data(data)
+        eager = models.Post.from_response_data(data)
+        # bookmarked_by holds the same hydrated users as starred_by instead of a raw copy
+        self.assertEqual(post.bookmarked_by, post.starred_by)
+        serialized, expected = post.serialize(), eager.serialize()
+        del serialized['bookmarked_by'], expected['bookmarked_by']
+        self.assertEqual(serialized, expected)
+        self.assertEqual(post.id, 3)
+        self.assertEqual(post['id'], 3)
+        self.assertEqual(post.content.text, 'post 3')
+        self.assertEqual(post.content.entities.links, [])
+        self.assertEqual(post.counts.replies, 1)
+        self.assertEqual(post.unknown_field.a, 1)
+        self.assertIsInstance(post.user, compact.User)
+        self.assertIsInstance(post.repost_of, compact.Post)
+        self.assertEqual(post.starred_by[0].id, 4)
+        self.assertEqual(post.reposters, [])
+        self.assertIn('thread_id', post)
+        self.assertNotIn('reply_to', post)
+        self.assertIsNone(post.get('reply_to'))
+        with self.assertRaises(AttributeError):
+            post.reply_to
+
+    def test_no_instance_dict(self):
+        post = compact.Post.from_response_data(post_data(1))
+        self.assertFalse(hasattr(post, '__dict__'))
+        self.assertLess(sys.getsizeof(post), sys.getsizeof(models.Post.from_response_data(post_data(1))))
+
+    def test_other_models(self):
+        message = compact.Message.from_response_data(message_data(5))
+        self.assertEqual(message.serialize(), models.Message.from_response_data(message_data(5)).serialize())
+        channel = compact.Channel.from_response_data(channel_data(6))
+        self.assertEqual(channel.owner.id, 1)
+        interaction = compact.Interaction.from_response_data({
+            'action': 'follow', 'event_date': '2020-01-01T00:00:00Z', 'users': [user_data(1)], 'objects': [user_data(2)]})
+        self.assertIsInstance(interaction.objects[0], compact.User)
+
+    def test_methods(self):
+        api, adapter = fake_api(lambda request: (200, envelope(post_data(1))), model_style='compact')
+        post, meta = api.get_post(1)
+        self.assertIsInstance(post, compact.Post)
+        post.repost()
+        self.assertEqual(adapter.requests[-1].method, 'PUT')
+        self.assertTrue(adapter.requests[-1].url.endswith('/posts/1/repost'))
+
+    def test_api_model_style(self):
+        page = [post_data(1, user_id=5), post_data(2, user_id=5)]
+        api, adapter = fake_api(lambda request: (200, envelope(page, more=False)), model_style='compact')
+        posts, meta = api.posts_streams_global()
+        self.assertIsInstance(posts[0], compact.Post)
+        self.assertIs(posts[0].user, posts[1].user)
+        self.assertFalse(meta.more)
+
+    def test_encode_and_pickle(self):
+        post = compact.Post.from_response_data(post_data(1))
+        self.assertIn('"text":"post 1"', json_encoder(post))
+        restored = pickle.loads(pickle.dumps(post))
+        self.assertEqual(restored, post)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import unittest
+
+from pnutpy.cursor import async_backfill, async_cursor, backfill, cursor, id_slices
+from pnutpy.errors import PnutMissing
+
+from tests.fakes import error_envelope, fake_api, fake_async_api, paged_handler, query, requires_httpx
+
+
+class CursorTests(unittest.TestCase):
+
+    def test_cursor(self):
+        api, adapter = fake_api(paged_handler(range(1, 26)))
+        ids = [post.id for post in cursor(api.posts_streams_global, count=10)]
+        self.assertEqual(ids, list(range(25, 0, -1)))
+        self.assertEqual([query(r).get('before_id') for r in adapter.requests], [None, '16', '6'])
+
+    def test_prefetch_matches_cursor(self):
+        api, adapter = fake_api(paged_handler(range(1, 26)))
+        ids = [post.id for post in cursor(api.users_posts, 1, count=10, prefetch=2)]
+        self.assertEqual(ids, list(range(25, 0, -1)))
+
+    def test_prefetch_overlaps_consumption(self):
+        second_page = threading.Event()
+        serve = paged_handler(range(1, 26))
+
+        def handler(request):
+            if query(request).get('before_id'):
+                second_page.set()
+            return serve(request)
+
+        api, adapter = fake_api(handler)
+        iterator = cursor(api.posts_streams_global, count=10, prefetch=1)
+        next(iterator)
+        # The next page is requested while the first one is still being consumed
+        self.assertTrue(second_page.wait(2))
+        iterator.close()
+
+    def test_prefetch_raises_errors(self):
+        api, adapter = fake_api(lambda request: (404, error_envelope(404)))
+        with self.assertRaises(PnutMissing):
+            list(cursor(api.posts_streams_global, prefetch=1))
+
+    @requires_httpx
+    def test_async_cursor(self):
+        async def go(prefetch):
+            api, seen = fake_async_api(paged_handler(range(1, 26)))
+            async with api:
+                return [post.id async for post in async_cursor(api.posts_streams_global, count=10, prefetch=prefetch)]
+
+        self.assertEqual(asyncio.run(go(0)), list(range(25, 0, -1)))
+        self.assertEqual(asyncio.run(go(3)), list(range(25, 0, -1)))
+
+    def test_id_slices(self):
+        self.assertEqual(id_slices(0, 11, 3), [(8, 11), (5, 8), (1, 5)])
+        self.assertEqual(id_slices(5, 6, 3), [])
+        self.assertEqual(id_slices(0, 3, 8), [(2, 3), (1, 2)])
+
+    def test_backfill(self):
+        api, adapter = fake_api(paged_handler(range(1, 101)))
+        ids = [post.id for post in backfill(api.posts_streams_global, since_id=10, before_id=90, partitions=4, count=7)]
+        self.assertEqual(ids, list(range(89, 10, -1)))
+
+    def test_backfill_ordered_fetches_all_slices_at_once(self):
+        serve = paged_handler(range(1, 101))
+        served = set()
+        all_served = threading.Event()
+
+        def handler(request):
+            response = serve(request)
+            served.update(int(post['id']) for post in response[1]['data'])
+            if len(served) == 100:
+                all_served.set()
+            return response
+
+        api, adapter = fake_api(handler)
+        iterator = backfill(api.posts_streams_global, since_id=0, before_id=101, partitions=4, count=5)
+        self.assertEqual(next(iterator).id, 100)
+        # The later slices are fetched while the consumer is still on the first one
+        self.assertTrue(all_served.wait(5))
+        self.assertEqual([post.id for post in iterator], list(range(99, 0, -1)))
+
+    def test_backfill_unordered_to_newest(self):
+        api, adapter = fake_api(paged_handler(range(1, 101)))
+        ids = [post.id for post in backfill(api.posts_streams_global, partitions=5, ordered=False, count=6)]
+        self.assertEqual(sorted(ids), list(range(1, 101)))
+
+    @requires_httpx
+    def test_async_backfill(self):
+        async def go():
+            api, seen = fake_async_api(paged_handler(range(1, 101)))
+            async with api:
+                return [post.id async for post in async_backfill(api.posts_streams_global, partitions=3, count=9)]
+
+        self.assertEqual(asyncio.run(go()), list(range(100, 0, -1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
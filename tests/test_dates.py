@@ -0,0 +1,47 @@
+import datetime
+import unittest
+
+from dateutil.parser import parse
+
+from pnutpy.dates import decode_timestamp, parse_datetime, parse_epoch
+
+from tests.fakes import envelope, fake_api, post_data
+
+
+class DateTests(unittest.TestCase):
+
+    def test_matches_dateutil(self):
+        for value in ('2017-01-02T03:04:05Z', '1999-12-31T23:59:59Z', '2020-02-29T12:00:00Z'):
+            self.assertEqual(parse_datetime(value), parse(value))
+            self.assertEqual(parse_datetime(value).utcoffset(), datetime.timedelta(0))
+            self.assertEqual(parse_epoch(value), int(parse(value).timestamp()))
+
+    def test_other_formats_fall_back(self):
+        self.assertEqual(parse_datetime('2017-01-02T03:04:05.250+02:00'), parse('2017-01-02T03:04:05.250+02:00'))
+        with self.assertRaises(ValueError):
+            parse_datetime('2017-02-30T03:04:05Z')
+
+    def test_repeated_timestamps_are_cached(self):
+        self.assertIs(parse_datetime('2018-05-06T07:08:09Z'), parse_datetime('2018-05-06T07:08:09Z'))
+
+    def test_formats(self):
+        class Client(object):
+            timestamps = 'string'
+
+        self.assertEqual(decode_timestamp('2017-01-02T03:04:05Z', Client()), '2017-01-02T03:04:05Z')
+        Client.timestamps = 'epoch'
+        self.assertEqual(decode_timestamp('2017-01-02T03:04:05Z', Client()), 1483326245)
+        self.assertIsInstance(decode_timestamp('2017-01-02T03:04:05Z'), datetime.datetime)
+
+    def test_client_option(self):
+        for style in ('dict', 'compact'):
+            for lazy in (False, True):
+                api, adapter = fake_api(lambda request: (200, envelope([post_data(1)])), timestamps='epoch',
+                                        model_style=style, lazy_models=lazy)
+                posts, meta = api.posts_streams_global()
+                self.assertEqual(posts[0].created_at, parse_epoch('2018-05-06T07:08:09Z'))
+                self.assertEqual(posts[0].user.created_at, 1483326245)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            fake_api(lambda request: (200, envelope([])), timestamps='iso')
@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+from pnutpy.cache import MemoryCache
+from pnutpy.cursor import backfill, cursor
+from pnutpy.errors import PnutMissing
+from pnutpy.models import APIModel, Post
+
+from tests.fakes import envelope, error_envelope, fake_api, fake_async_api, paged_handler, post_data, requires_httpx
+
+
+class PlainResultTests(unittest.TestCase):
+
+    def test_per_call(self):
+        api, adapter = fake_api(lambda request: (200, envelope([post_data(1)], more=False)))
+        posts, meta = api.posts_streams_global(hydrate=False)
+        self.assertIs(type(posts[0]), dict)
+        self.assertEqual(posts[0], post_data(1))
+        self.assertEqual(meta, {'code': 200, 'more': False})
+        self.assertNotIn('hydrate', adapter.requests[0].url)
+
+        posts, meta = api.posts_streams_global()
+        self.assertIsInstance(posts[0], Post)
+
+    def test_per_client(self):
+        api, adapter = fake_api(lambda request: (200, envelope(post_data(1))), hydrate=False)
+        post, meta = api.get_post(1)
+        self.assertIs(type(post), dict)
+        post, meta = api.get_post(1, hydrate=True)
+        self.assertIsInstance(post, Post)
+
+    def test_errors_still_raise(self):
+        api, adapter = fake_api(lambda request: (404, error_envelope(404)), hydrate=False)
+        with self.assertRaises(PnutMissing):
+            api.get_post(1)
+
+    def test_cached_responses(self):
+        api, adapter = fake_api(lambda request: (200, envelope(post_data(1))), cache=MemoryCache())
+        post, meta = api.get_post(1, hydrate=False)
+        self.assertIs(type(post), dict)
+        post, meta = api.get_post(1)
+        self.assertIsInstance(post, Post)
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_bulk_and_stream(self):
+        api, adapter = fake_api(lambda request: (200, envelope([post_data(2), post_data(1)])))
+        posts, meta = api.get_posts(ids=[1, 2, 3], hydrate=False)
+        self.assertEqual([p and p['id'] for p in posts], ['1', '2', None])
+
+        page = api.posts_streams_global(hydrate=False, stream=True)
+        self.assertEqual([type(p) for p in page], [dict, dict])
+        self.assertEqual(page.meta, {'code': 200})
+
+    def test_cursor(self):
+        ids = list(range(1, 451))
+        api, adapter = fake_api(paged_handler(ids))
+        posts = list(cursor(api.posts_streams_global, hydrate=False))
+        self.assertEqual([p['id'] for p in posts], [str(i) for i in reversed(ids)])
+        self.assertFalse(any(isinstance(p, APIModel) for p in posts))
+
+        posts = list(backfill(api.posts_streams_global, hydrate=False, since_id=100, before_id=200))
+        self.assertEqual([p['id'] for p in posts], [str(i) for i in range(199, 100, -1)])
+
+    @requires_httpx
+    def test_async(self):
+        async def main():
+            api, seen = fake_async_api(lambda request: (200, envelope(post_data(1))), hydrate=False)
+            post, meta = await api.get_post(1)
+            self.assertIs(type(post), dict)
+            self.assertEqual(meta, {'code': 200})
+
+        asyncio.run(main())
@@ -0,0 +1,65 @@
+import datetime
+import json
+import unittest
+
+from pnutpy.json_backends import OrjsonBackend, StdlibBackend, available_backends, get_backend
+from pnutpy.models import Post
+from pnutpy.utils import json_encoder
+
+from tests.fakes import envelope, fake_api, post_data
+
+BACKENDS = [StdlibBackend()] + ([OrjsonBackend()] if 'orjson' in available_backends() else [])
+
+
+class JSONBackendTests(unittest.TestCase):
+
+    def test_encodes_models_and_datetimes(self):
+        post = Post.from_response_data(post_data(1, raw=[{'type': 'io.pnut.core.crosspost', 'value': {}}]))
+        when = datetime.datetime(2017, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+        for backend in BACKENDS:
+            data = json.loads(json_encoder({'post': post, 'when': when}, backend))
+            self.assertEqual(data['when'], '2017-01-02T03:04:05+00:00')
+            self.assertEqual(data['post']['id'], 1)
+            self.assertEqual(data['post']['user']['username'], 'user1')
+            self.assertNotIn('_annotations_by_key', data['post'])
+
+    def test_nested_models_encode_alike(self):
+        page = envelope([post_data(2, user_id=2, text='caf\xe9'), post_data(1)])
+        api, adapter = fake_api(lambda request: (200, page))
+        posts, meta = api.users_posts(1)
+        data = {'posts': posts, 'first': {'post': posts[0], 'users': [None, posts[0].user]}}
+        encoded = [json_encoder(data, backend).encode('utf-8') for backend in BACKENDS]
+        self.assertEqual(len(set(encoded)), 1)
+        self.assertNotIn(b'"_', encoded[0])
+        self.assertEqual(json.loads(encoded[0])['first']['users'][1]['username'], 'user2')
+
+    def test_backends_encode_alike(self):
+        data = {'ids': (1, 2), 1: 'one', None: 'none', 'text': 'caf\xe9'}
+        for backend in BACKENDS:
+            encoded = backend.dumps(data)
+            self.assertIsInstance(encoded, str)
+            self.assertEqual(json.loads(encoded), {'ids': [1, 2], '1': 'one', 'null': 'none', 'text': 'caf\xe9'})
+
+    def test_decodes_bytes(self):
+        raw = json.dumps(envelope(post_data(1))).encode('utf-8')
+        for backend in BACKENDS:
+            self.assertEqual(backend.loads(raw)['data']['id'], '1')
+
+    def test_get_backend(self):
+        self.assertEqual(get_backend('auto').name, available_backends()[-1])
+        self.assertEqual(get_backend('json').name, 'json')
+        custom = StdlibBackend()
+        self.assertIs(get_backend(custom), custom)
+        with self.assertRaises(ValueError):
+            get_backend('yaml')
+
+    def test_client_backend(self):
+        for name in available_backends():
+            api, adapter = fake_api(lambda request: (200, envelope(post_data(7))), json_backend=name)
+            self.assertEqual(api.json_backend.name, name)
+            post, meta = api.create_post(data={'text': 'hi'})
+            self.assertEqual(post.id, 7)
+            self.assertEqual(json.loads(adapter.requests[0].body), {'text': 'hi'})
+
+            api.create_post(data={'text': '\U0001f95c'})
+            self.assertEqual(adapter.requests[1].body, '{"text":"\U0001f95c"}'.encode('utf-8'))
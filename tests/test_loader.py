@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from pnutpy.errors import PnutMissing
+from pnutpy.models import Channel, User
+
+from tests.fakes import channel_data, envelope, fake_api, fake_async_api, path, query, requires_httpx, user_data
+
+
+def handler(request):
+    params = query(request)
+    if path(request) == '/users':
+        ids = [i for i in params['ids'].split(',') if i != '404']
+        return 200, envelope([user_data(int(i)) for i in ids])
+
+    if path(request) == '/channels':
+        return 200, envelope([channel_data(int(i)) for i in params['ids'].split(',')])
+
+    return 200, envelope(user_data(9))
+
+
+class BatchLoaderTests(unittest.TestCase):
+
+    def test_threads_share_one_request(self):
+        api, adapter = fake_api(handler, batch_window=0.2)
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(lambda i: api.get_user(i), range(1, 11)))
+
+        self.assertEqual([user.id for user, meta in results], list(range(1, 11)))
+        self.assertEqual([path(r) for r in adapter.requests], ['/users'])
+
+    def test_consecutive_full_batches(self):
+        api, adapter = fake_api(handler, batch_window=60)
+        api.batch_loader.max_batch = 2
+        timers = []
+        real_timer = threading.Timer
+
+        def record_timer(*args, **kwargs):
+            timers.append(real_timer(*args, **kwargs))
+            return timers[-1]
+
+        with mock.patch('threading.Timer', record_timer), ThreadPoolExecutor(max_workers=2) as executor:
+            # Full batches are sent right away, long before their window ends
+            for ids in ((1, 2), (3, 4)):
+                results = list(executor.map(lambda i: api.get_user(i), ids))
+                self.assertEqual([user.id for user, meta in results], list(ids))
+
+            self.assertTrue(all(timer.finished.is_set() for timer in timers))
+
+            # A late timer of a sent batch leaves the next one alone
+            pending = executor.submit(api.get_user, 5)
+            while len(timers) < 3:
+                time.sleep(0.001)
+
+            timers[0].function(*timers[0].args)
+            self.assertEqual(len(api.batch_loader.pending), 1)
+            timers[-1].function(*timers[-1].args)
+            self.assertEqual(pending.result()[0].id, 5)
+
+        self.assertEqual([query(r)['ids'] for r in adapter.requests], ['1,2', '3,4', '5'])
+
+    def test_missing(self):
+        api, adapter = fake_api(handler, batch_window=0)
+        with self.assertRaises(PnutMissing):
+            api.get_user(404)
+
+    def test_not_batchable(self):
+        api, adapter = fake_api(handler, batch_window=0)
+        user, meta = api.get_user('me')
+        self.assertEqual(path(adapter.requests[0]), '/users/me')
+
+    def test_without_loader(self):
+        api, adapter = fake_api(handler)
+        api.get_user(3)
+        self.assertEqual(path(adapter.requests[0]), '/users/3')
+
+    @requires_httpx
+    def test_async_same_tick(self):
+        async def go():
+            api, seen = fake_async_api(handler, batch_window=0)
+            async with api:
+                users = await asyncio.gather(*[api.get_user(i) for i in (1, 2, 2, 3)],
+                                             return_exceptions=True)
+                channels = await asyncio.gather(api.get_channel(5), api.get_channel(6, include_raw=True))
+                missing = await asyncio.gather(api.get_user(404), api.get_user(4), return_exceptions=True)
+            return users, channels, missing, seen
+
+        users, channels, missing, seen = asyncio.run(go())
+        self.assertEqual([u.id for u, meta in users], [1, 2, 2, 3])
+        self.assertIsInstance(users[0][0], User)
+        self.assertIsInstance(channels[0][0], Channel)
+        self.assertIsInstance(missing[0], PnutMissing)
+        self.assertEqual(missing[1][0].id, 4)
+        # One request for the users, one per distinct parameter set for channels, one for the last pair
+        self.assertEqual([path(r) for r in seen], ['/users', '/channels', '/channels', '/users'])
+
+
+if __name__ == '__main__':
+    unittest.main()
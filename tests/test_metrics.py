@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+import unittest
+import urllib.request
+
+from pnutpy.errors import PnutMissing, PnutRateLimitAPIException
+from pnutpy.metrics import Histogram, Instrumentation, MetricsRegistry, format_labels, serve_metrics
+from pnutpy.transport import Transport
+
+from tests.fakes import envelope, error_envelope, fake_api, fake_async_api, path, post_data, requires_httpx
+
+
+def handler(request):
+    if path(request) == '/posts/404':
+        return 404, error_envelope(404)
+
+    if path(request) == '/posts/429':
+        return 429, error_envelope(429), {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '0'}
+
+    if request.method == 'POST':
+        return 201, envelope(post_data(9))
+
+    return 200, envelope(post_data(1))
+
+
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.events = []
+        self.instrumentation = Instrumentation(before=[lambda event: self.events.append(('before', event.endpoint))],
+                                               after=[lambda event: self.events.append(('after', event.endpoint))])
+        self.api, self.adapter = fake_api(handler, instrumentation=self.instrumentation)
+
+    def test_records_per_endpoint(self):
+        self.api.get_post(1)
+        self.api.get_post(2)
+        self.api.create_post(data={'text': 'hello'})
+        with self.assertRaises(PnutMissing):
+            self.api.get_post(404)
+
+        with self.assertRaises(PnutRateLimitAPIException):
+            self.api.get_post(429)
+
+        metrics = self.instrumentation.metrics.snapshot()
+        self.assertEqual(set(metrics), {'get_post', 'create_post'})
+        get_post = metrics['get_post']
+        self.assertEqual(get_post['requests'], 4)
+        self.assertEqual(get_post['statuses'], {200: 2, 404: 1, 429: 1})
+        self.assertEqual(get_post['client_errors'], 2)
+        self.assertEqual(get_post['rate_limited'], 1)
+        self.assertEqual(get_post['latency_buckets'][-1], (float('inf'), 4))
+        self.assertGreater(get_post['bytes_received'], 0)
+        self.assertEqual(get_post['bytes_sent'], 0)
+        self.assertGreater(metrics['create_post']['bytes_sent'], 0)
+        self.assertEqual(self.events[:2], [('before', 'get_post'), ('after', 'get_post')])
+
+    def test_retries_and_errors(self):
+        calls = []
+
+        def flaky(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return 503, error_envelope(503)
+
+            return 200, envelope(post_data(1))
+
+        instrumentation = Instrumentation()
+        api, adapter = fake_api(flaky, instrumentation=instrumentation,
+                                transport_config=Transport(retries=1, sleep=lambda seconds: None))
+        api.get_post(1)
+        metrics = instrumentation.metrics.snapshot()['get_post']
+        self.assertEqual(metrics['retries'], 1)
+        self.assertEqual(metrics['statuses'], {200: 1})
+
+    def test_connection_errors(self):
+        def broken(request):
+            raise ConnectionError('refused')
+
+        instrumentation = Instrumentation()
+        api, adapter = fake_api(broken, instrumentation=instrumentation)
+        with self.assertRaises(ConnectionError):
+            api.get_post(1)
+
+        metrics = instrumentation.metrics.snapshot()['get_post']
+        self.assertEqual(metrics['connection_errors'], 1)
+
+    def test_span(self):
+        spans = []
+
+        @contextlib.contextmanager
+        def span(event):
+            spans.append(('start', event.endpoint))
+            yield
+            spans.append(('end', event.status_code, event.elapsed is not None))
+
+        api, adapter = fake_api(handler, instrumentation=Instrumentation(span=span))
+        api.get_post(1)
+        self.assertEqual(spans, [('start', 'get_post'), ('end', 200, True)])
+
+    def test_direct_requests_use_the_path(self):
+        self.api.request('GET', '/posts/1')
+        self.assertEqual(list(self.instrumentation.metrics.snapshot()), ['/posts/1'])
+
+    def test_prometheus(self):
+        self.api.get_post(1)
+        self.api.get_post(1)
+        text = self.instrumentation.metrics.to_prometheus()
+        self.assertIn('# TYPE pnutpy_requests_total counter', text)
+        self.assertIn('pnutpy_requests_total{endpoint="get_post",status="200"} 2', text)
+        self.assertIn('pnutpy_request_duration_seconds_bucket{endpoint="get_post",le="+Inf"} 2', text)
+        self.assertIn('pnutpy_request_duration_seconds_count{endpoint="get_post"} 2', text)
+        self.assertIn('pnutpy_retries_total{endpoint="get_post"} 0', text)
+
+        server = serve_metrics(self.instrumentation.metrics, port=0, address='127.0.0.1')
+        try:
+            url = 'http://127.0.0.1:%s/metrics' % server.server_address[1]
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(response.read().decode('utf-8'), text)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @requires_httpx
+    def test_async(self):
+        instrumentation = Instrumentation()
+        api, seen = fake_async_api(handler, instrumentation=instrumentation)
+
+        async def run():
+            async with api:
+                await api.get_post(1)
+
+        asyncio.run(run())
+        metrics = instrumentation.metrics.snapshot()['get_post']
+        self.assertEqual(metrics['statuses'], {200: 1})
+        self.assertGreater(metrics['bytes_received'], 0)
+
+    def test_without_instrumentation(self):
+        api, adapter = fake_api(handler)
+        self.assertIsNone(api.instrumentation)
+        api.get_post(1)
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = Histogram((1, 2))
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe(value)
+
+        self.assertEqual(list(histogram.cumulative()), [(1, 2), (2, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.sum, 6)
+
+    def test_label_escaping(self):
+        self.assertEqual(format_labels([('endpoint', '/a "b"\\c\n')]), 'endpoint="/a \\"b\\"\\\\c\\n"')
+        self.assertIn('# TYPE pnutpy_requests_total counter', MetricsRegistry().to_prometheus())
@@ -0,0 +1,154 @@
+import datetime
+import gc
+import unittest
+
+from pnutpy.models import IdentityMap, Interaction, LazyModel, Message, Post, User, lazy_model
+from pnutpy.utils import json_encoder
+
+from tests.fakes import envelope, fake_api, message_data, post_data, user_data
+
+
+class IdentityMapTests(unittest.TestCase):
+
+    def test_users_shared_within_a_response(self):
+        repost = post_data(10, user_id=2)
+        page = [post_data(i, user_id=1 if i % 2 else 2, repost_of=repost) for i in range(20, 30)]
+        api, adapter = fake_api(lambda request: (200, envelope(page)))
+        posts, meta = api.posts_streams_global()
+
+        authors = set(id(p.user) for p in posts)
+        self.assertEqual(len(authors), 2)
+        self.assertEqual(len(set(id(p.repost_of) for p in posts)), 1)
+        self.assertIs(posts[0].repost_of.user, posts[0].user)
+
+    def test_not_shared_across_responses_by_default(self):
+        api, adapter = fake_api(lambda request: (200, envelope([post_data(1)])))
+        first, meta = api.posts_streams_global()
+        second, meta = api.posts_streams_global()
+        self.assertIsNot(first[0].user, second[0].user)
+
+    def test_client_map_updates_in_place(self):
+        users = [user_data(1), dict(user_data(1), name='Renamed')]
+        api, adapter = fake_api(lambda request: (200, envelope([post_data(5, user=users.pop(0))])),
+                                identity_map=True)
+        first, meta = api.posts_streams_global()
+        second, meta = api.posts_streams_global()
+        self.assertIs(first[0].user, second[0].user)
+        self.assertEqual(first[0].user.name, 'Renamed')
+
+    def test_client_map_does_not_keep_objects_alive(self):
+        shared = IdentityMap(shared=True)
+        User.from_response_data(user_data(3), identity_map=IdentityMap(parent=shared))
+        gc.collect()
+        self.assertEqual(len(shared.objects), 0)
+
+    def test_merge_updates_under_the_lock(self):
+        shared = IdentityMap(shared=True)
+        held = []
+
+        class Recording(User):
+            def update(self, other):
+                held.append(shared.lock.locked())
+                super(Recording, self).update(other)
+
+        first = Recording(user_data(3))
+        self.assertIs(shared.merge(('User', '3'), first), first)
+        self.assertIs(shared.merge(('User', '3'), Recording(dict(user_data(3), name='Renamed'))), first)
+        self.assertEqual(held, [True])
+        self.assertEqual(first.name, 'Renamed')
+
+    def test_interaction(self):
+        data = {'action': 'repost', 'event_date': '2020-01-01T00:00:00Z', 'users': [user_data(1), user_data(2)],
+                'objects': [post_data(7, user_id=1)]}
+        interaction = Interaction.from_response_data(data, identity_map=IdentityMap())
+        self.assertIs(interaction.users[0], interaction.objects[0].user)
+
+
+class LazyModelTests(unittest.TestCase):
+
+    def test_converted_on_access(self):
+        data = post_data(3, user_id=8, repost_of=post_data(2), bookmarked_by=[user_data(4)])
+        post = lazy_model(Post, data)
+        self.assertIsInstance(post, Post)
+        self.assertIsInstance(post, LazyModel)
+        self.assertEqual(dict.__getitem__(post, 'created_at'), '2018-05-06T07:08:09Z')
+        self.assertIsInstance(dict.__getitem__(post, 'user'), dict)
+
+        self.assertEqual(post.id, 3)
+        self.assertEqual(post.content.text, 'post 3')
+        self.assertIsInstance(post.user, User)
+        self.assertEqual(post.user.id, 8)
+        self.assertIsInstance(post['created_at'], datetime.datetime)
+        self.assertIs(post.user, post.user)
+        self.assertIsInstance(post.repost_of, Post)
+        self.assertEqual(post.starred_by[0].id, 4)
+        self.assertEqual(post.reposters, [])
+        # The user is only converted once
+        self.assertNotIn('user', post._pending)
+
+    def test_state_kept_out_of_the_data(self):
+        identity_map = IdentityMap()
+        post = lazy_model(Post, post_data(3, user_id=8), identity_map=identity_map)
+        eager = Post.from_response_data(post_data(3, user_id=8))
+        self.assertEqual(len(post), len(eager))
+        self.assertEqual(sorted(k for k, v in post.items()), sorted(k for k, v in eager.items()))
+
+        # Once everything is converted the model no longer keeps the response's map alive
+        self.assertIsNone(post._pending)
+        self.assertIsNone(post._identity_map)
+        self.assertIs(post.user, identity_map.get(User, 8))
+
+    def test_merge_keeps_fields_to_convert(self):
+        shared = IdentityMap(shared=True)
+        first = lazy_model(User, user_data(4), identity_map=IdentityMap(parent=shared))
+        renamed = dict(user_data(4), name='Renamed', created_at='2019-01-02T03:04:05Z')
+        second = lazy_model(User, renamed, identity_map=IdentityMap(parent=shared))
+        self.assertIs(first, second)
+        self.assertEqual(first.name, 'Renamed')
+        self.assertEqual(first.created_at.year, 2019)
+
+    def test_matches_eager_hydration(self):
+        data = post_data(3, repost_of=post_data(2))
+        self.assertEqual(lazy_model(Post, data).serialize(), Post.from_response_data(data).serialize())
+        data = message_data(5)
+        self.assertEqual(lazy_model(Message, data).serialize(), Message.from_response_data(data).serialize())
+
+        # Also when some fields were read already
+        data = post_data(3, repost_of=post_data(2))
+        eager = Post.from_response_data(data)
+        for copy in (dict, lambda model: model.copy(), lambda model: {**model}):
+            lazy = lazy_model(Post, data)
+            lazy.user
+            copied = copy(lazy)
+            self.assertEqual(copied['created_at'], eager.created_at)
+            self.assertEqual(copied['repost_of'].created_at, eager.repost_of.created_at)
+            self.assertEqual(copied, copy(eager))
+
+        for read in (json_encoder, lambda model: dict(zip(model.keys(), model.values()))):
+            lazy = lazy_model(Post, data)
+            lazy.user
+            self.assertEqual(read(lazy), read(eager))
+
+    def test_assignment_wins(self):
+        post = lazy_model(Post, post_data(3))
+        post.user = None
+        self.assertIsNone(post.user)
+        self.assertIsNone(post.get('missing'))
+
+    def test_api(self):
+        api, adapter = fake_api(lambda request: (200, envelope([post_data(1), post_data(2, user_id=1)])), lazy_models=True)
+        posts, meta = api.posts_streams_global()
+        self.assertTrue(all(isinstance(p, LazyModel) for p in posts))
+        self.assertEqual(meta.code, 200)
+        self.assertIs(posts[0].user, posts[1].user)
+        self.assertEqual(posts[1].user.created_at.year, 2017)
+
+    def test_interaction(self):
+        data = {'action': 'follow', 'event_date': '2020-01-01T00:00:00Z', 'users': [user_data(1)], 'objects': [user_data(2)]}
+        interaction = lazy_model(Interaction, data)
+        self.assertIsInstance(interaction.objects[0], User)
+        self.assertEqual(interaction.event_date.year, 2020)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import queue
+import unittest
+
+import requests
+
+from pnutpy.poller import Poller, RequestBudget
+
+from tests.fakes import fake_api, paged_handler, path, query
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+class PollerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.ids = {'1': list(range(1, 6)), '2': [7]}
+
+        def handler(request):
+            channel_id = path(request).split('/')[2]
+            return paged_handler(self.ids[channel_id])(request)
+
+        self.api, self.adapter = fake_api(handler)
+
+    def poller(self, **kwargs):
+        return Poller(min_interval=2, max_interval=60, clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_watermark_and_delivery(self):
+        delivered = queue.Queue()
+        seen = []
+        poller = self.poller(queue=delivered, count=2)
+        stream = poller.add(self.api.get_channel_messages, 1, callback=lambda s, items: seen.append([p.id for p in items]))
+        self.assertEqual(poller.poll_due(), 1)
+        self.assertEqual(seen, [[5, 4]])
+        self.assertEqual(stream.since_id, 5)
+
+        # A burst bigger than a page is paged through down to the watermark
+        self.ids['1'].extend([6, 7, 8, 9, 10])
+        self.clock.now += stream.interval
+        poller.poll_due()
+        self.assertEqual(seen[-1], [10, 9, 8, 7, 6])
+        self.assertEqual(query(self.adapter.requests[-1]), {'since_id': '5', 'before_id': '7', 'count': '2'})
+        self.assertEqual(delivered.get_nowait()[0], 'get_channel_messages:1')
+
+    def test_intervals_adapt(self):
+        poller = self.poller()
+        busy = poller.add(self.api.get_channel_messages, 1)
+        quiet = poller.add(self.api.get_channel_messages, 2)
+        for i in range(200):
+            self.ids['1'].append(100 + i)
+            self.clock.now += 2
+            poller.poll_due()
+
+        self.assertEqual(busy.interval, 2)
+        self.assertEqual(quiet.interval, 60)
+        self.assertGreater(busy.polls, quiet.polls * 4)
+
+    def test_shared_budget(self):
+        poller = self.poller(requests_per_second=1)
+        for i in range(5):
+            poller.add(self.api.get_channel_messages, 2, key='stream%s' % i)
+
+        poller.poll_due()
+        self.assertEqual(len(self.adapter.requests), 5)
+        self.assertEqual(self.clock.slept, 4)
+
+    def test_errors_back_off(self):
+        api, adapter = fake_api(lambda request: (404, {'meta': {'code': 404, 'error_message': 'gone'}}))
+        poller = self.poller()
+        stream = poller.add(api.get_channel_messages, 9)
+        poller.poll_due()
+        self.assertEqual(stream.errors, 1)
+        self.assertEqual(stream.interval, 3)
+
+    def test_connection_errors_back_off(self):
+        def handler(request):
+            if path(request) == '/channels/9/messages':
+                raise requests.ConnectionError('Connection refused')
+            return paged_handler([7])(request)
+
+        api, adapter = fake_api(handler)
+        poller = self.poller()
+        failing = poller.add(api.get_channel_messages, 9)
+        healthy = poller.add(api.get_channel_messages, 2)
+        self.assertEqual(poller.poll_due(), 2)
+        self.assertEqual((failing.errors, failing.interval), (1, 3))
+        self.assertEqual(healthy.items, 1)
+        # The failing stream stays scheduled
+        self.clock.now += 3
+        self.assertEqual(poller.poll_due(), 2)
+        self.assertEqual(failing.errors, 2)
+
+    def test_callback_errors_keep_the_watermark(self):
+        seen = []
+
+        def callback(stream, items):
+            seen.append([p.id for p in items])
+            if len(seen) == 1:
+                raise ValueError('callback bug')
+
+        poller = self.poller()
+        failing = poller.add(self.api.get_channel_messages, 1, callback=callback)
+        healthy = poller.add(self.api.get_channel_messages, 2)
+        with self.assertLogs('pnutpy.poller', 'ERROR'):
+            self.assertEqual(poller.poll_due(), 2)
+
+        self.assertEqual((failing.since_id, failing.errors, failing.items), (None, 1, 0))
+        self.assertEqual(healthy.since_id, 7)
+
+        # The next poll delivers the same items again
+        self.clock.now += failing.interval
+        poller.poll_due()
+        self.assertEqual(seen, [[5, 4, 3, 2, 1], [5, 4, 3, 2, 1]])
+        self.assertEqual(failing.since_id, 5)
+
+    def test_budget(self):
+        budget = RequestBudget(2, burst=2, clock=self.clock)
+        self.assertEqual([budget.acquire() for i in range(4)], [0, 0, 0.5, 1.0])
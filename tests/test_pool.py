@@ -0,0 +1,106 @@
+import unittest
+
+from pnutpy.errors import PnutMissing
+from pnutpy.pool import ClientPool, call
+from pnutpy.transport import Transport
+
+from tests.fakes import API_ROOT, FakeAdapter, envelope, error_envelope, user_data
+
+
+class ClosingAdapter(FakeAdapter):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ClientPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.remaining = {}
+
+        def handler(request):
+            token = request.headers['Authorization'][len('Bearer '):]
+            headers = {'X-RateLimit-Limit': '100', 'X-RateLimit-Reset': '60',
+                       'X-RateLimit-Remaining': str(self.remaining.get(token, 99))}
+            if request.url.endswith('/users/404'):
+                return 404, error_envelope(404), headers
+
+            return 200, envelope(user_data(int(token.strip('tokenap') or 0))), headers
+
+        self.adapter = ClosingAdapter(handler)
+        self.pool = ClientPool(adapter=self.adapter, api_root=API_ROOT, max_clients=2, app_tokens=['app1', 'app2'])
+
+    def test_clients_share_the_adapter(self):
+        first = self.pool.client('token1')
+        self.assertIs(self.pool.client('token1'), first)
+        second = self.pool.client('token2')
+        self.assertIs(first.get_adapter(API_ROOT), second.get_adapter(API_ROOT))
+        self.assertIsNot(first.rate_limiter, second.rate_limiter)
+
+        self.pool.client('token3')
+        self.assertEqual(list(self.pool.clients), ['token2', 'token3'])
+
+    def test_evicted_clients_are_closed(self):
+        first = self.pool.client('token1')
+        closed = []
+        first.close = lambda: closed.append(first)
+        self.pool.client('token2')
+        self.pool.client('token3')
+        self.assertEqual(closed, [first])
+        self.assertNotIn(self.adapter, first.adapters.values())
+        self.assertFalse(self.adapter.closed)
+
+        user, meta = self.pool.client('token2').get_user(2)
+        self.assertEqual(user.id, 2)
+
+        self.pool.close()
+        self.assertTrue(self.adapter.closed)
+
+    def test_transport_config_builds_the_shared_adapter(self):
+        transport = Transport(pool_maxsize=3, retries=1)
+        pool = ClientPool(api_root=API_ROOT, transport_config=transport)
+        api = pool.client('token1')
+        self.assertIs(api.get_adapter(API_ROOT), pool.adapter)
+        self.assertEqual(pool.adapter._pool_maxsize, 3)
+        self.assertIs(api.transport_config, transport)
+
+        with self.assertRaises(ValueError):
+            ClientPool(adapter=self.adapter, transport_config=transport)
+
+    def test_run(self):
+        results = self.pool.run([call('token%s' % i, 'get_user', 'me') for i in (1, 2, 3)])
+        self.assertEqual([user.id for user, meta in results], [1, 2, 3])
+        tokens = [r.headers['Authorization'] for r in self.adapter.requests]
+        self.assertEqual(sorted(tokens), ['Bearer token1', 'Bearer token2', 'Bearer token3'])
+
+        results = self.pool.run([call('token1', 'get_user', 404), call('token1', 'get_user', 1)], return_exceptions=True)
+        self.assertIsInstance(results[0], PnutMissing)
+        with self.assertRaises(PnutMissing):
+            self.pool.run([call('token1', 'get_user', 404)])
+
+    def test_budgets_are_per_token(self):
+        self.remaining['token1'] = 5
+        self.pool.run([call('token1', 'get_user', 1), call('token2', 'get_user', 2)])
+        budgets = self.pool.budgets()
+        self.assertEqual(budgets['token1'], (5, 100))
+        self.assertEqual(budgets['token2'], (99, 100))
+
+        limiter = self.pool.client('token1').rate_limiter
+        now = limiter.clock()
+        limiter.clock = lambda: now + 61
+        self.assertEqual(self.pool.budgets()['token1'], (100, 100))
+
+    def test_app_tokens_spread_load(self):
+        used = [self.pool.app_client() for i in range(4)]
+        self.assertEqual(len(set(map(id, used))), 2)
+
+        self.remaining['app1'] = 3
+        self.pool.run([call(None, 'get_user', 1) for i in range(4)])
+        self.assertIs(self.pool.app_client(), self.pool.app_clients[1])
+
+        # Once its window has passed, the token has its whole limit again
+        limiter = self.pool.app_clients[0].rate_limiter
+        now = limiter.clock()
+        limiter.clock = lambda: now + 61
+        self.assertIs(self.pool.app_client(), self.pool.app_clients[0])
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+
+from pnutpy.profiling import PHASES, CallProfile, Profiler, current_profile
+
+from tests.fakes import envelope, fake_api, fake_async_api, paged_handler, post_data, query, requires_httpx
+
+
+class ProfilingTests(unittest.TestCase):
+
+    def test_profile_attached_to_meta(self):
+        api, adapter = fake_api(paged_handler(range(1, 51)), profile=True)
+        posts, meta = api.users_posts(1, count=20)
+        self.assertEqual(len(posts), 20)
+        profile = meta['profile']
+        self.assertIsInstance(profile, CallProfile)
+        for phase in ('ttfb', 'download', 'decode', 'hydrate', 'dates', 'total'):
+            self.assertIn(phase, profile)
+
+        self.assertLessEqual(profile['dates'], profile['hydrate'])
+        self.assertLessEqual(profile['decode'] + profile['hydrate'], profile['total'])
+        self.assertIsNone(current_profile())
+
+    def test_plain_results(self):
+        api, adapter = fake_api(paged_handler(range(1, 11)), profile=True, hydrate=False)
+        posts, meta = api.users_posts(1)
+        self.assertIn('decode', meta['profile'])
+        self.assertNotIn('dates', meta['profile'])
+
+    def test_aggregate_stats(self):
+        api, adapter = fake_api(paged_handler(range(1, 11)), profile=True)
+        api.users_posts(1)
+        api.users_posts(1)
+        stats = api.profiler.stats()
+        self.assertEqual(stats['users_posts']['calls'], 2)
+        total = stats['users_posts']['phases']['total']
+        self.assertAlmostEqual(total['mean'], total['total'] / 2)
+        self.assertTrue(0 <= stats['users_posts']['cpu_share'] <= 1)
+
+        report = api.profiler.report()
+        self.assertIn('users_posts', report)
+        self.assertTrue(all(phase in report for phase in PHASES))
+
+        api.profiler.reset()
+        self.assertEqual(api.profiler.stats(), {})
+
+    def test_bulk_chunks_share_the_profile(self):
+        def handler(request):
+            ids = query(request)['ids'].split(',')
+            return 200, envelope([post_data(i) for i in ids])
+
+        api, adapter = fake_api(handler, profile=True)
+        posts, meta = api.get_posts(ids=list(range(1, 501)))
+        self.assertEqual(len(adapter.requests), 3)
+        self.assertEqual(len(posts), 500)
+        self.assertEqual(api.profiler.stats()['get_posts']['calls'], 1)
+        self.assertIn('decode', meta['profile'])
+
+    @requires_httpx
+    def test_async(self):
+        api, seen = fake_async_api(paged_handler(range(1, 11)), profile=True)
+
+        async def run():
+            async with api:
+                return await api.users_posts(1)
+
+        posts, meta = asyncio.run(run())
+        self.assertEqual(len(posts), 10)
+        for phase in ('ttfb', 'download', 'decode', 'hydrate', 'total'):
+            self.assertIn(phase, meta['profile'])
+
+    def test_off_by_default(self):
+        api, adapter = fake_api(paged_handler(range(1, 11)))
+        posts, meta = api.users_posts(1)
+        self.assertNotIn('profile', meta)
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def test_run(self):
+        profiler = Profiler()
+
+        def call():
+            current_profile().add('decode', 0.5)
+            return [], {}
+
+        data, meta = profiler.run('endpoint', call)
+        self.assertEqual(meta['profile']['decode'], 0.5)
+        self.assertEqual(profiler.stats()['endpoint']['phases']['decode']['max'], 0.5)
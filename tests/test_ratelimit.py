@@ -0,0 +1,141 @@
+import unittest
+
+from pnutpy.cursor import cursor
+from pnutpy.ratelimit import RateLimiter
+
+from tests.fakes import envelope, error_envelope, fake_api, paged_handler
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def headers(limit, remaining, reset):
+    return {'X-RateLimit-Limit': str(limit), 'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Reset': str(reset)}
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_no_information(self):
+        limiter = RateLimiter()
+        self.assertEqual(limiter.acquire(), 0)
+        limiter.update({})
+        self.assertEqual(limiter.acquire(), 0)
+
+    def test_waits_for_the_next_window(self):
+        clock = Clock()
+        limiter = RateLimiter(clock=clock)
+        limiter.update(headers(5, 2, 60))
+        self.assertEqual([limiter.acquire() for _ in range(2)], [0, 0])
+        # The budget is spent, so the next five requests go into the window starting in 60s
+        self.assertEqual([limiter.acquire() for _ in range(5)], [60] * 5)
+        self.assertEqual(limiter.acquire(), 120)
+
+        clock.now += 60
+        self.assertEqual(limiter.acquire(), 60)
+        clock.now += 60
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.waited, 60 * 5 + 120 + 60)
+
+    def test_window_reset(self):
+        clock = Clock()
+        limiter = RateLimiter(clock=clock)
+        limiter.update(headers(3, 0, 10))
+        clock.now += 11
+        self.assertEqual([limiter.acquire() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(limiter.acquire(), 10)
+
+    def test_reserve(self):
+        clock = Clock()
+        limiter = RateLimiter(reserve=2, clock=clock)
+        limiter.update(headers(10, 3, 30))
+        self.assertEqual([limiter.acquire() for _ in range(2)], [0, 30])
+
+    def test_rate_limited_response(self):
+        clock = Clock()
+        limiter = RateLimiter(clock=clock)
+        limiter.update({'Retry-After': '5'}, status_code=429)
+        self.assertTrue(limiter.knows_reset())
+        self.assertEqual(limiter.acquire(), 5)
+
+    def test_rate_limited_response_without_headers(self):
+        clock = Clock()
+        limiter = RateLimiter(clock=clock)
+        limiter.update(headers(5, 3, 30))
+        clock.now += 40
+        self.assertFalse(limiter.knows_reset())
+        # A bare 429 after the window ended still holds requests back for a window
+        limiter.update({}, status_code=429)
+        self.assertTrue(limiter.knows_reset())
+        self.assertEqual(limiter.acquire(), 30)
+
+    def test_rate_limited_response_without_any_window(self):
+        clock = Clock()
+        limiter = RateLimiter(clock=clock)
+        limiter.update({}, status_code=429)
+        self.assertEqual(limiter.acquire(), 10)
+
+
+class RateLimitedAPITests(unittest.TestCase):
+
+    def test_api_reads_headers(self):
+        api, adapter = fake_api(lambda request: (200, envelope([]), headers(100, 42, 300)))
+        api.posts_streams_global()
+        self.assertEqual(api.rate_limiter.remaining, 42)
+        self.assertEqual(api.rate_limiter.limit, 100)
+
+    def test_disabled(self):
+        api, adapter = fake_api(lambda request: (200, envelope([]), headers(100, 42, 300)), rate_limiter=False)
+        api.posts_streams_global()
+        self.assertIsNone(api.rate_limiter)
+
+    def test_cursor_retries_after_429(self):
+        serve = paged_handler(range(1, 6))
+        responses = [(429, error_envelope(429), headers(10, 0, 0))]
+
+        def handler(request):
+            if responses:
+                return responses.pop(0)
+            return serve(request)[:2] + (headers(10, 9, 60),)
+
+        sleeps = []
+        api, adapter = fake_api(handler, rate_limiter=RateLimiter(sleep=sleeps.append))
+        self.assertEqual([post.id for post in cursor(api.posts_streams_global)], [5, 4, 3, 2, 1])
+        self.assertEqual(len(adapter.requests), 2)
+        self.assertEqual(len(sleeps), 1)
+
+    def test_cursor_backs_off_after_bare_429(self):
+        clock = Clock()
+        serve = paged_handler(range(1, 6))
+        responses = [
+            lambda request: serve(request)[:2] + (headers(10, 9, 60),),
+            lambda request: (429, error_envelope(429)),
+        ]
+
+        def handler(request):
+            if responses:
+                return responses.pop(0)(request)
+            return serve(request)[:2] + (headers(10, 9, 60),)
+
+        api, adapter = fake_api(handler, rate_limiter=RateLimiter(clock=clock, sleep=clock.sleep))
+        found = []
+        for post in cursor(api.posts_streams_global, count=2):
+            found.append(post.id)
+            # The first window is over by the time the second page is asked for
+            clock.now += 100
+
+        self.assertEqual(found, [5, 4, 3, 2, 1])
+        # One 429, then the next request waited out a whole window
+        self.assertEqual([request.url.count('before_id=4') for request in adapter.requests], [0, 1, 1, 0])
+        self.assertEqual(api.rate_limiter.waited, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import unittest
+
+import requests
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from pnutpy.models import Post
+
+from tests.fakes import envelope, error_envelope, fake_api, post_data, query
+
+
+def event(event_type, data, **meta):
+    return json.dumps({'meta': dict(meta, type=event_type), 'data': data})
+
+
+@unittest.skipIf(websockets is None, 'websockets is not installed')
+class StreamConsumerTests(unittest.TestCase):
+
+    def test_subscribe_dispatch_reconnect(self):
+        from pnutpy.realtime import StreamConsumer
+
+        connections = []
+
+        async def stand_in(connection):
+            connections.append(connection.request.path)
+            if len(connections) == 1:
+                await connection.send(json.dumps({'meta': {'connection_id': 'c1'}}))
+                await connection.send(event('post', post_data(3), subscription_ids=['s1']))
+                await connection.send(event('post', post_data(3), subscription_ids=['s1']))
+                return
+
+            await connection.send(json.dumps({'meta': {'connection_id': 'c2'}}))
+            await connection.send(event('post', post_data(5), subscription_ids=['s1']))
+            await connection.wait_closed()
+
+        def rest(request):
+            params = query(request)
+            if params['connection_id'] == 'c1':
+                return 200, envelope([post_data(2), post_data(1)], subscription_id='s1')
+
+            self.assertEqual(params['since_id'], '3')
+            return 200, envelope([post_data(4), post_data(3)], subscription_id='s1')
+
+        api, adapter = fake_api(rest, access_token='token')
+        received = []
+
+        async def main():
+            async with websockets.serve(stand_in, '127.0.0.1', 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                consumer = StreamConsumer(api, url='ws://127.0.0.1:%s/v1/user' % (port), backoff=0.01)
+                consumer.subscribe(api.posts_streams_global, count=2)
+
+                @consumer.on('post')
+                async def new_post(post, meta):
+                    received.append(post)
+                    if post.id == 5:
+                        await consumer.stop()
+
+                await asyncio.wait_for(consumer.run(), 10)
+
+        asyncio.run(main())
+        self.assertEqual([p.id for p in received], [3, 4, 5])
+        self.assertIsInstance(received[0], Post)
+        self.assertEqual(connections, ['/v1/user?access_token=token'] * 2)
+        self.assertEqual([query(r)['connection_id'] for r in adapter.requests], ['c1', 'c2'])
+
+    def test_handler_errors_and_catch_up_meta(self):
+        from pnutpy.realtime import StreamConsumer
+
+        connections = []
+
+        async def stand_in(connection):
+            connections.append(connection)
+            await connection.send(json.dumps({'meta': {'connection_id': 'c%s' % len(connections)}}))
+            if len(connections) == 1:
+                await connection.send(event('post', post_data(3), subscription_ids=['s1']))
+                await connection.send(event('post', post_data(4), subscription_ids=['s1']))
+                return
+
+            await connection.send(event('post', post_data(6), subscription_ids=['s1']))
+            await connection.wait_closed()
+
+        def rest(request):
+            if query(request)['connection_id'] == 'c1':
+                return 200, envelope([], subscription_id='s1')
+
+            return 200, envelope([post_data(5)], subscription_id='s1', more=False, min_id='5')
+
+        api, adapter = fake_api(rest, access_token='token')
+        received = []
+
+        async def main():
+            async with websockets.serve(stand_in, '127.0.0.1', 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                consumer = StreamConsumer(api, url='ws://127.0.0.1:%s/v1/user' % (port), backoff=0.01)
+                consumer.subscribe(api.posts_streams_global)
+
+                @consumer.on('post')
+                def failing(post, meta):
+                    if post.id == 3:
+                        raise ValueError('handler bug')
+
+                @consumer.on('post')
+                async def new_post(post, meta):
+                    received.append((post.id, meta.serialize()))
+                    if post.id == 6:
+                        await consumer.stop()
+
+                with self.assertLogs('pnutpy.realtime', 'ERROR'):
+                    await asyncio.wait_for(consumer.run(), 10)
+
+        asyncio.run(main())
+        self.assertEqual([post_id for post_id, meta in received], [3, 4, 5, 6])
+        self.assertEqual(received[2][1], {'type': 'post', 'connection_id': 'c2', 'subscription_ids': ['s1']})
+        self.assertEqual(len(connections), 2)
+
+    def run_consumer(self, api, stand_in, stop_at, **subscribe_kwargs):
+        from pnutpy.realtime import StreamConsumer
+
+        received = []
+
+        async def main():
+            async with websockets.serve(stand_in, '127.0.0.1', 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                consumer = StreamConsumer(api, url='ws://127.0.0.1:%s/v1/user' % (port), backoff=0.01)
+                consumer.subscribe(api.posts_streams_global, **subscribe_kwargs)
+
+                @consumer.on('post')
+                async def new_post(post, meta):
+                    received.append(post.id)
+                    if post.id == stop_at:
+                        await consumer.stop()
+
+                await asyncio.wait_for(consumer.run(), 10)
+
+        asyncio.run(main())
+        return received
+
+    def test_resume_pages_down_to_last_seen(self):
+        connections = []
+
+        async def stand_in(connection):
+            connections.append(connection)
+            await connection.send(json.dumps({'meta': {'connection_id': 'c%s' % len(connections)}}))
+            if len(connections) == 1:
+                await connection.send(event('post', post_data(3), subscription_ids=['s1']))
+                return
+
+            await connection.send(event('post', post_data(10), subscription_ids=['s1']))
+            await connection.wait_closed()
+
+        missed = [9, 8, 7, 6, 5, 4]
+
+        def rest(request):
+            params = query(request)
+            if params.get('connection_id') == 'c1':
+                return 200, envelope([], subscription_id='s1')
+
+            self.assertEqual(params['since_id'], '3')
+            before_id = int(params.get('before_id', 100))
+            page = [i for i in missed if i < before_id][:2]
+            more = page[-1] != missed[-1]
+            return 200, envelope([post_data(i) for i in page], subscription_id='s1', more=more, min_id=str(page[-1]))
+
+        api, adapter = fake_api(rest, access_token='token')
+        received = self.run_consumer(api, stand_in, 10, count=2)
+        self.assertEqual(received, [3, 9, 8, 7, 6, 5, 4, 10])
+        # Only the first call of the catch up renews the subscription
+        self.assertEqual([query(r).get('connection_id') for r in adapter.requests], ['c1', 'c2', None, None])
+
+    def test_reconnects_after_failed_subscribe(self):
+        def unavailable(request):
+            return 503, error_envelope(503, 'Unavailable')
+
+        def unreachable(request):
+            raise requests.ConnectionError('Connection refused')
+
+        for fail in (unavailable, unreachable):
+            with self.subTest(fail=fail.__name__):
+                self.check_reconnects_after(fail)
+
+    def check_reconnects_after(self, fail):
+        connections = []
+
+        async def stand_in(connection):
+            connections.append(connection)
+            await connection.send(json.dumps({'meta': {'connection_id': 'c%s' % len(connections)}}))
+            await connection.send(event('post', post_data(len(connections)), subscription_ids=['s1']))
+            await connection.wait_closed()
+
+        def rest(request):
+            if query(request)['connection_id'] == 'c1':
+                return fail(request)
+
+            return 200, envelope([], subscription_id='s1')
+
+        api, adapter = fake_api(rest, access_token='token')
+        received = self.run_consumer(api, stand_in, 2)
+        self.assertEqual(received, [2])
+        self.assertEqual(len(connections), 2)
@@ -0,0 +1,89 @@
+import unittest
+
+from pnutpy.api import API
+from pnutpy.cursor import cursor
+from pnutpy.errors import PnutAPIException, PnutMissing, PnutRateLimitAPIException
+from pnutpy.loadtest import run_load
+from pnutpy.standin import StandInServer, page_ids
+
+from tests.fakes import httpx
+
+
+class PageIdsTests(unittest.TestCase):
+
+    def test_pages(self):
+        self.assertEqual(page_ids(10, 3), ([10, 9, 8], True))
+        self.assertEqual(page_ids(10, 3, before_id=3), ([2, 1], False))
+        self.assertEqual(page_ids(10, 5, since_id=7), ([10, 9, 8], False))
+        self.assertEqual(page_ids(20, 3, step=5, offset=2), ([17, 12, 7], True))
+        self.assertEqual(page_ids(20, 3, before_id=7, step=5, offset=2), ([2], False))
+
+
+class StandInServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(posts=1000, users=10, channels=5, messages=500).start()
+        self.api = API.build_api(api_root=self.server.api_root, access_token='token')
+
+    def tearDown(self):
+        self.api.close()
+        self.server.stop()
+
+    def test_pagination(self):
+        posts, meta = self.api.posts_streams_global(count=5)
+        self.assertEqual([post.id for post in posts], [1000, 999, 998, 997, 996])
+        self.assertTrue(meta.more)
+        self.assertEqual(meta.min_id, '996')
+
+        posts = list(cursor(self.api.users_posts, 3))
+        self.assertEqual(len(posts), 100)
+        self.assertTrue(all(post.user.id == 3 for post in posts))
+
+        messages = list(cursor(self.api.get_channel_messages, 2))
+        self.assertEqual(len(messages), 100)
+        self.assertTrue(all(message.channel_id == '2' for message in messages))
+
+    def test_lookups(self):
+        posts, meta = self.api.get_posts(ids=[5, 2000, 7])
+        self.assertEqual([post and post.id for post in posts], [5, None, 7])
+        user, meta = self.api.get_user('@user7')
+        self.assertEqual(user.id, 7)
+        with self.assertRaises(PnutMissing):
+            self.api.get_post(5000)
+
+    def test_create(self):
+        post, meta = self.api.create_post(data={'text': 'hello'})
+        self.assertEqual((post.id, post.content.text), (1001, 'hello'))
+        self.assertEqual(self.api.get_post(1001)[0].content.text, 'hello')
+        message, meta = self.api.create_message(2, data={'text': 'hi'})
+        self.assertEqual(message.channel_id, '2')
+
+    def test_rate_limit(self):
+        self.server.rate_limit = 2
+        self.api.rate_limiter = None
+        self.api.get_post(1)
+        self.api.get_post(1)
+        with self.assertRaises(PnutRateLimitAPIException):
+            self.api.get_post(1)
+
+        self.assertEqual(self.server.statuses[429], 1)
+
+    def test_injected_errors(self):
+        self.server.error_rate = 1
+        with self.assertRaises(PnutAPIException) as raised:
+            self.api.get_post(1)
+
+        self.assertIn(raised.exception.response.meta.code, (500, 502, 503))
+
+
+class LoadTests(unittest.TestCase):
+
+    def test_modes(self):
+        with StandInServer(posts=500, error_rate=0.1, seed=1) as server:
+            for mode in ('sync', 'threads', 'async') if httpx is not None else ('sync', 'threads'):
+                result = run_load(server.api_root, 'get_post', mode, calls=30, concurrency=4, posts=500, seed=1)
+                summary = result.summary()
+                self.assertEqual(summary['calls'], 30)
+                self.assertGreater(summary['calls_per_second'], 0)
+                self.assertLessEqual(summary['latency']['p50'], summary['latency']['p99'])
+                self.assertIn('calls/s', result.report())
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import random
+import unittest
+
+from pnutpy.errors import PnutMissing
+from pnutpy.models import Message, Post
+from pnutpy.stream import AsyncStreamedPage, EnvelopeSplitter, StreamedPage
+
+from tests.fakes import (envelope, error_envelope, fake_api, fake_async_api, message_data, path, post_data,
+                         requires_httpx)
+
+
+class EnvelopeSplitterTests(unittest.TestCase):
+
+    def split(self, raw, sizes):
+        splitter = EnvelopeSplitter()
+        elements = []
+        i = 0
+        while i < len(raw):
+            n = next(sizes)
+            elements.extend(splitter.feed(raw[i:i + n]))
+            i += n
+
+        return [json.loads(x) for x in elements], json.loads(splitter.envelope)
+
+    def test_any_chunking(self):
+        rand = random.Random(4)
+        data = [post_data(i, text='"quoted\\" {[brackets]} é' * (i % 3)) for i in range(12)]
+        for body in (envelope(data, more=True), {'data': data, 'meta': {'code': 200, 'more': False}}):
+            raw = json.dumps(body).encode('utf-8')
+            for size in (1, 7, 64, len(raw)):
+                sizes = iter(lambda: rand.randint(1, size), None)
+                elements, rest = self.split(raw, sizes)
+                self.assertEqual(elements, data)
+                self.assertEqual(rest, dict(body, data=[]))
+
+    def test_scalar_elements(self):
+        rand = random.Random(5)
+        data = ['1', 23, 'a "b", c', None, True, {'id': '5'}, [1, 2], 4.5, -7, False]
+        for separators in ((',', ':'), (' , ', ' : ')):
+            raw = json.dumps(envelope(data), separators=separators).encode('utf-8')
+            for size in (1, 3, len(raw)):
+                elements, rest = self.split(raw, iter(lambda: rand.randint(1, size), None))
+                self.assertEqual(elements, data)
+                self.assertEqual(rest, envelope([]))
+
+    def test_keeps_little_buffered(self):
+        raw = json.dumps(envelope([post_data(i) for i in range(50)])).encode('utf-8')
+        splitter = EnvelopeSplitter()
+        largest = 0
+        for i in range(0, len(raw), 100):
+            splitter.feed(raw[i:i + 100])
+            largest = max(largest, len(splitter.buffer))
+
+        self.assertLess(largest, len(json.dumps(post_data(1))) + 100)
+
+
+class StreamedPageTests(unittest.TestCase):
+
+    def test_stream_list_endpoint(self):
+        api, adapter = fake_api(lambda request: (200, envelope([message_data(i, 3) for i in range(5)], more=True)))
+        page = api.get_channel_messages(3, count=5, stream=True)
+        self.assertIsInstance(page, StreamedPage)
+        self.assertIsNone(page.meta)
+        messages = list(page)
+        self.assertEqual([m.id for m in messages], list(range(5)))
+        self.assertIsInstance(messages[0], Message)
+        self.assertTrue(page.meta.more)
+        self.assertEqual(path(adapter.requests[0]), '/channels/3/messages')
+
+    def test_models_follow_client_options(self):
+        api, adapter = fake_api(lambda request: (200, envelope([post_data(1)])), model_style='compact')
+        post, = api.posts_streams_global(stream=True)
+        self.assertEqual(type(post).__name__, 'Post')
+        self.assertNotIsInstance(post, Post)
+
+    def test_error(self):
+        api, adapter = fake_api(lambda request: (404, error_envelope(404)))
+        with self.assertRaises(PnutMissing):
+            api.get_channel_messages(3, stream=True)
+
+    def test_single_object_endpoints_ignore_stream(self):
+        api, adapter = fake_api(lambda request: (200, envelope(post_data(1))))
+        post, meta = api.get_post(1, stream=True)
+        self.assertEqual(post.id, 1)
+
+    @requires_httpx
+    def test_async(self):
+        async def main():
+            api, seen = fake_async_api(lambda request: (200, envelope([post_data(i) for i in range(3)])))
+            page = await api.posts_streams_global(stream=True)
+            self.assertIsInstance(page, AsyncStreamedPage)
+            posts = [post async for post in page]
+            self.assertEqual([p.id for p in posts], [0, 1, 2])
+            self.assertEqual(page.meta.code, 200)
+
+            api, seen = fake_async_api(lambda request: (404, error_envelope(404)))
+            with self.assertRaises(PnutMissing):
+                await api.posts_streams_global(stream=True)
+
+        asyncio.run(main())
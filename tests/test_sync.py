@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pnutpy.models import Channel, Post
+from pnutpy.sync import SyncEngine, SyncStore
+
+from tests.fakes import channel_data, envelope, fake_api, paged_handler, path, post_data, query
+
+
+class SyncTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ids = list(range(1, 31))
+        self.deleted = set()
+        self.revised = {}
+        self.stream = paged_handler(self.ids, make=self.make_post)
+
+        def handler(request):
+            if path(request) == '/posts':
+                ids = query(request)['ids'].split(',')
+                return 200, envelope([self.make_post(int(i)) for i in ids])
+
+            return self.stream(request)
+
+        self.api, self.adapter = fake_api(handler)
+
+    def make_post(self, post_id):
+        post = post_data(post_id, text=self.revised.get(post_id))
+        if post_id in self.deleted:
+            post['is_deleted'] = True
+        if post_id in self.revised:
+            post['is_revised'] = True
+
+        return post
+
+    def test_incremental(self):
+        engine = SyncEngine(self.api, SyncStore(), count=10)
+        self.assertEqual(engine.sync_user_posts(1), 30)
+        self.assertEqual(len(self.adapter.requests), 3)
+
+        self.ids.extend([31, 32])
+        self.stream = paged_handler(self.ids, make=self.make_post)
+        del self.adapter.requests[:]
+        engine.recheck = 0
+        self.assertEqual(engine.sync_user_posts(1), 2)
+        self.assertEqual(len(self.adapter.requests), 1)
+        self.assertEqual(query(self.adapter.requests[0])['since_id'], '30')
+        self.assertEqual(query(self.adapter.requests[0])['include_deleted'], '1')
+
+        posts = engine.items('users_posts:1')
+        self.assertEqual([p.id for p in posts], list(range(32, 0, -1)))
+        self.assertIsInstance(posts[0], Post)
+
+    def test_deletes_and_edits(self):
+        engine = SyncEngine(self.api, SyncStore(), count=10, recheck=5)
+        engine.sync_user_posts(1)
+        self.deleted.add(29)
+        self.revised[30] = 'edited'
+        engine.sync_user_posts(1)
+        self.assertEqual(query(self.adapter.requests[-1])['ids'], '30,29,28,27,26')
+
+        self.assertEqual([p.id for p in engine.items('users_posts:1', count=3)], [30, 28, 27])
+        self.assertEqual(engine.items('users_posts:1', count=1)[0].content.text, 'edited')
+        self.assertTrue(engine.get('post', 29, hydrate=False)['is_deleted'])
+        self.assertEqual(len(engine.items('users_posts:1', include_deleted=True)), 30)
+
+    def test_persists(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, 'sync.sqlite')
+        store = SyncStore(filename)
+        SyncEngine(self.api, store).sync_user_posts(1)
+        store.close()
+
+        store = SyncStore(filename)
+        self.assertEqual(store.since_id('users_posts:1'), 30)
+        self.assertEqual(store.streams(), ['users_posts:1'])
+        self.assertEqual(len(SyncEngine(self.api, store).items('users_posts:1', hydrate=False)), 30)
+
+    def test_refresh_channels(self):
+        channels = [channel_data(3), channel_data(2)]
+        api, adapter = fake_api(lambda request: (200, envelope(channels, more=False)))
+        engine = SyncEngine(api, SyncStore())
+        self.assertEqual(engine.sync_subscribed_channels(), 2)
+        channels.pop()
+        engine.sync_subscribed_channels()
+        stored = engine.items('subscribed_channels')
+        self.assertEqual([c.id for c in stored], ['3'])
+        self.assertIsInstance(stored[0], Channel)
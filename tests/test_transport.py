@@ -0,0 +1,217 @@
+import asyncio
+import json
+import time
+import unittest
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from pnutpy.errors import PnutError
+from pnutpy.transport import HTTPXAdapter, Transport
+
+from tests.fakes import API_ROOT, envelope, error_envelope, fake_api, fake_async_api, post_data, requires_httpx
+
+
+def flaky_handler(failures, status=503):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) <= failures:
+            return status, error_envelope(status)
+
+        return 200, envelope(post_data(1))
+
+    return handler, calls
+
+
+class TransportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        self.transport = Transport(retries=2, backoff=1, sleep=self.sleeps.append)
+
+    def test_retries_idempotent_requests(self):
+        handler, calls = flaky_handler(2)
+        api, adapter = fake_api(handler, transport_config=self.transport)
+        post, meta = api.get_post(1)
+        self.assertEqual(post.id, 1)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[0] <= 1 and 0 <= self.sleeps[1] <= 2)
+
+    def test_gives_up_after_the_retries(self):
+        handler, calls = flaky_handler(5)
+        api, adapter = fake_api(handler, transport_config=self.transport)
+        with self.assertRaises(PnutError):
+            api.get_post(1)
+
+        self.assertEqual(len(calls), 3)
+
+    def test_does_not_retry_posts(self):
+        handler, calls = flaky_handler(1)
+        api, adapter = fake_api(handler, transport_config=self.transport)
+        with self.assertRaises(PnutError):
+            api.create_post(data={'text': 'hi'})
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_retries_connection_errors(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise requests.ConnectionError('reset')
+
+            return 200, envelope(post_data(1))
+
+        api, adapter = fake_api(handler, transport_config=self.transport)
+        post, meta = api.get_post(1)
+        self.assertEqual(post.id, 1)
+        self.assertEqual(len(calls), 2)
+
+    def test_timeout_and_pool(self):
+        seen = {}
+        api, adapter = fake_api(lambda request: (200, envelope(post_data(1))),
+                                transport_config=Transport(connect_timeout=2, read_timeout=7, pool_maxsize=25))
+        self.assertEqual(api.get_adapter('http://api.pnut.test')._pool_maxsize, 25)
+
+        send = adapter.send
+
+        def record(request, **kwargs):
+            seen.update(kwargs)
+            return send(request, **kwargs)
+
+        adapter.send = record
+        api.get_post(1)
+        self.assertEqual(seen['timeout'], (2, 7))
+
+    def test_without_transport_nothing_is_retried(self):
+        handler, calls = flaky_handler(1)
+        api, adapter = fake_api(handler)
+        with self.assertRaises(PnutError):
+            api.get_post(1)
+
+        self.assertEqual(len(calls), 1)
+
+    def test_delay_is_capped(self):
+        transport = Transport(backoff=1, max_backoff=3)
+        self.assertTrue(all(0 <= transport.delay(10) <= 3 for _ in range(50)))
+
+
+@requires_httpx
+class HTTPXAdapterTests(unittest.TestCase):
+
+    def build(self, handler, **kwargs):
+        api, adapter = fake_api(handler, **kwargs)
+        httpx_adapter = HTTPXAdapter(client=httpx.Client(transport=httpx.MockTransport(handler)))
+        api.mount('https://', httpx_adapter)
+        return api
+
+    def test_requests_through_httpx(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request)
+            headers = {'X-RateLimit-Limit': '10', 'X-RateLimit-Remaining': '9', 'X-RateLimit-Reset': '60'}
+            return httpx.Response(200, json=envelope(post_data(3)), headers=headers)
+
+        api = self.build(handler)
+        post, meta = api.get_post(3, include_raw=1)
+        self.assertEqual(post.id, 3)
+        self.assertEqual(str(seen[0].url), API_ROOT + '/posts/3?include_raw=1')
+        self.assertEqual(api.rate_limiter.remaining, 9)
+
+    def test_streamed_response(self):
+        api = self.build(lambda request: httpx.Response(200, json=envelope([post_data(i) for i in (3, 2, 1)])))
+        page = api.users_posts(1, stream=True)
+        self.assertEqual([post.id for post in page], [3, 2, 1])
+
+    def test_profiled_ttfb(self):
+        body = json.dumps(envelope([post_data(i) for i in (3, 2, 1)])).encode('utf-8')
+
+        def slow_body():
+            time.sleep(0.05)
+            yield body
+
+        api = self.build(lambda request: httpx.Response(200, content=slow_body()), profile=True)
+        posts, meta = api.users_posts(1)
+        self.assertEqual([post.id for post in posts], [3, 2, 1])
+        # The body arrives after the headers, so it counts as download
+        self.assertLess(meta['profile']['ttfb'], 0.05)
+        self.assertGreaterEqual(meta['profile']['download'], 0.05)
+
+    def test_connection_errors(self):
+        def handler(request):
+            raise httpx.ConnectError('refused', request=request)
+
+        api = self.build(handler)
+        with self.assertRaises(requests.ConnectionError):
+            api.get_post(1)
+
+    def test_verify_cert_and_proxies(self):
+        def handler(request):
+            return httpx.Response(200, json=envelope(post_data(1)))
+
+        api, adapter = fake_api(handler, verify_ssl=False)
+        httpx_adapter = HTTPXAdapter(http2=False, transport=httpx.MockTransport(handler))
+        api.mount('https://', httpx_adapter)
+        api.get_post(1)
+        api.get_post(1)
+        # Requests that don't verify certificates get a client of their own
+        self.assertEqual([key[0] for key in httpx_adapter.clients], [False])
+
+        proxied = httpx_adapter.client_for(API_ROOT, proxies={'https': 'http://proxy.test:3128'})
+        self.assertIsNot(proxied, httpx_adapter.client)
+        self.assertIn((True, None, 'http://proxy.test:3128'), httpx_adapter.clients)
+        self.assertIs(httpx_adapter.client_for(API_ROOT, proxies={'http': 'http://proxy.test:3128'}),
+                      httpx_adapter.client)
+        httpx_adapter.close()
+
+    def test_given_client_refuses_other_settings(self):
+        api, adapter = fake_api(lambda request: None, verify_ssl=False)
+        api.mount('https://', HTTPXAdapter(client=httpx.Client(transport=httpx.MockTransport(lambda request: None))))
+        with self.assertRaises(PnutError):
+            api.get_post(1)
+
+
+@requires_httpx
+class AsyncTransportTests(unittest.TestCase):
+
+    def test_retries(self):
+        handler, calls = flaky_handler(1, status=502)
+        api, seen = fake_async_api(handler, transport_config=Transport(retries=1, backoff=0))
+
+        async def run():
+            async with api:
+                return await api.get_post(1)
+
+        post, meta = asyncio.run(run())
+        self.assertEqual(post.id, 1)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(api.client.timeout.connect, 5)
+
+    def test_errors_match_the_sync_client(self):
+        for error, expected in ((httpx.ConnectError, requests.ConnectionError), (httpx.ReadTimeout, requests.Timeout)):
+            def handler(request):
+                raise error('failed', request=request)
+
+            api, adapter = fake_api(handler)
+            api.mount('https://', HTTPXAdapter(client=httpx.Client(transport=httpx.MockTransport(handler))))
+            with self.assertRaises(expected):
+                api.get_post(1)
+
+            async_api, seen = fake_async_api(handler)
+
+            async def run():
+                async with async_api:
+                    return await async_api.get_post(1)
+
+            with self.assertRaises(expected):
+                asyncio.run(run())